@@ -0,0 +1,51 @@
+"""Columns and indexes added since createTables.py: locations.geohash, the
+nearby-search index and match_requests.dispatch_id
+
+Databases created by the current createTables.py already have them, so every
+step checks first.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _columns(table):
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _indexes(table):
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if "geohash" not in _columns("locations"):
+        op.add_column("locations", sa.Column("geohash", sa.String(), nullable=True))
+    if "ix_locations_geohash" not in _indexes("locations"):
+        op.create_index("ix_locations_geohash", "locations", ["geohash"])
+    if "ix_locations_lat_lng_updated_at" not in _indexes("locations"):
+        op.create_index("ix_locations_lat_lng_updated_at", "locations", ["latitude", "longitude", "updated_at"])
+
+    if "dispatch_id" not in _columns("match_requests"):
+        op.add_column("match_requests", sa.Column("dispatch_id", sa.String(), nullable=True))
+    if "ix_match_requests_dispatch_id" not in _indexes("match_requests"):
+        op.create_index("ix_match_requests_dispatch_id", "match_requests", ["dispatch_id"])
+
+
+def downgrade():
+    op.drop_index("ix_match_requests_dispatch_id", table_name="match_requests")
+    with op.batch_alter_table("match_requests") as batch_op:
+        batch_op.drop_column("dispatch_id")
+
+    op.drop_index("ix_locations_lat_lng_updated_at", table_name="locations")
+    op.drop_index("ix_locations_geohash", table_name="locations")
+    with op.batch_alter_table("locations") as batch_op:
+        batch_op.drop_column("geohash")
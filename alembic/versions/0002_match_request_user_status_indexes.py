@@ -0,0 +1,37 @@
+"""Composite (user, status, created_at) indexes for get_user_matches
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def _indexes(table):
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    existing = _indexes("match_requests")
+    if "ix_match_requests_requester_status_created" not in existing:
+        op.create_index(
+            "ix_match_requests_requester_status_created", "match_requests",
+            ["requester_id", "status", "created_at"]
+        )
+    if "ix_match_requests_receiver_status_created" not in existing:
+        op.create_index(
+            "ix_match_requests_receiver_status_created", "match_requests",
+            ["receiver_id", "status", "created_at"]
+        )
+
+
+def downgrade():
+    op.drop_index("ix_match_requests_receiver_status_created", table_name="match_requests")
+    op.drop_index("ix_match_requests_requester_status_created", table_name="match_requests")
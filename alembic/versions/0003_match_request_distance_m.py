@@ -0,0 +1,70 @@
+"""Numeric match_requests.distance_m, backfilled from the distance strings
+
+Rows whose distance cannot be parsed keep distance_m NULL.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+import re
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH = 1000
+
+# Same grammar as app.utils.distance.parse_distance_m, frozen here with the migration
+_DISTANCE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(m|km)?\s*$", re.IGNORECASE)
+
+
+def _parse_meters(distance):
+    match = _DISTANCE_PATTERN.match(distance or "")
+    if not match:
+        return None
+    value, unit = match.groups()
+    meters = round(float(value) * (1000 if unit and unit.lower() == "km" else 1))
+    return meters if meters > 0 else None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if "distance_m" not in {column["name"] for column in sa.inspect(bind).get_columns("match_requests")}:
+        op.add_column("match_requests", sa.Column("distance_m", sa.Integer(), nullable=True))
+
+    match_requests = sa.table(
+        "match_requests",
+        sa.column("match_id", sa.String),
+        sa.column("distance", sa.String),
+        sa.column("distance_m", sa.Integer),
+    )
+    # Each distinct string is parsed once, then applied to all its rows
+    distances = bind.execute(
+        sa.select(match_requests.c.distance)
+        .where(match_requests.c.distance_m.is_(None))
+        .distinct()
+    ).scalars().all()
+    updates = [
+        {"old_distance": distance, "new_distance_m": meters}
+        for distance, meters in ((distance, _parse_meters(distance)) for distance in distances)
+        if meters is not None
+    ]
+    statement = (
+        match_requests.update()
+        .where(
+            match_requests.c.distance == sa.bindparam("old_distance"),
+            match_requests.c.distance_m.is_(None)
+        )
+        .values(distance_m=sa.bindparam("new_distance_m"))
+    )
+    for start in range(0, len(updates), BACKFILL_BATCH):
+        bind.execute(statement, updates[start:start + BACKFILL_BATCH])
+
+
+def downgrade():
+    with op.batch_alter_table("match_requests") as batch_op:
+        batch_op.drop_column("distance_m")
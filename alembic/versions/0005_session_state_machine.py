@@ -0,0 +1,47 @@
+"""sessions.updated_at and partial indexes over active sessions
+
+updated_at is backfilled from the latest of check_out_time, check_in_time
+and created_at.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+# Must match app.models.session.ACTIVE_SESSION_STATUSES
+ACTIVE_SESSION_WHERE = sa.text("status IN ('created', 'started')")
+PARTIAL_INDEXES = {
+    "ix_sessions_active_requester": "requester_id",
+    "ix_sessions_active_helper": "helper_id",
+}
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if "updated_at" not in {column["name"] for column in inspector.get_columns("sessions")}:
+        op.add_column("sessions", sa.Column("updated_at", sa.DateTime(), nullable=True))
+    op.execute(
+        "UPDATE sessions SET updated_at = COALESCE(check_out_time, check_in_time, created_at) "
+        "WHERE updated_at IS NULL"
+    )
+
+    existing = {index["name"] for index in inspector.get_indexes("sessions")}
+    for name, column in PARTIAL_INDEXES.items():
+        if name not in existing:
+            op.create_index(name, "sessions", [column], sqlite_where=ACTIVE_SESSION_WHERE)
+
+
+def downgrade():
+    for name in reversed(list(PARTIAL_INDEXES)):
+        op.drop_index(name, table_name="sessions")
+    with op.batch_alter_table("sessions") as batch_op:
+        batch_op.drop_column("updated_at")
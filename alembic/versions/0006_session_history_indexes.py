@@ -0,0 +1,53 @@
+"""(participant, created_at) indexes on sessions for keyset-paginated history
+
+The active-session partial indexes from 0005 gain a status column. Otherwise
+the planner can pick the new history indexes for active lookups.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+HISTORY_INDEXES = {
+    "ix_sessions_requester_created": ["requester_id", "created_at"],
+    "ix_sessions_helper_created": ["helper_id", "created_at"],
+}
+# Must match app.models.session.ACTIVE_SESSION_STATUSES
+ACTIVE_SESSION_WHERE = sa.text("status IN ('created', 'started')")
+ACTIVE_INDEXES = {
+    "ix_sessions_active_requester": "requester_id",
+    "ix_sessions_active_helper": "helper_id",
+}
+
+
+def _recreate_active_indexes(with_status):
+    existing = {index["name"]: index["column_names"] for index in sa.inspect(op.get_bind()).get_indexes("sessions")}
+    for name, column in ACTIVE_INDEXES.items():
+        columns = [column, "status"] if with_status else [column]
+        if existing.get(name) == columns:
+            continue
+        if name in existing:
+            op.drop_index(name, table_name="sessions")
+        op.create_index(name, "sessions", columns, sqlite_where=ACTIVE_SESSION_WHERE)
+
+
+def upgrade():
+    existing = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("sessions")}
+    for name, columns in HISTORY_INDEXES.items():
+        if name not in existing:
+            op.create_index(name, "sessions", columns)
+    _recreate_active_indexes(with_status=True)
+
+
+def downgrade():
+    _recreate_active_indexes(with_status=False)
+    for name in reversed(list(HISTORY_INDEXES)):
+        op.drop_index(name, table_name="sessions")
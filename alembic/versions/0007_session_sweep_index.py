@@ -0,0 +1,26 @@
+"""Partial index on sessions.updated_at for the abandoned-session sweep
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+# Must match app.models.session.ACTIVE_SESSION_STATUSES
+ACTIVE_SESSION_WHERE = sa.text("status IN ('created', 'started')")
+
+
+def upgrade():
+    if "ix_sessions_active_updated" not in {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("sessions")}:
+        op.create_index("ix_sessions_active_updated", "sessions", ["updated_at"], sqlite_where=ACTIVE_SESSION_WHERE)
+
+
+def downgrade():
+    op.drop_index("ix_sessions_active_updated", table_name="sessions")
@@ -1,3 +1,47 @@
+import os
+import tempfile
+
 SECRET_KEY = "your_secret_key_here"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+
+# Where live user locations are kept: memory (single worker) | redis | sql
+LOCATION_BACKEND = os.getenv("LOCATION_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Write-behind buffer for location pings: flush every N ms or once M users are waiting
+LOCATION_FLUSH_INTERVAL_MS = int(os.getenv("LOCATION_FLUSH_INTERVAL_MS", "200"))
+LOCATION_FLUSH_MAX_ENTRIES = int(os.getenv("LOCATION_FLUSH_MAX_ENTRIES", "500"))
+
+# Background jobs run in one worker only, chosen by a leader lock: local | file (one host) | redis
+SCHEDULER_LOCK = os.getenv("SCHEDULER_LOCK", "file")
+SCHEDULER_LOCK_PATH = os.getenv("SCHEDULER_LOCK_PATH", os.path.join(tempfile.gettempdir(), "photoaid-scheduler.lock"))
+
+# Pending match requests older than this are expired by a periodic job
+MATCH_EXPIRY_MINUTES = int(os.getenv("MATCH_EXPIRY_MINUTES", "30"))
+MATCH_EXPIRY_INTERVAL_SECONDS = float(os.getenv("MATCH_EXPIRY_INTERVAL_SECONDS", "60"))
+MATCH_EXPIRY_BATCH_SIZE = int(os.getenv("MATCH_EXPIRY_BATCH_SIZE", "500"))
+
+# Sessions still created/started with no transition for this long are cancelled by a periodic job
+SESSION_IDLE_MINUTES = int(os.getenv("SESSION_IDLE_MINUTES", str(12 * 60)))
+SESSION_SWEEP_INTERVAL_SECONDS = float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "300"))
+SESSION_SWEEP_BATCH_SIZE = int(os.getenv("SESSION_SWEEP_BATCH_SIZE", "500"))
+
+# Starting a session requires the caller's latest position (no older than the max age) within this radius of it
+CHECKIN_RADIUS_M = int(os.getenv("CHECKIN_RADIUS_M", "200"))
+CHECKIN_MAX_POSITION_AGE_SECONDS = int(os.getenv("CHECKIN_MAX_POSITION_AGE_SECONDS", str(5 * 60)))
+
+# WebSocket sends go through a bounded queue per connection. When a slow client's queue is full,
+# status frames are dropped; other frames are dropped too ("drop") or the client is disconnected ("disconnect")
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_OVERFLOW_POLICY = os.getenv("WS_OVERFLOW_POLICY", "disconnect")
+
+# How WebSocket broadcasts reach connections on other workers: memory (single worker) | redis
+WS_BROKER = os.getenv("WS_BROKER", "memory")
+
+# Chat messages are committed in groups: every N ms, or sooner once M messages are waiting
+CHAT_FLUSH_INTERVAL_MS = float(os.getenv("CHAT_FLUSH_INTERVAL_MS", "5"))
+CHAT_FLUSH_MAX_MESSAGES = int(os.getenv("CHAT_FLUSH_MAX_MESSAGES", "256"))
+
+# GET /metrics is off unless a token is set; scrapers send it as "Authorization: Bearer <token>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
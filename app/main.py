@@ -1,6 +1,16 @@
-from fastapi import FastAPI
-from app.routers import auth, profile, admin, location, matchmaking, session, chat, notification, review, media, admin_service
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm.exc import StaleDataError
+from app.routers import auth, profile, admin, location, matchmaking, session, chat, notification, review, media, admin_service, metrics
 from fastapi.staticfiles import StaticFiles
+from app.database import SessionLocal
+from app.services.location import warm_location_backend, location_buffer
+from app.services.matchmaking import expire_stale_matches
+from app.services.session import cancel_abandoned_sessions
+from app.services.chat import message_writer
+from app.utils.scheduler import scheduler
+from app.utils.websocket import manager
+from app.config import MATCH_EXPIRY_INTERVAL_SECONDS, SESSION_SWEEP_INTERVAL_SECONDS
 
 
 app = FastAPI()
@@ -8,6 +18,64 @@ app = FastAPI()
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 
+@app.exception_handler(StaleDataError)
+def version_conflict(request: Request, exc: StaleDataError):
+    # Another request changed the same row (version_id_col) between our read and write
+    return JSONResponse(status_code=409, content={"detail": "This record was modified by another request. Please retry."})
+
+
+@app.on_event("startup")
+def load_live_locations():
+    db = SessionLocal()
+    try:
+        warm_location_backend(db)
+    finally:
+        db.close()
+
+
+def expire_matches_job():
+    db = SessionLocal()
+    try:
+        expire_stale_matches(db)
+    finally:
+        db.close()
+
+
+def cancel_abandoned_sessions_job():
+    db = SessionLocal()
+    try:
+        cancel_abandoned_sessions(db)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+def start_scheduler():
+    scheduler.add("expire_stale_matches", expire_matches_job, MATCH_EXPIRY_INTERVAL_SECONDS)
+    scheduler.add("cancel_abandoned_sessions", cancel_abandoned_sessions_job, SESSION_SWEEP_INTERVAL_SECONDS)
+    scheduler.start()
+
+
+@app.on_event("shutdown")
+def flush_location_writes():
+    location_buffer.stop()
+
+
+@app.on_event("shutdown")
+def flush_chat_writes():
+    message_writer.stop()
+
+
+@app.on_event("shutdown")
+def stop_scheduler():
+    scheduler.stop()
+
+
+@app.on_event("shutdown")
+async def close_websocket_broker():
+    await manager.broker.close()
+
+
 
 
 app.include_router(auth.router)
@@ -20,4 +88,5 @@ app.include_router(chat.router)
 app.include_router(notification.router)
 app.include_router(review.router)
 app.include_router(media.router)
-app.include_router(admin_service.router)
\ No newline at end of file
+app.include_router(admin_service.router)
+app.include_router(metrics.router)
\ No newline at end of file
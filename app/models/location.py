@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime
+from sqlalchemy import Column, String, Float, DateTime, Index
 from app.database import Base
 import datetime
 
@@ -8,4 +8,10 @@ class UserLocation(Base):
     user_id = Column(String, primary_key=True, index=True)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
+    geohash = Column(String, nullable=True, index=True)  # kept current by update_user_location
     updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        # Bounding-box range predicates for nearby search
+        Index("ix_locations_lat_lng_updated_at", "latitude", "longitude", "updated_at"),
+    )
@@ -15,7 +15,7 @@ class MatchRequest(Base):
     accepted_at = Column(DateTime, nullable=True)
 '''
 
-from sqlalchemy import Column, String, DateTime, Float
+from sqlalchemy import Column, String, DateTime, Float, Integer, Index
 from app.database import Base
 import datetime
 
@@ -28,10 +28,25 @@ class MatchRequest(Base):
     
     request_type = Column(String, nullable=False)  # photo or video
     distance = Column(String, nullable=False)      # like '100m', '500m', '1km'
+    distance_m = Column(Integer, nullable=True)    # distance in meters, for SQL predicates
     details = Column(String, nullable=True)        # optional details input by user
     latitude = Column(Float, nullable=False)       # latitude of requester
     longitude = Column(Float, nullable=False)      # longitude of requester
 
+    # Shared by the sibling requests of one dispatch; the first to accept expires the rest
+    dispatch_id = Column(String, nullable=True, index=True)
+
     status = Column(String, default="pending")      # pending | accepted | declined | expired
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     accepted_at = Column(DateTime, nullable=True)
+    # Optimistic concurrency: every ORM UPDATE checks and bumps it (StaleDataError -> 409);
+    # bulk Core UPDATEs in app.services.matchmaking bump it themselves
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+
+    __table_args__ = (
+        # get_user_matches: one index range scan per side of the match
+        Index("ix_match_requests_requester_status_created", "requester_id", "status", "created_at"),
+        Index("ix_match_requests_receiver_status_created", "receiver_id", "status", "created_at"),
+    )
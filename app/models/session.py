@@ -1,7 +1,10 @@
-from sqlalchemy import Column, String, DateTime, JSON
+from sqlalchemy import Column, String, DateTime, JSON, Integer, Index, bindparam
 from app.database import Base
 import datetime
 
+# Sessions that are still in progress; everything else is finished history
+ACTIVE_SESSION_STATUSES = ("created", "started")
+
 class Session(Base):
     __tablename__ = "sessions"
 
@@ -14,3 +17,28 @@ class Session(Base):
     check_in_time = Column(DateTime, nullable=True)
     check_out_time = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    # Optimistic concurrency: every ORM UPDATE checks and bumps it (StaleDataError -> 409)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+def is_active_session():
+    """
+    Filter matching the partial indexes below. The statuses are rendered
+    inline: SQLite only uses a partial index when the query's WHERE
+    provably implies the index's, which bound parameters never do.
+    """
+    return Session.status.in_(bindparam("active_statuses", ACTIVE_SESSION_STATUSES, expanding=True, literal_execute=True))
+
+
+# Partial indexes: "my active session" lookups only ever touch in-progress rows.
+# status is indexed too so the planner prefers these over the history indexes.
+Index("ix_sessions_active_requester", Session.requester_id, Session.status, sqlite_where=Session.status.in_(ACTIVE_SESSION_STATUSES))
+Index("ix_sessions_active_helper", Session.helper_id, Session.status, sqlite_where=Session.status.in_(ACTIVE_SESSION_STATUSES))
+# Abandoned-session sweep: oldest untouched in-progress sessions first
+Index("ix_sessions_active_updated", Session.updated_at, sqlite_where=Session.status.in_(ACTIVE_SESSION_STATUSES))
+# Keyset-paginated history per participant
+Index("ix_sessions_requester_created", Session.requester_id, Session.created_at)
+Index("ix_sessions_helper_created", Session.helper_id, Session.created_at)
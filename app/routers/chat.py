@@ -1,7 +1,7 @@
 from fastapi import APIRouter, WebSocket, Depends
 from sqlalchemy.orm import Session as DBSession
 from app.dependencies import get_db
-from app.services.chat import save_message, get_messages_for_session
+from app.services.chat import message_writer, get_messages_for_session
 from app.schemas.chat import MessageCreate, MessageOut
 from app.utils.websocket import manager
 import json
@@ -11,7 +11,7 @@ router = APIRouter(prefix="/chat", tags=["Chat Service"])
 
 
 @router.websocket("/ws/{session_id}/{sender_id}")
-async def websocket_endpoint(websocket: WebSocket, session_id: str, sender_id: str, db: DBSession = Depends(get_db)):
+async def websocket_endpoint(websocket: WebSocket, session_id: str, sender_id: str):
     await manager.connect(session_id, websocket)
     try:
         while True:
@@ -29,12 +29,13 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str, sender_id: s
                     content=parsed_data.get("content"),
                     message_type=parsed_data.get("message_type", "text")
                 )
-                saved_msg = save_message(db, msg)
+                # Written on the message writer thread; the ACK waits for the commit, the event loop does not
+                saved_msg = await message_writer.submit(msg)
                 saved_msg_timestamp = saved_msg.timestamp.isoformat()
                 print(saved_msg_timestamp)
 
                 # 2️⃣ Send ACK to sender
-                await websocket.send_text(json.dumps({
+                await manager.send(websocket, json.dumps({
                     "type": "ack",
                     "message_id": saved_msg.message_id,
                     "timestamp": str(saved_msg_timestamp),
@@ -42,7 +43,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str, sender_id: s
                 }))
 
                 # 3️⃣ Broadcast chat message to other clients
-                await manager.send_personal_message(json.dumps({
+                await manager.broadcast(json.dumps({
                     "type": "chat",
                     "sender_id": sender_id,
                     "content": saved_msg.content,
@@ -50,28 +51,28 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str, sender_id: s
                     "message_type": saved_msg.message_type,
                     "timestamp": str(saved_msg_timestamp),
                     "status": "delivered"
-                }), session_id)
+                }), session_id, exclude=websocket)
 
             # 4️⃣ Handle DELIVERED status from receiver
             elif msg_type == "delivered":
-                await manager.send_personal_message(json.dumps({
+                await manager.broadcast(json.dumps({
                     "type": "status",
                     "message_id": parsed_data["message_id"],
                     "status": "delivered"
-                }), session_id)
+                }), session_id, exclude=websocket, coalesce_key=f"status:{parsed_data['message_id']}")
 
             # 5️⃣ Handle READ status from receiver
             elif msg_type == "read":
-                await manager.send_personal_message(json.dumps({
+                await manager.broadcast(json.dumps({
                     "type": "status",
                     "message_id": parsed_data["message_id"],
                     "status": "read"
-                }), session_id)
+                }), session_id, exclude=websocket, coalesce_key=f"status:{parsed_data['message_id']}")
 
     except Exception as e:
         print("WebSocket Error:", e)
     finally:
-        manager.disconnect(session_id)
+        manager.disconnect(session_id, websocket)
 
 
 @router.get("/messages/{session_id}")
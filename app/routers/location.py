@@ -1,12 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from app.dependencies import get_db, get_current_user
-from app.schemas.location import LocationCreate, LocationOut , NearbyUserOut
-from app.services.location import update_user_location, get_nearby_users
-from typing import List
+from app.database import SessionLocal
+from app.dependencies import get_db, get_current_user, get_user_from_token
+from app.schemas.location import LocationCreate, LocationOut , NearbyUserOut, NearestHelpersPage
+from app.services.location import (
+    update_user_location, get_nearby_users, get_nearest_helpers, find_nearby_helpers, get_user_position
+)
+from app.utils.nearby_stream import nearby_stream
+from typing import List, Optional
 from app.models.user import User
+import asyncio
+import json
+
+# Idle period after which a live nearby stream drops helpers that stopped reporting
+NEARBY_SWEEP_SECONDS = 30
 
 router = APIRouter(prefix="/location", tags=["Location"])
+
+
+def _in_session(work, *args):
+    """
+    Run work(db, *args) on its own short-lived session. Long-lived sockets
+    must not hold a pooled connection between queries.
+    """
+    db = SessionLocal()
+    try:
+        return work(db, *args)
+    finally:
+        db.close()
+
 '''
 @router.post("/update", response_model=LocationOut)
 def update_location(location: LocationCreate, db: Session = Depends(get_db)):
@@ -36,3 +59,122 @@ def get_nearby(
 ):
     # Optionally, we could check if user_id == current_user.id
     return get_nearby_users(db, user_id, radius_km)
+
+@router.get("/nearest/{user_id}", response_model=NearestHelpersPage)
+def get_nearest(
+    user_id: str,
+    k: int = Query(20, gt=0, le=100),
+    cursor: Optional[str] = None,
+    max_km: Optional[float] = Query(None, gt=0),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        return get_nearest_helpers(db, user_id, k, cursor, max_km)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.websocket("/ws/nearby/{user_id}")
+async def nearby_ws(
+    websocket: WebSocket,
+    user_id: str,
+    token: str,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    radius_km: float = 5
+):
+    """
+    Live map of available helpers around a point. Sends a snapshot first,
+    then enter / move / leave deltas as helpers report positions or toggle
+    availability. Without latitude/longitude the user's last known position
+    is used. Send {"type": "subscribe", "latitude", "longitude", "radius_km"}
+    to recenter.
+    """
+    db = SessionLocal()
+    try:
+        user = get_user_from_token(token, db)
+    finally:
+        db.close()
+    if user is None or user.id != user_id or radius_km <= 0:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    if latitude is None or longitude is None:
+        position = await run_in_threadpool(_in_session, get_user_position, user_id)
+        if position is None:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        latitude, longitude = position.latitude, position.longitude
+
+    await websocket.accept()
+    loop = asyncio.get_running_loop()
+    send_lock = asyncio.Lock()
+
+    async def subscribe(lat, lng, radius):
+        # Deltas queue up on the new subscription while the snapshot is built
+        # and are sent after it; they are upserts, so replaying one the
+        # snapshot already reflects is harmless
+        subscription = nearby_stream.subscribe(user_id, lat, lng, radius, asyncio.Queue(), loop=loop)
+        helpers = await run_in_threadpool(_in_session, find_nearby_helpers, lat, lng, radius, user_id)
+        nearby_stream.seed(subscription, [helper.user_id for helper in helpers])
+        await websocket.send_text(json.dumps({
+            "type": "snapshot",
+            "latitude": lat,
+            "longitude": lng,
+            "radius_km": radius,
+            "helpers": [helper.dict() for helper in helpers]
+        }, default=str))
+        return subscription
+
+    subscription = await subscribe(latitude, longitude, radius_km)
+
+    async def send_deltas():
+        # The sweep runs on its own clock, so a busy stream still gets leave
+        # for helpers whose presence expired
+        next_sweep = loop.time() + NEARBY_SWEEP_SECONDS
+        while True:
+            current = subscription
+            if loop.time() >= next_sweep:
+                nearby_stream.sweep(current)
+                next_sweep = loop.time() + NEARBY_SWEEP_SECONDS
+            try:
+                message = await asyncio.wait_for(current.queue.get(), timeout=next_sweep - loop.time())
+            except asyncio.TimeoutError:
+                continue
+            async with send_lock:
+                # None wakes us after a recenter; drop whatever the old area still had queued
+                if message is not None and current is subscription:
+                    await websocket.send_text(json.dumps(message))
+
+    sender = asyncio.create_task(send_deltas())
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                data = json.loads(text)
+                if not isinstance(data, dict):
+                    raise ValueError
+                if data.get("type") != "subscribe":
+                    continue
+                lat = float(data["latitude"])
+                lng = float(data["longitude"])
+                radius = float(data.get("radius_km", subscription.radius_km))
+                if radius <= 0:
+                    raise ValueError
+            except (KeyError, TypeError, ValueError):
+                # Also not JSON (JSONDecodeError is a ValueError) or not an object
+                async with send_lock:
+                    await websocket.send_text(json.dumps({"type": "error", "detail": "Invalid subscribe message"}))
+                continue
+
+            async with send_lock:
+                previous = subscription
+                nearby_stream.unsubscribe(previous)
+                subscription = await subscribe(lat, lng, radius)
+                previous.queue.put_nowait(None)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        nearby_stream.unsubscribe(subscription)
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.dependencies import get_db, get_current_user
-from app.schemas.matchmaking import MatchRequestCreate, MatchRequestUpdate, MatchRequestOut
-from app.services.matchmaking import create_match_request, respond_to_match, get_user_matches
-from typing import List
+from app.schemas.matchmaking import MatchRequestCreate, MatchRequestUpdate, MatchRequestOut, MatchDispatchCreate, MatchDispatchOut, RankedHelperOut
+from app.services.matchmaking import create_match_request, dispatch_match_request, respond_to_match, get_user_matches
+from app.services.ranking import get_ranked_helpers
+from typing import List, Optional
 from app.models.user import User
 
 router = APIRouter(prefix="/matchmaking", tags=["Matchmaking"])
@@ -19,6 +20,16 @@ def create_request(
     return create_match_request(db, match_data)
 
 
+@router.post("/dispatch", response_model=MatchDispatchOut)
+def dispatch_request(
+    dispatch_data: MatchDispatchCreate,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    if dispatch_data.requester_id != current_user.id:
+        raise HTTPException(status_code=403, detail="You can only create matches for yourself.")
+    return dispatch_match_request(db, dispatch_data)
+
 @router.post("/respond/{match_id}", response_model=MatchRequestOut)
 def respond(
     match_id: str,
@@ -41,4 +52,20 @@ def my_matches(
 ):
     if user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Forbidden to access others' matches")
-    return get_user_matches(db, user_id)
\ No newline at end of file
+    return get_user_matches(db, user_id)
+
+
+@router.get("/ranked/{user_id}", response_model=List[RankedHelperOut])
+def ranked_helpers(
+    user_id: str,
+    radius_km: float = Query(5, gt=0),
+    limit: int = Query(10, gt=0, le=50),
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    # Best helpers first: distance, rating, experience, verification and responsiveness
+    if user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Forbidden to rank helpers for others")
+    return get_ranked_helpers(db, user_id, radius_km, limit, latitude, longitude)
@@ -0,0 +1,28 @@
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from app.utils.metrics import metrics
+from app.config import METRICS_TOKEN
+
+router = APIRouter(tags=["Metrics"])
+
+
+def verify_metrics_token(authorization: Optional[str] = Header(None)):
+    # Internal counters and timings: hidden entirely unless METRICS_TOKEN is configured
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(verify_metrics_token)])
+def export_metrics():
+    # Prometheus text format; counts are per worker process
+    return metrics.render()
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from app.dependencies import get_db
 from app.schemas.notification import NotificationCreate, NotificationOut
 from app.services.notification import create_notification, get_notifications, mark_notification_read
+from app.utils.websocket import manager
 from typing import List
 
 
@@ -18,7 +19,7 @@ async def notifications_ws(websocket: WebSocket, user_id: str):
     except Exception as e:
         print("Notification WS Error:", e)
     finally:
-        manager.disconnect(user_id)
+        manager.disconnect(user_id, websocket)
 
 @router.post("/", response_model=NotificationOut)
 def send_notification(notification: NotificationCreate, db: Session = Depends(get_db)):
@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from app.dependencies import get_db, get_current_user
 from app.schemas.profile import UserProfileCreate, UserProfileOut, UserProfileUpdate, UserEditableProfileUpdate
 from app.services.profile import create_user_profile, get_user_profile, update_user_profile, delete_user_profile
+from app.services.location import notify_availability_changed
 from app.models.user import User
 
 router = APIRouter(prefix="/profiles", tags=["Profiles"])
@@ -43,11 +44,17 @@ def update_user_profile(user_id: str, profile_update: UserEditableProfileUpdate,
         db_profile.country = profile_update.country
     if profile_update.avatar_url is not None:
         db_profile.avatar_url = profile_update.avatar_url
+    availability_changed = False
     if hasattr(profile_update, "is_available") and profile_update.is_available is not None:
+        availability_changed = db_profile.is_available != profile_update.is_available
         db_profile.is_available = profile_update.is_available
 
     db.commit()
     db.refresh(db_profile)
+
+    # Live nearby maps add or drop the helper right away
+    if availability_changed:
+        notify_availability_changed(db, user_id, db_profile.is_available)
     return db_profile
 '''
 @router.put("/{user_id}", response_model=UserProfileOut)
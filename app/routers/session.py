@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session as DBSession
+from typing import Optional
 from app.dependencies import get_db, get_current_user
-from app.schemas.session import SessionCreate, SessionUpdateStatus, SessionOut
-from app.services.session import create_session, update_session_status, get_session_by_match_id
+from app.schemas.session import SessionCreate, SessionUpdateStatus, SessionOut, SessionHistoryPage
+from app.services.session import create_session, update_session_status, get_session_by_match_id, get_my_sessions
 from app.models.user import User
 from app.models.session import Session
 
@@ -40,3 +41,16 @@ def get_by_match(match_id: str, db: DBSession = Depends(get_db), current_user: U
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not authorized to view this session")
 
     return session
+
+
+@router.get("/mine", response_model=SessionHistoryPage)
+def get_mine(
+    limit: int = Query(20, gt=0, le=100),
+    cursor: Optional[str] = None,
+    db: DBSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        return get_my_sessions(db, current_user.id, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -17,4 +17,4 @@ class MessageOut(BaseModel):
     message_type: str
 
     class Config:
-        orm_mode = True
+        from_attributes = True
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 
 class LocationCreate(BaseModel):
     user_id: str
@@ -35,4 +35,12 @@ class NearbyUserOut(BaseModel):
     profile: Optional[ProfileForNearbyUser] = None
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class NearestHelperOut(NearbyUserOut):
+    distance_km: float
+
+
+class NearestHelpersPage(BaseModel):
+    results: List[NearestHelperOut]
+    next_cursor: Optional[str] = None  # opaque; pass back to fetch the next page
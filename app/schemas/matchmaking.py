@@ -25,19 +25,58 @@ class MatchRequestOut(BaseModel):
 
 # src/schemas/matchmaking.py
 
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Optional
 from datetime import datetime
+from app.schemas.location import NearestHelperOut
+from app.utils.distance import parse_distance_m, format_distance
 
-class MatchRequestCreate(BaseModel):
+class DistanceInput(BaseModel):
+    # Either form is accepted while clients move to distance_m; both end up filled in.
+    # Free-text distances that do not parse are stored as sent, with distance_m left empty.
+    distance: Optional[str] = None            # like '100m', '500m', '1km'
+    distance_m: Optional[int] = Field(None, gt=0)
+
+    @model_validator(mode="after")
+    def fill_distance(self):
+        if self.distance is None:
+            if self.distance_m is None:
+                raise ValueError("distance or distance_m is required")
+            self.distance = format_distance(self.distance_m)
+            return self
+        try:
+            parsed = round(parse_distance_m(self.distance))
+        except ValueError:
+            return self
+        if self.distance_m is None:
+            self.distance_m = parsed
+        elif parsed != self.distance_m:
+            raise ValueError("distance and distance_m disagree")
+        return self
+
+class MatchRequestCreate(DistanceInput):
     requester_id: str
     receiver_id: str  # ✅ Now required at creation
     request_type: str  # ✅ Photo or Video
-    distance: str      # ✅ like '100m', '500m', etc.
     details: Optional[str] = None
     latitude: float
     longitude: float
 
+class MatchDispatchCreate(DistanceInput):
+    requester_id: str
+    request_type: str
+    details: Optional[str] = None
+    latitude: float
+    longitude: float
+    max_helpers: int = Field(5, gt=0, le=20)
+
+    @model_validator(mode="after")
+    def require_distance_m(self):
+        # The search radius comes from distance_m
+        if self.distance_m is None:
+            raise ValueError(f"Invalid distance: {self.distance!r}")
+        return self
+
 class MatchRequestUpdate(BaseModel):
     status: str  # accepted | declined
 
@@ -47,12 +86,21 @@ class MatchRequestOut(BaseModel):
     receiver_id: str
     request_type: str
     distance: str
+    distance_m: Optional[int] = None
     details: Optional[str]
     latitude: float
     longitude: float
+    dispatch_id: Optional[str] = None
     status: str
     created_at: datetime
     accepted_at: Optional[datetime]
 
     class Config:
-        orm_mode = True
+        from_attributes = True
+
+class MatchDispatchOut(BaseModel):
+    dispatch_id: str
+    matches: List[MatchRequestOut]
+
+class RankedHelperOut(NearestHelperOut):
+    score: float  # higher is better; see app.services.ranking
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from datetime import datetime
 from enum import Enum
 
@@ -33,4 +33,10 @@ class SessionOut(BaseModel):
     created_at: datetime
 
     class Config:
-        orm_mode = True
+        from_attributes = True
+
+
+class SessionHistoryPage(BaseModel):
+    active: Optional[SessionOut] = None  # only on the first page
+    history: List[SessionOut]
+    next_cursor: Optional[str] = None  # opaque; pass back to fetch the next page
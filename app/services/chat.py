@@ -1,27 +1,142 @@
 from sqlalchemy.orm import Session as DBSession
+from sqlalchemy import insert
+from app.database import SessionLocal
 from app.models.chat import Message
-from app.schemas.chat import MessageCreate
+from app.schemas.chat import MessageCreate, MessageOut
+from app.utils.metrics import metrics
+from app.config import CHAT_FLUSH_INTERVAL_MS, CHAT_FLUSH_MAX_MESSAGES
+from typing import List, Optional
+import asyncio
+import concurrent.futures
+import queue
+import threading
+import time
 import uuid
 import datetime
 
-def save_message(db: DBSession, message_data: MessageCreate):
-    # Idempotency check
-    existing = db.query(Message).filter_by(message_id=message_data.message_id).first()
-    if existing:
-        return existing
-
-    message = Message(
-        message_id=message_data.message_id or str(uuid.uuid4()),
-        session_id=message_data.session_id,
-        sender_id=message_data.sender_id,
-        content=message_data.content,
-        message_type=message_data.message_type,
-        timestamp=datetime.datetime.utcnow()
-    )
-    db.add(message)
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+MESSAGE_LOOKUP_CHUNK = 500
+
+def save_messages(db: DBSession, messages: List[MessageCreate],
+                  timestamps: Optional[List[datetime.datetime]] = None) -> List[Message]:
+    """
+    Store many messages with one executemany INSERT OR IGNORE and one
+    commit. A message_id that is already stored keeps its original row
+    (idempotent retries). Returns the stored row for each message, in order.
+    """
+    now = datetime.datetime.utcnow()
+    rows = [
+        {
+            "message_id": message.message_id or str(uuid.uuid4()),
+            "session_id": message.session_id,
+            "sender_id": message.sender_id,
+            "content": message.content,
+            "message_type": message.message_type,
+            "timestamp": timestamps[i] if timestamps else now,
+        }
+        for i, message in enumerate(messages)
+    ]
+    if not rows:
+        return []
+    db.execute(insert(Message).prefix_with("OR IGNORE"), rows)
     db.commit()
-    db.refresh(message)
-    return message
+
+    message_ids = list({row["message_id"] for row in rows})
+    stored = {}
+    for start in range(0, len(message_ids), MESSAGE_LOOKUP_CHUNK):
+        chunk = message_ids[start:start + MESSAGE_LOOKUP_CHUNK]
+        stored.update((message.message_id, message) for message in db.query(Message).filter(Message.message_id.in_(chunk)))
+    return [stored[row["message_id"]] for row in rows]
+
+
+def save_message(db: DBSession, message_data: MessageCreate):
+    return save_messages(db, [message_data])[0]
+
+
+class MessageWriter:
+    """
+    Group commit for chat messages, on a dedicated thread so the event loop
+    never waits on SQLite.
+
+    The first message waiting opens a batch; the batch is written once
+    flush_interval_ms has passed or max_messages are in it, across all
+    sessions, as one INSERT and one commit. submit() returns an awaitable
+    that resolves to the stored message (MessageOut) once its batch is
+    committed, or raises what the write raised. stop() finishes everything
+    already submitted.
+    """
+
+    def __init__(self, session_factory=SessionLocal, flush_interval_ms: float = CHAT_FLUSH_INTERVAL_MS,
+                 max_messages: int = CHAT_FLUSH_MAX_MESSAGES):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_messages = max_messages
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, message: MessageCreate) -> "asyncio.Future[MessageOut]":
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="chat-message-writer", daemon=True)
+                self._thread.start()
+            # Stamped on arrival so a batch keeps the order messages were sent in
+            self._queue.put((message, datetime.datetime.utcnow(), future))
+        return asyncio.wrap_future(future)
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_messages:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+
+    def _write(self, batch):
+        # Callers that went away (e.g. disconnected) are skipped; their retry is idempotent
+        batch = [(message, timestamp, future) for message, timestamp, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        db = self.session_factory()
+        try:
+            with metrics.timer("chat_flush_seconds"):
+                stored = save_messages(db, [message for message, _, _ in batch], [timestamp for _, timestamp, _ in batch])
+        except Exception as e:
+            db.rollback()
+            print("Chat message flush failed:", e)
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        else:
+            for (_, _, future), message in zip(batch, stored):
+                future.set_result(MessageOut.model_validate(message))
+        finally:
+            db.close()
+        metrics.increment("chat_messages_written_total", len(batch))
+
+
+message_writer = MessageWriter()
 
 '''
 def get_messages_for_session(db: DBSession, session_id: str):
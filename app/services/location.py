@@ -1,31 +1,293 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import or_, and_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.database import SessionLocal
 from app.models.location import UserLocation
-from app.schemas.location import LocationCreate
-from app.utils.geolocation import calculate_distance
+from app.schemas.location import (
+    LocationCreate, LocationOut, NearbyUserOut, ProfileForNearbyUser, NearestHelperOut, NearestHelpersPage
+)
 from app.models.profile import UserProfile  
 from app.schemas.profile import UserProfileOut  
+import base64
 import datetime
-from app.utils.distance import calculate_distance
+import itertools
+import json
+import threading
+from app.utils.distance import calculate_distance, bounding_box, distances_within
+from app.utils import geohash
+from app.utils.presence import (
+    presence, LocationBackend, Position, RedisLocationBackend, PRESENCE_TTL_SECONDS, MAX_SEARCH_KM, closest_first
+)
+from app.utils.nearby_stream import nearby_stream
+from app.config import LOCATION_BACKEND, REDIS_URL, LOCATION_FLUSH_INTERVAL_MS, LOCATION_FLUSH_MAX_ENTRIES
 from typing import List
 
+# Stored geohash precision (~5m cells); nearby search scans coarser prefixes of it
+GEOHASH_PRECISION = 9
 
-def update_user_location(db: Session, location: LocationCreate):
-    db_location = db.query(UserLocation).filter(UserLocation.user_id == location.user_id).first()
-    if db_location:
-        db_location.latitude = location.latitude
-        db_location.longitude = location.longitude
-        db_location.updated_at = datetime.datetime.utcnow()
-    else:
-        db_location = UserLocation(
-            user_id=location.user_id,
-            latitude=location.latitude,
-            longitude=location.longitude,
-            updated_at=datetime.datetime.utcnow()
-        )
-        db.add(db_location)
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+PROFILE_BATCH_SIZE = 500
+
+# Candidates pulled from the nearest-first iterator per availability check
+NEAREST_SCAN_BATCH = 64
+
+
+def _upsert_locations(db: Session, positions):
+    """Write many positions in one executemany INSERT ... ON CONFLICT and one commit."""
+    statement = sqlite_insert(UserLocation)
+    statement = statement.on_conflict_do_update(
+        index_elements=[UserLocation.user_id],
+        set_={
+            "latitude": statement.excluded.latitude,
+            "longitude": statement.excluded.longitude,
+            "geohash": statement.excluded.geohash,
+            "updated_at": statement.excluded.updated_at,
+        },
+        # Never let an older ping overwrite a newer one
+        where=statement.excluded.updated_at >= UserLocation.updated_at
+    )
+    db.execute(statement, [
+        {
+            "user_id": position.user_id,
+            "latitude": position.latitude,
+            "longitude": position.longitude,
+            "geohash": geohash.encode(position.latitude, position.longitude, GEOHASH_PRECISION),
+            "updated_at": position.updated_at,
+        }
+        for position in positions
+    ])
     db.commit()
-    db.refresh(db_location)
-    return db_location
+
+
+class LocationWriteBuffer:
+    """
+    Write-behind buffer for location pings.
+
+    Only the latest position per user is kept. A background thread flushes
+    the buffer as one bulk upsert every flush_interval_ms, or sooner once
+    max_entries users are waiting. Buffered (and in-flight) positions stay
+    readable through get() and pending() until they are committed, and
+    stop() flushes everything on shutdown.
+    """
+
+    def __init__(self, session_factory=SessionLocal, flush_interval_ms: int = LOCATION_FLUSH_INTERVAL_MS,
+                 max_entries: int = LOCATION_FLUSH_MAX_ENTRIES):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_entries = max_entries
+        self._pending = {}
+        self._inflight = {}
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+
+    def submit(self, position):
+        with self._condition:
+            self._pending[position.user_id] = position
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="location-write-buffer", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def get(self, user_id: str):
+        with self._condition:
+            return self._pending.get(user_id) or self._inflight.get(user_id)
+
+    def pending(self):
+        """Every position not yet committed, latest per user."""
+        with self._condition:
+            merged = dict(self._inflight)
+            merged.update(self._pending)
+        return list(merged.values())
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._condition:
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            if not batch:
+                return 0
+
+            db = self.session_factory()
+            try:
+                _upsert_locations(db, batch.values())
+            except Exception as e:
+                db.rollback()
+                print("Location flush failed:", e)
+                # Keep anything not superseded for the next flush
+                with self._condition:
+                    for user_id, position in batch.items():
+                        self._pending.setdefault(user_id, position)
+                return 0
+            finally:
+                db.close()
+                with self._condition:
+                    self._inflight = {}
+            return len(batch)
+
+    def stop(self):
+        """Flush everything still buffered and stop the thread (called on shutdown)."""
+        with self._condition:
+            thread = self._thread
+            self._thread = None
+            self._stopping = True
+            self._condition.notify()
+        if thread is not None and thread.is_alive():
+            thread.join()
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._stopping)
+                # Coalesce pings until the interval elapses or the buffer is full
+                self._condition.wait_for(
+                    lambda: len(self._pending) >= self.max_entries or self._stopping,
+                    timeout=self.flush_interval
+                )
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+
+class SqlLocationBackend(LocationBackend):
+    """
+    Live positions read from the locations table, written through the
+    write-behind buffer. Reads overlay positions still sitting in the buffer.
+    """
+
+    persists = True
+
+    def __init__(self, buffer: LocationWriteBuffer, session_factory=SessionLocal):
+        self.buffer = buffer
+        self.session_factory = session_factory
+
+    def upsert(self, user_id: str, latitude: float, longitude: float, updated_at=None):
+        position = Position(user_id, latitude, longitude, updated_at or datetime.datetime.utcnow())
+        self.buffer.submit(position)
+        return position
+
+    def get(self, user_id: str):
+        recent_threshold = datetime.datetime.utcnow() - datetime.timedelta(seconds=PRESENCE_TTL_SECONDS)
+        buffered = self.buffer.get(user_id)
+        if buffered is not None:
+            return buffered if buffered.updated_at >= recent_threshold else None
+
+        db = self.session_factory()
+        try:
+            row = db.query(UserLocation).filter(
+                UserLocation.user_id == user_id,
+                UserLocation.updated_at >= recent_threshold
+            ).first()
+            if not row:
+                return None
+            return Position(row.user_id, row.latitude, row.longitude, row.updated_at)
+        finally:
+            db.close()
+
+    def remove(self, user_id: str):
+        self.buffer.flush()
+        db = self.session_factory()
+        try:
+            db.query(UserLocation).filter(UserLocation.user_id == user_id).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    def nearby(self, latitude: float, longitude: float, radius_km: float, exclude=None):
+        db = self.session_factory()
+        try:
+            hits = {
+                row.user_id: (row, distance)
+                for row, distance in _nearby_from_db(db, latitude, longitude, radius_km, exclude)
+            }
+        finally:
+            db.close()
+
+        # Buffered positions win over the table: they may move users in or out of range
+        recent_threshold = datetime.datetime.utcnow() - datetime.timedelta(seconds=PRESENCE_TTL_SECONDS)
+        buffered = [
+            position for position in self.buffer.pending()
+            if position.user_id != exclude and position.updated_at >= recent_threshold
+        ]
+        if buffered:
+            distances, in_radius = distances_within(
+                latitude, longitude,
+                [position.latitude for position in buffered],
+                [position.longitude for position in buffered],
+                radius_km
+            )
+            for position, distance, inside in zip(buffered, distances, in_radius):
+                if inside:
+                    hits[position.user_id] = (position, float(distance))
+                else:
+                    hits.pop(position.user_id, None)
+
+        return closest_first(list(hits.values()))
+
+
+def create_location_backend(name: str = LOCATION_BACKEND) -> LocationBackend:
+    if name == "memory":
+        return presence
+    if name == "sql":
+        return SqlLocationBackend(location_buffer)
+    if name == "redis":
+        import redis
+        return RedisLocationBackend(redis.Redis.from_url(REDIS_URL, decode_responses=True))
+    raise ValueError(f"Unknown location backend: {name}")
+
+
+location_buffer = LocationWriteBuffer()
+location_backend = create_location_backend()
+sql_location_backend = SqlLocationBackend(location_buffer)
+
+
+def _active_backend() -> LocationBackend:
+    # Live users come from the configured backend once it is warm; the SQL scan is the fallback
+    return location_backend if location_backend.is_warm else sql_location_backend
+
+
+def update_user_location(db: Session, location: LocationCreate):
+    position = location_backend.upsert(location.user_id, location.latitude, location.longitude)
+    if not location_backend.persists:
+        location_buffer.submit(position)
+
+    nearby_stream.position_changed(
+        position.user_id, position.latitude, position.longitude,
+        lambda: _is_available(db, position.user_id)
+    )
+    return LocationOut(
+        user_id=position.user_id,
+        latitude=position.latitude,
+        longitude=position.longitude,
+        updated_at=position.updated_at
+    )
+
+
+def _is_available(db: Session, user_id: str) -> bool:
+    return db.query(UserProfile.user_id).filter(
+        UserProfile.user_id == user_id,
+        UserProfile.is_available == True
+    ).first() is not None
+
+
+def warm_location_backend(db: Session):
+    """Load locations updated within the presence TTL into a cold (in-memory) backend."""
+    if location_backend.is_warm:
+        return 0
+
+    recent_threshold = datetime.datetime.utcnow() - datetime.timedelta(seconds=PRESENCE_TTL_SECONDS)
+    rows = db.query(UserLocation).filter(
+        UserLocation.updated_at >= recent_threshold
+    ).order_by(UserLocation.updated_at.asc()).all()
+
+    for row in rows:
+        location_backend.upsert(row.user_id, row.latitude, row.longitude, row.updated_at)
+    location_backend.is_warm = True
+    return len(rows)
 
 
 '''
@@ -64,49 +326,203 @@ def get_nearby_users(db: Session, user_id: str, radius_km: float) -> List[dict]:
 
     return nearby_users
 '''
-def get_nearby_users(db: Session, user_id: str, radius_km: float) -> List[dict]:
-    user_location = db.query(UserLocation).filter(UserLocation.user_id == user_id).first()
-    if not user_location:
-        return []
 
-    now = datetime.datetime.utcnow()
-    recent_threshold = now - datetime.timedelta(minutes=5)
+def _nearby_from_db(db: Session, latitude: float, longitude: float, radius_km: float, exclude: str):
+    recent_threshold = datetime.datetime.utcnow() - datetime.timedelta(seconds=PRESENCE_TTL_SECONDS)
 
-    nearby_users = []
-    other_users = db.query(UserLocation).filter(
-        UserLocation.user_id != user_id,
+    query = db.query(
+        UserLocation.user_id,
+        UserLocation.latitude,
+        UserLocation.longitude,
+        UserLocation.updated_at,
+    ).filter(
+        UserLocation.user_id != exclude,
         UserLocation.updated_at >= recent_threshold
-    ).all()
+    )
 
-    for other_user in other_users:
-        profile = db.query(UserProfile).filter(
-            UserProfile.user_id == other_user.user_id,
+    # Only scan the geohash cells covering the radius (index range scan per cell)
+    cells = geohash.covering_cells(latitude, longitude, radius_km)
+    if cells is not None:
+        query = query.filter(or_(*[
+            and_(UserLocation.geohash >= cell, UserLocation.geohash < cell + geohash.PREFIX_UPPER_BOUND)
+            for cell in cells
+        ]))
+
+    # Trim to the lat/lng bounding box of the radius before any haversine runs
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+    query = query.filter(UserLocation.latitude.between(min_lat, max_lat))
+    if min_lng <= max_lng:
+        query = query.filter(UserLocation.longitude.between(min_lng, max_lng))
+    else:
+        # Box wraps the antimeridian
+        query = query.filter(or_(UserLocation.longitude >= min_lng, UserLocation.longitude <= max_lng))
+
+    rows = query.all()
+    if not rows:
+        return []
+
+    # Single vectorized distance pass over all candidates in the box
+    distances, in_radius = distances_within(
+        latitude, longitude,
+        [row.latitude for row in rows], [row.longitude for row in rows],
+        radius_km
+    )
+    hits = [(row, float(distance)) for row, distance, inside in zip(rows, distances, in_radius) if inside]
+    return closest_first(hits)
+
+
+def _available_profiles(db: Session, user_ids: List[str]):
+    """Profiles of available users among user_ids, batched into a few IN queries."""
+    profiles = {}
+    for start in range(0, len(user_ids), PROFILE_BATCH_SIZE):
+        batch = user_ids[start:start + PROFILE_BATCH_SIZE]
+        rows = db.query(
+            UserProfile.user_id,
+            UserProfile.name,
+            UserProfile.bio,
+            UserProfile.avatar_url,
+            UserProfile.country,
+            UserProfile.trust_badges,
+            UserProfile.total_sessions,
+            UserProfile.average_rating,
+            UserProfile.verification_status,
+        ).filter(
+            UserProfile.user_id.in_(batch),
             UserProfile.is_available == True
-        ).first()
+        ).all()
+        for row in rows:
+            profiles[row.user_id] = ProfileForNearbyUser(
+                name=row.name,
+                bio=row.bio,
+                avatar_url=row.avatar_url,
+                country=row.country,
+                trust_badges=row.trust_badges or [],
+                total_sessions=row.total_sessions or 0,
+                average_rating=row.average_rating or 0.0,
+                verification_status=row.verification_status or "pending",
+            )
+    return profiles
 
-        if not profile:
-            continue  # skip if user is not available or profile not found
 
-        distance = calculate_distance(
-            user_location.latitude, user_location.longitude,
-            other_user.latitude, other_user.longitude
+def get_user_position(db: Session, user_id: str):
+    """Latest known position of a user: the location backend first, then the locations table."""
+    position = location_backend.get(user_id) or location_buffer.get(user_id)
+    if position is not None:
+        return position
+    return db.query(UserLocation).filter(UserLocation.user_id == user_id).first()
+
+
+def find_nearby_positions(latitude: float, longitude: float, radius_km: float, exclude: str = None):
+    """[(position, distance_km)] for every live user within radius_km, closest first."""
+    return _active_backend().nearby(latitude, longitude, radius_km, exclude=exclude)
+
+
+def find_nearby_helpers(db: Session, latitude: float, longitude: float, radius_km: float,
+                        exclude: str = None) -> List[NearestHelperOut]:
+    """Available helpers within radius_km of a point, closest first."""
+    hits = find_nearby_positions(latitude, longitude, radius_km, exclude=exclude)
+    if not hits:
+        return []
+
+    profiles = _available_profiles(db, [hit.user_id for hit, _ in hits])
+
+    return [
+        NearestHelperOut(
+            user_id=hit.user_id,
+            latitude=hit.latitude,
+            longitude=hit.longitude,
+            updated_at=hit.updated_at,
+            distance_km=distance,
+            profile=profiles[hit.user_id]
         )
+        for hit, distance in hits
+        if hit.user_id in profiles
+    ]
 
-        if distance <= radius_km:
-            nearby_users.append({
-                "user_id": other_user.user_id,
-                "latitude": other_user.latitude,
-                "longitude": other_user.longitude,
-                "profile": {
-                    "name": profile.name,
-                    "bio": profile.bio,
-                    "avatar_url": profile.avatar_url,
-                    "country": profile.country,
-                    "trust_badges": profile.trust_badges,
-                    "total_sessions": profile.total_sessions,
-                    "average_rating": profile.average_rating,
-                    "verification_status": profile.verification_status,
-                }
-            })
 
-    return nearby_users
+def get_nearby_users(db: Session, user_id: str, radius_km: float) -> List[NearbyUserOut]:
+    user_location = get_user_position(db, user_id)
+    if not user_location:
+        return []
+    return find_nearby_helpers(db, user_location.latitude, user_location.longitude, radius_km, exclude=user_id)
+
+
+def notify_availability_changed(db: Session, user_id: str, is_available: bool):
+    """Push a helper's availability toggle to live nearby subscriptions."""
+    position = get_user_position(db, user_id) if is_available else None
+    nearby_stream.availability_changed(user_id, is_available, position)
+
+
+def encode_cursor(latitude: float, longitude: float, distance_km: float, user_id: str) -> str:
+    payload = json.dumps({"lat": latitude, "lng": longitude, "d": distance_km, "u": user_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """Return (latitude, longitude, distance_km, user_id); raises ValueError if malformed."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(payload["lat"]), float(payload["lng"]), float(payload["d"]), str(payload["u"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def iter_available_helpers(db: Session, nearest):
+    """
+    Narrow a closest-first stream of (position, distance_km) to available
+    helpers, checking profiles in small batches so callers that stop early
+    never look further than they need.
+    """
+    while True:
+        batch = list(itertools.islice(nearest, NEAREST_SCAN_BATCH))
+        if not batch:
+            return
+        profiles = _available_profiles(db, [position.user_id for position, _ in batch])
+        for position, distance in batch:
+            if position.user_id not in profiles:
+                continue
+            yield NearestHelperOut(
+                user_id=position.user_id,
+                latitude=position.latitude,
+                longitude=position.longitude,
+                updated_at=position.updated_at,
+                distance_km=distance,
+                profile=profiles[position.user_id]
+            )
+
+
+def find_nearest_helpers(db: Session, latitude: float, longitude: float, limit: int,
+                         max_km: float = MAX_SEARCH_KM, exclude: str = None) -> List[NearestHelperOut]:
+    """Up to limit available helpers within max_km of a point, closest first."""
+    nearest = _active_backend().iter_nearest(latitude, longitude, exclude=exclude, max_km=max_km)
+    return list(itertools.islice(iter_available_helpers(db, nearest), limit))
+
+
+def get_nearest_helpers(db: Session, user_id: str, k: int, cursor: str = None,
+                        max_km: float = None) -> NearestHelpersPage:
+    """
+    The k closest available helpers, closest first. The cursor pins the search
+    center of the first page, so later pages continue from the same point.
+    """
+    if cursor:
+        latitude, longitude, after_km, after_user = decode_cursor(cursor)
+    else:
+        user_location = get_user_position(db, user_id)
+        if not user_location:
+            return NearestHelpersPage(results=[])
+        latitude, longitude = user_location.latitude, user_location.longitude
+        after_km, after_user = None, None
+
+    nearest = _active_backend().iter_nearest(latitude, longitude, exclude=user_id, max_km=max_km or MAX_SEARCH_KM)
+    if after_km is not None:
+        # Keyset on (distance, user_id): skip everything up to the previous page's last result
+        nearest = itertools.dropwhile(lambda hit: (hit[1], hit[0].user_id) <= (after_km, after_user), nearest)
+
+    results = list(itertools.islice(iter_available_helpers(db, nearest), k + 1))
+
+    next_cursor = None
+    if len(results) > k:
+        results = results[:k]
+        last = results[-1]
+        next_cursor = encode_cursor(latitude, longitude, last.distance_km, last.user_id)
+    return NearestHelpersPage(results=results, next_cursor=next_cursor)
@@ -1,8 +1,9 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import case, exists, or_, select, union_all, update
 
+from app.database import unit_of_work
 from app.models.matchmaking import MatchRequest
-from app.schemas.matchmaking import MatchRequestCreate, MatchRequestUpdate
+from app.schemas.matchmaking import MatchRequestCreate, MatchRequestUpdate, MatchRequestOut, MatchDispatchCreate, MatchDispatchOut
 import uuid
 import datetime
 from fastapi import HTTPException
@@ -11,7 +12,10 @@ from app.schemas.session import SessionCreate
 from app.services.session import create_session
 
 from app.schemas.notification import NotificationCreate
-from app.services.notification import create_notification
+from app.services.notification import create_notification, create_notifications
+
+from app.services.location import find_nearest_helpers
+from app.config import MATCH_EXPIRY_MINUTES, MATCH_EXPIRY_BATCH_SIZE
 
 
 def create_match_request(db: Session, match_data: MatchRequestCreate):
@@ -21,6 +25,7 @@ def create_match_request(db: Session, match_data: MatchRequestCreate):
         receiver_id=match_data.receiver_id,
         request_type=match_data.request_type,  
         distance=match_data.distance,          
+        distance_m=match_data.distance_m,
         details=match_data.details,            
         latitude=match_data.latitude,          
         longitude=match_data.longitude,        
@@ -40,58 +45,139 @@ def create_match_request(db: Session, match_data: MatchRequestCreate):
     return match_request
 
 
-def respond_to_match(db: Session, match_id: str, update_data: MatchRequestUpdate, current_user):
-    match_request = db.query(MatchRequest).filter(MatchRequest.match_id == match_id).first()
+def dispatch_match_request(db: Session, dispatch_data: MatchDispatchCreate) -> MatchDispatchOut:
+    """
+    Send one request to each of the max_helpers nearest available helpers
+    within the requested distance. All rows share a dispatch_id and are
+    inserted, with their notifications, in a single transaction.
+    """
+    helpers = find_nearest_helpers(
+        db, dispatch_data.latitude, dispatch_data.longitude, dispatch_data.max_helpers,
+        max_km=dispatch_data.distance_m / 1000, exclude=dispatch_data.requester_id
+    )
+    if not helpers:
+        raise HTTPException(status_code=404, detail="No available helpers nearby.")
+
+    dispatch_id = str(uuid.uuid4())
+    now = datetime.datetime.utcnow()
+    match_requests = [
+        MatchRequest(
+            match_id=str(uuid.uuid4()),
+            requester_id=dispatch_data.requester_id,
+            receiver_id=helper.user_id,
+            request_type=dispatch_data.request_type,
+            distance=dispatch_data.distance,
+            distance_m=dispatch_data.distance_m,
+            details=dispatch_data.details,
+            latitude=dispatch_data.latitude,
+            longitude=dispatch_data.longitude,
+            dispatch_id=dispatch_id,
+            status="pending",
+            created_at=now
+        )
+        for helper in helpers
+    ]
+    with unit_of_work(db):
+        db.add_all(match_requests)
+        create_notifications(db, [
+            NotificationCreate(
+                user_id=helper.user_id,
+                title="New Photo Request",
+                message="You received a new request to take a photo.",
+                notification_type="session"
+            )
+            for helper in helpers
+        ], commit=False)
+    return MatchDispatchOut(
+        dispatch_id=dispatch_id,
+        matches=[MatchRequestOut.from_orm(match_request) for match_request in match_requests]
+    )
+
 
-    if not match_request:
-        return None
+RESPONSE_STATUSES = ("accepted", "declined", "cancel", "expired")
 
-    # Check authorization
-    if match_request.receiver_id != current_user.id:
-        raise HTTPException(status_code=403, detail="You are not allowed to respond to this match.")
 
-    # Check if already accepted or rejected
-    if match_request.status != "pending":
-        raise HTTPException(status_code=409, detail="This match has already been responded to.")
+def _claim_match(db: Session, match_id: str, receiver_id: str, status: str, now: datetime.datetime):
+    """
+    Move a pending match to status with one conditional UPDATE ... RETURNING,
+    so whoever responds first wins without a SELECT beforehand. Accepting a
+    dispatched match expires its pending siblings in the same statement.
+    Returns the updated match, or None if it was not pending for this receiver.
+    """
+    own = aliased(MatchRequest)
+    claimable = exists().where(
+        own.match_id == match_id,
+        own.receiver_id == receiver_id,
+        own.status == "pending"
+    )
+    is_own = MatchRequest.match_id == match_id
+    targets = is_own
+    if status == "accepted":
+        dispatch_id = select(own.dispatch_id).where(own.match_id == match_id).scalar_subquery()
+        targets = or_(is_own, MatchRequest.dispatch_id == dispatch_id)
+
+    values = {
+        "status": case((is_own, status), else_="expired"),
+        "version": MatchRequest.version + 1,
+    }
+    if status == "accepted":
+        # Only acceptances are stamped: ranking reads accepted_at - created_at as response time
+        values["accepted_at"] = case((is_own, now), else_=MatchRequest.accepted_at)
+
+    updated = db.scalars(
+        update(MatchRequest)
+        .where(targets, MatchRequest.status == "pending", claimable)
+        .values(**values)
+        .returning(MatchRequest)
+        .execution_options(populate_existing=True)
+    ).all()
+    return next((match for match in updated if match.match_id == match_id), None)
 
+
+def respond_to_match(db: Session, match_id: str, update_data: MatchRequestUpdate, current_user):
     # 🚨 Here is the new fix:
-    if update_data.status not in ["accepted", "declined", "cancel", "expired"]:
+    if update_data.status not in RESPONSE_STATUSES:
         raise HTTPException(status_code=400, detail="Invalid status. Must be 'accepted' or 'declined'.")
 
-    match_request.status = update_data.status
-    match_request.accepted_at = datetime.datetime.utcnow()
+    # The response, its notifications and the session commit together or not at all
+    with unit_of_work(db):
+        match_request = _claim_match(db, match_id, current_user.id, update_data.status, datetime.datetime.utcnow())
 
-    db.commit()
-    db.refresh(match_request)
+        if match_request is None:
+            # Lost the race or not claimable: only now look at the row to say why
+            existing = db.query(MatchRequest).filter(MatchRequest.match_id == match_id).first()
+            if not existing:
+                return None
+            if existing.receiver_id != current_user.id:
+                raise HTTPException(status_code=403, detail="You are not allowed to respond to this match.")
+            raise HTTPException(status_code=409, detail="This match has already been responded to.")
 
-    # ✅ Notify requester of response
-    if update_data.status == "accepted":
-        message = "Your photo request has been accepted. Session created!"
-    else:
-        message = "Your photo request was declined."
+        # ✅ Notify requester of response
+        if update_data.status == "accepted":
+            message = "Your photo request has been accepted. Session created!"
+        else:
+            message = "Your photo request was declined."
 
-    notification = NotificationCreate(
-        user_id=match_request.requester_id,
-        title="Request Update",
-        message=message,
-        notification_type="session"
-    )
-    create_notification(db, notification)
-
-    # ✅ If accepted, create a session
-    if update_data.status == "accepted":
-        # Ensure location fields are available
-        if not match_request.latitude or not match_request.longitude:
-            raise HTTPException(status_code=400, detail="Match location is missing, cannot create session.")
-
-        session_data = SessionCreate(
-            requester_id=match_request.requester_id,
-            helper_id=match_request.receiver_id,
-            match_id=match_request.match_id,
-            location={"lat": match_request.latitude, "lng": match_request.longitude}
-        )
-        create_session(db, session_data)
+        create_notification(db, NotificationCreate(
+            user_id=match_request.requester_id,
+            title="Request Update",
+            message=message,
+            notification_type="session"
+        ), commit=False)
+
+        # ✅ If accepted, create a session
+        if update_data.status == "accepted":
+            # Ensure location fields are available
+            if not match_request.latitude or not match_request.longitude:
+                raise HTTPException(status_code=400, detail="Match location is missing, cannot create session.")
 
+            session_data = SessionCreate(
+                requester_id=match_request.requester_id,
+                helper_id=match_request.receiver_id,
+                match_id=match_request.match_id,
+                location={"lat": match_request.latitude, "lng": match_request.longitude}
+            )
+            create_session(db, session_data, commit=False)
 
     return match_request
 
@@ -103,20 +189,70 @@ def get_user_matches(db: Session, user_id: str):
     ).all()
 '''
 
+ACTIVE_MATCH_STATUSES = ("pending", "accepted")
+RECENT_MATCH_WINDOW = datetime.timedelta(minutes=30)
+
+
 def get_user_matches(db: Session, user_id: str):
+    # Pending and accepted matches created in the last 30 minutes. One branch
+    # per side, so each is a range scan on its (user, status, created_at)
+    # index instead of a table scan for the OR; the receiver branch skips
+    # self-matches the requester branch already returned.
+    cutoff_time = datetime.datetime.utcnow() - RECENT_MATCH_WINDOW
+    as_requester = select(MatchRequest).where(
+        MatchRequest.requester_id == user_id,
+        MatchRequest.status.in_(ACTIVE_MATCH_STATUSES),
+        MatchRequest.created_at >= cutoff_time
+    )
+    as_receiver = select(MatchRequest).where(
+        MatchRequest.receiver_id == user_id,
+        MatchRequest.status.in_(ACTIVE_MATCH_STATUSES),
+        MatchRequest.created_at >= cutoff_time,
+        MatchRequest.requester_id != user_id
+    )
+    statement = select(MatchRequest).from_statement(union_all(as_requester, as_receiver))
+    return db.execute(statement).scalars().all()
 
-    cutoff_time = datetime.datetime.utcnow() - datetime.timedelta(minutes=30)
 
-    return db.query(MatchRequest).filter(
-        and_(
-            or_(
-                MatchRequest.requester_id == user_id,
-                MatchRequest.receiver_id == user_id
-            ),
-            or_(
-                MatchRequest.status == "pending",
-                MatchRequest.status == "accepted"
-            ),
-            MatchRequest.created_at >= cutoff_time 
-        )
-    ).all()
\ No newline at end of file
+def expire_stale_matches(db: Session, max_age_minutes: int = MATCH_EXPIRY_MINUTES,
+                         batch_size: int = MATCH_EXPIRY_BATCH_SIZE) -> int:
+    """
+    Move pending requests older than max_age_minutes to "expired", batch_size
+    rows per UPDATE, and tell each requester once per request (a dispatch
+    counts as one request). Returns the number of rows expired.
+    """
+    cutoff_time = datetime.datetime.utcnow() - datetime.timedelta(minutes=max_age_minutes)
+    notified = set()
+    expired = 0
+
+    while True:
+        stale_ids = select(MatchRequest.match_id).where(
+            MatchRequest.status == "pending",
+            MatchRequest.created_at < cutoff_time
+        ).limit(batch_size)
+        rows = db.execute(
+            update(MatchRequest)
+            .where(MatchRequest.match_id.in_(stale_ids), MatchRequest.status == "pending")
+            .values(status="expired", version=MatchRequest.version + 1)
+            .returning(MatchRequest.match_id, MatchRequest.requester_id, MatchRequest.dispatch_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if not rows:
+            db.commit()
+            return expired
+        expired += len(rows)
+
+        notifications = []
+        for row in rows:
+            request_key = row.dispatch_id or row.match_id
+            if request_key in notified:
+                continue
+            notified.add(request_key)
+            notifications.append(NotificationCreate(
+                user_id=row.requester_id,
+                title="Request Expired",
+                message="Your photo request expired before anyone accepted it.",
+                notification_type="session"
+            ))
+        # Commits the batch together with its notifications
+        create_notifications(db, notifications)
\ No newline at end of file
@@ -18,7 +18,7 @@ async def create_notification(db: Session, notification: NotificationCreate):
     }, notification.user_id)
 
 
-def create_notification(db: Session, notification: NotificationCreate):
+def create_notification(db: Session, notification: NotificationCreate, commit: bool = True):
     db_notification = Notification(
         notification_id=str(uuid.uuid4()),
         user_id=notification.user_id,
@@ -29,10 +29,34 @@ def create_notification(db: Session, notification: NotificationCreate):
         notification_type=notification.notification_type
     )
     db.add(db_notification)
-    db.commit()
-    db.refresh(db_notification)
+    if commit:
+        db.commit()
+        db.refresh(db_notification)
     return db_notification
 
+def create_notifications(db: Session, notifications, commit: bool = True):
+    """
+    Add several notifications at once. With commit=False they are left in
+    the caller's transaction and inserted together when it flushes.
+    """
+    now = datetime.datetime.utcnow()
+    db_notifications = [
+        Notification(
+            notification_id=str(uuid.uuid4()),
+            user_id=notification.user_id,
+            title=notification.title,
+            message=notification.message,
+            is_read=False,
+            created_at=now,
+            notification_type=notification.notification_type
+        )
+        for notification in notifications
+    ]
+    db.add_all(db_notifications)
+    if commit:
+        db.commit()
+    return db_notifications
+
 def get_notifications(db: Session, user_id: str):
     return db.query(Notification).filter(Notification.user_id == user_id).all()
 
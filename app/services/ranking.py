@@ -0,0 +1,218 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import case, func
+from app.database import SessionLocal
+from app.models.matchmaking import MatchRequest
+from app.models.profile import UserProfile
+from app.schemas.matchmaking import RankedHelperOut
+from app.services.location import find_nearby_positions, get_user_position, iter_available_helpers
+import datetime
+import itertools
+import threading
+import time
+from typing import Dict, List, NamedTuple
+import numpy as np
+
+# Feature columns, in matrix order
+FEATURES = ("rating", "experience", "verified", "acceptance", "responsiveness")
+
+# Score = weighted sum of features in [0, 1]; closeness is 1 at the requester, 0 at the radius edge
+RANKING_WEIGHTS = {
+    "closeness": 0.35,
+    "rating": 0.20,
+    "acceptance": 0.15,
+    "responsiveness": 0.10,
+    "experience": 0.10,
+    "verified": 0.10,
+}
+
+MAX_RANK_CANDIDATES = 5000
+FEATURES_TTL_SECONDS = 60
+
+# Rolling window for acceptance rate and response latency
+MATCH_STATS_WINDOW_DAYS = 30
+
+# Ratings from a handful of sessions are pulled towards PRIOR_RATING
+PRIOR_RATING = 4.0
+PRIOR_RATING_WEIGHT = 5
+# Beta(1, 1) prior: a helper with no history scores 0.5
+PRIOR_ACCEPTED, PRIOR_DECLINED = 1, 1
+# Sessions at which experience saturates
+EXPERIENCE_CAP = 100
+# Mean response time scoring 1/e
+LATENCY_SCALE_SECONDS = 5 * 60
+
+
+class FeatureSnapshot(NamedTuple):
+    index: Dict[str, int]     # helper user_id -> row of matrix
+    matrix: np.ndarray        # (helpers + 1, len(FEATURES)); the last row holds the no-history defaults
+    loaded_at: float          # time.monotonic()
+
+
+def _default_features():
+    return [
+        PRIOR_RATING / 5,
+        0.0,
+        0.0,
+        PRIOR_ACCEPTED / (PRIOR_ACCEPTED + PRIOR_DECLINED),
+        np.exp(-1.0),
+    ]
+
+
+def compute_features(db: Session) -> FeatureSnapshot:
+    """Build the helper feature matrix from profiles and the rolling match history."""
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=MATCH_STATS_WINDOW_DAYS)
+    latency_seconds = (func.julianday(MatchRequest.accepted_at) - func.julianday(MatchRequest.created_at)) * 86400
+
+    stats = {
+        row.receiver_id: row
+        for row in db.query(
+            MatchRequest.receiver_id,
+            func.count().label("offered"),
+            func.sum(case((MatchRequest.status == "accepted", 1), else_=0)).label("accepted"),
+            func.avg(latency_seconds).label("latency"),
+        ).filter(
+            MatchRequest.created_at >= since,
+            MatchRequest.status != "pending"
+        ).group_by(MatchRequest.receiver_id)
+    }
+    profiles = db.query(
+        UserProfile.user_id,
+        UserProfile.average_rating,
+        UserProfile.total_sessions,
+        UserProfile.verification_status,
+    ).all()
+
+    defaults = _default_features()
+    rows = []
+    index = {}
+    for profile in profiles:
+        sessions = profile.total_sessions or 0
+        rating = (
+            (profile.average_rating or 0.0) * sessions + PRIOR_RATING * PRIOR_RATING_WEIGHT
+        ) / (sessions + PRIOR_RATING_WEIGHT)
+
+        history = stats.get(profile.user_id)
+        if history is not None:
+            accepted = history.accepted or 0
+            acceptance = (accepted + PRIOR_ACCEPTED) / (history.offered + PRIOR_ACCEPTED + PRIOR_DECLINED)
+            # Expired requests were never answered, so they carry no latency
+            responsiveness = np.exp(-history.latency / LATENCY_SCALE_SECONDS) if history.latency is not None else defaults[4]
+        else:
+            acceptance, responsiveness = defaults[3], defaults[4]
+
+        index[profile.user_id] = len(rows)
+        rows.append([
+            rating / 5,
+            min(np.log1p(sessions) / np.log1p(EXPERIENCE_CAP), 1.0),
+            1.0 if profile.verification_status == "verified" else 0.0,
+            acceptance,
+            responsiveness,
+        ])
+    rows.append(defaults)
+    return FeatureSnapshot(index, np.asarray(rows, dtype=float), time.monotonic())
+
+
+class HelperFeatureCache:
+    """
+    Process-local cache of helper features for ranking.
+
+    The snapshot is rebuilt at most every ttl_seconds. Once one exists,
+    rebuilding happens on a background thread while callers keep using the
+    previous snapshot, so ranking never waits on the aggregate queries.
+    """
+
+    def __init__(self, session_factory=SessionLocal, ttl_seconds: float = FEATURES_TTL_SECONDS):
+        self.session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self) -> FeatureSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.refresh()
+        if time.monotonic() - snapshot.loaded_at > self.ttl_seconds:
+            with self._lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                threading.Thread(target=self._refresh_in_background, name="helper-features", daemon=True).start()
+        return snapshot
+
+    def refresh(self) -> FeatureSnapshot:
+        db = self.session_factory()
+        try:
+            self._snapshot = compute_features(db)
+        finally:
+            db.close()
+        return self._snapshot
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print("Helper feature refresh failed:", e)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+def score_candidates(snapshot: FeatureSnapshot, user_ids: List[str], distances_km, radius_km: float,
+                     weights: Dict[str, float] = RANKING_WEIGHTS) -> np.ndarray:
+    """Score every candidate in one vectorized pass; higher is better."""
+    default_row = len(snapshot.matrix) - 1
+    rows = np.fromiter((snapshot.index.get(user_id, default_row) for user_id in user_ids), dtype=np.intp, count=len(user_ids))
+    feature_weights = np.array([weights[name] for name in FEATURES])
+
+    closeness = 1.0 - np.clip(np.asarray(distances_km, dtype=float) / radius_km, 0.0, 1.0)
+    return snapshot.matrix[rows] @ feature_weights + weights["closeness"] * closeness
+
+
+def rank_helpers(db: Session, latitude: float, longitude: float, radius_km: float, limit: int,
+                 exclude: str = None) -> List[RankedHelperOut]:
+    """
+    The limit best available helpers within radius_km: up to
+    MAX_RANK_CANDIDATES nearest from the location index, scored on cached
+    features, then checked for availability in score order.
+    """
+    hits = find_nearby_positions(latitude, longitude, radius_km, exclude=exclude)[:MAX_RANK_CANDIDATES]
+    if not hits:
+        return []
+
+    scores = score_candidates(
+        helper_features.get(),
+        [position.user_id for position, _ in hits],
+        [distance for _, distance in hits],
+        radius_km
+    )
+    # Ties keep distance order
+    order = np.argsort(-scores, kind="stable")
+    score_by_user = {}
+
+    def ranked():
+        for i in order:
+            position, distance = hits[i]
+            score_by_user[position.user_id] = float(scores[i])
+            yield position, distance
+
+    return [
+        RankedHelperOut(**helper.dict(), score=round(score_by_user[helper.user_id], 4))
+        for helper in itertools.islice(iter_available_helpers(db, ranked()), limit)
+    ]
+
+
+def get_ranked_helpers(db: Session, user_id: str, radius_km: float, limit: int,
+                       latitude: float = None, longitude: float = None) -> List[RankedHelperOut]:
+    if latitude is None or longitude is None:
+        position = get_user_position(db, user_id)
+        if position is None:
+            return []
+        latitude, longitude = position.latitude, position.longitude
+    return rank_helpers(db, latitude, longitude, radius_km, limit, exclude=user_id)
+
+
+helper_features = HelperFeatureCache()
@@ -1,6 +1,9 @@
 from sqlalchemy.orm import Session as DBSession
-from app.models.session import Session
-from app.schemas.session import SessionCreate, SessionUpdateStatus
+from sqlalchemy import and_, not_, or_, select, tuple_, union_all, update
+from app.models.session import Session, is_active_session
+from app.schemas.session import SessionCreate, SessionUpdateStatus, SessionOut, SessionHistoryPage
+import base64
+import json
 import uuid
 import datetime
 from fastapi import HTTPException
@@ -8,9 +11,37 @@ from app.models.user import User
 from app.models.matchmaking import MatchRequest
 
 from app.schemas.notification import NotificationCreate
-from app.services.notification import create_notification
+from app.services.notification import create_notifications
+from app.services.location import get_user_position
+from app.utils.distance import distance_within, format_distance
+from app.utils.metrics import metrics
+from app.config import (
+    SESSION_IDLE_MINUTES, SESSION_SWEEP_BATCH_SIZE, CHECKIN_RADIUS_M, CHECKIN_MAX_POSITION_AGE_SECONDS
+)
 
-def create_session(db: DBSession, session_data: SessionCreate):
+# Allowed moves: current status -> statuses it may be updated to. These are
+# the moves the API has always accepted, plus completed -> end (closing a
+# session for reviews). Check-in is verified on every move to "started".
+# Repeating the current status is an idempotent no-op (e.g. a retried "completed").
+SESSION_TRANSITIONS = {
+    "created": frozenset({"started", "completed", "cancelled"}),
+    "started": frozenset({"completed", "cancelled"}),
+    "completed": frozenset({"started", "cancelled", "end"}),
+    "end": frozenset(),
+    "cancelled": frozenset(),
+}
+UPDATE_STATUSES = frozenset().union(*SESSION_TRANSITIONS.values())
+
+# Timestamp column set on entering a status
+TRANSITION_STAMPS = {
+    "started": "check_in_time",
+    "completed": "check_out_time",
+}
+
+# Finished sessions stay visible by match for this long
+RECENT_SESSION_WINDOW = datetime.timedelta(days=1)
+
+def create_session(db: DBSession, session_data: SessionCreate, commit: bool = True):
     # Check if a session already exists for the same match_id
     existing = db.query(Session).filter(Session.match_id == session_data.match_id).first()
     if existing:
@@ -26,22 +57,53 @@ def create_session(db: DBSession, session_data: SessionCreate):
         created_at=datetime.datetime.utcnow()
     )
     db.add(session)
-    db.commit()
-    db.refresh(session)
 
-    for uid, role in [(session_data.requester_id, "Requester"), (session_data.helper_id, "Helper")]:
-        notification = NotificationCreate(
+    create_notifications(db, [
+        NotificationCreate(
             user_id=uid,
             title="New Session Created",
             message=f"You have been added as a {role.lower()} in a new session.",
             notification_type="session"
         )
-        create_notification(db, notification)
+        for uid, role in [(session_data.requester_id, "Requester"), (session_data.helper_id, "Helper")]
+    ], commit=False)
 
+    if commit:
+        db.commit()
+        db.refresh(session)
     return session
 
 
 
+def verify_check_in(db: DBSession, session: Session, user_id: str):
+    """
+    Require the user's latest position to be recent and within
+    CHECKIN_RADIUS_M of the session location. The position comes from the
+    location backend, so a warm presence cache needs no query.
+    """
+    position = get_user_position(db, user_id)
+    max_age = datetime.timedelta(seconds=CHECKIN_MAX_POSITION_AGE_SECONDS)
+    if position is None or position.updated_at < datetime.datetime.utcnow() - max_age:
+        raise HTTPException(status_code=400, detail="Share your current location to check in.")
+
+    # location is free-form JSON; sessions created without lat/lng cannot be checked in to
+    location = session.location or {}
+    if "lat" not in location or "lng" not in location:
+        raise HTTPException(status_code=400, detail="Session location is missing, cannot check in.")
+
+    distance_km, inside = distance_within(
+        location["lat"], location["lng"],
+        position.latitude, position.longitude,
+        CHECKIN_RADIUS_M / 1000
+    )
+    if not inside:
+        raise HTTPException(
+            status_code=403,
+            detail=f"You must be within {format_distance(CHECKIN_RADIUS_M)} of the session location to check in "
+                   f"(currently {format_distance(round(distance_km * 1000))} away)."
+        )
+
+
 def update_session_status(db: DBSession, session_id: str, status_update: SessionUpdateStatus, current_user: User):
     session = db.query(Session).filter(Session.session_id == session_id).first()
     if not session:
@@ -51,35 +113,163 @@ def update_session_status(db: DBSession, session_id: str, status_update: Session
     if current_user.id not in [session.requester_id, session.helper_id]:
         raise HTTPException(status_code=403, detail="Unauthorized to update session.")
 
-    # Prevent modifying completed/cancelled sessions
-    if session.status in ["end", "cancelled"]:
-        raise HTTPException(status_code=409, detail="Session already finalized.")
-
-    # Validate status transition
-    if status_update.status not in ["started", "completed", "cancelled"]:
+    target = status_update.status.value
+    if target not in UPDATE_STATUSES:
         raise HTTPException(status_code=400, detail="Invalid session status update.")
+    if target == session.status:
+        return session
 
-    if status_update.status == "started":
-        session.check_in_time = datetime.datetime.utcnow()
-    elif status_update.status == "completed":
-        session.check_out_time = datetime.datetime.utcnow()
+    allowed = SESSION_TRANSITIONS.get(session.status, frozenset())
+    if target not in allowed:
+        if not allowed:
+            raise HTTPException(status_code=409, detail="Session already finalized.")
+        raise HTTPException(status_code=409, detail=f"Cannot move session from {session.status} to {target}.")
 
-    session.status = status_update.status
+    if target == "started":
+        verify_check_in(db, session, current_user.id)
 
-    db.commit()
-    db.refresh(session)
+    now = datetime.datetime.utcnow()
+    stamp = TRANSITION_STAMPS.get(target)
+    if stamp:
+        setattr(session, stamp, now)
+    session.status = target
+    session.updated_at = now
 
-    for uid in [session.requester_id, session.helper_id]:
-        notification = NotificationCreate(
+    create_notifications(db, [
+        NotificationCreate(
             user_id=uid,
             title="Session Updated",
-            message=f"The session was marked as {status_update.status}.",
+            message=f"The session was marked as {target}.",
             notification_type="session"
         )
-        create_notification(db, notification)
+        for uid in [session.requester_id, session.helper_id]
+    ], commit=False)
+
+    db.commit()
+    db.refresh(session)
     return session
 
 
+def get_active_session(db: DBSession, user_id: str):
+    """The user's in-progress session, if any (newest first), read through the partial indexes."""
+    as_requester = select(Session.session_id, Session.created_at).where(
+        Session.requester_id == user_id, is_active_session()
+    )
+    as_helper = select(Session.session_id, Session.created_at).where(
+        Session.helper_id == user_id, is_active_session()
+    )
+    newest = union_all(as_requester, as_helper).subquery()
+    session_id = db.execute(
+        select(newest.c.session_id).order_by(newest.c.created_at.desc()).limit(1)
+    ).scalar()
+    return db.get(Session, session_id) if session_id else None
+
+
+
+def encode_history_cursor(created_at: datetime.datetime, session_id: str) -> str:
+    payload = json.dumps({"c": created_at.isoformat(), "s": session_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_history_cursor(cursor: str):
+    """Return (created_at, session_id); raises ValueError if malformed."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.datetime.fromisoformat(payload["c"]), str(payload["s"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _history_branch(participant, user_id: str, after):
+    branch = select(Session.session_id, Session.created_at).where(participant == user_id, not_(is_active_session()))
+    if after:
+        branch = branch.where(tuple_(Session.created_at, Session.session_id) < tuple_(*after))
+    return branch.order_by(Session.created_at.desc(), Session.session_id.desc())
+
+
+def get_session_history(db: DBSession, user_id: str, limit: int, cursor: str = None):
+    """
+    Up to limit finished sessions of the user, newest first, plus the cursor
+    for the next page. Each side of the UNION ALL walks its
+    (participant, created_at) index backwards from the cursor.
+    """
+    after = decode_history_cursor(cursor) if cursor else None
+    as_requester = _history_branch(Session.requester_id, user_id, after).limit(limit + 1)
+    # A self-session already came from the requester side
+    as_helper = _history_branch(Session.helper_id, user_id, after).where(Session.requester_id != user_id).limit(limit + 1)
+
+    page = union_all(as_requester.subquery().select(), as_helper.subquery().select()).subquery()
+    rows = db.execute(
+        select(page.c.session_id, page.c.created_at)
+        .order_by(page.c.created_at.desc(), page.c.session_id.desc())
+        .limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_history_cursor(rows[-1].created_at, rows[-1].session_id)
+    sessions = {
+        session.session_id: session
+        for session in db.query(Session).filter(Session.session_id.in_([row.session_id for row in rows]))
+    }
+    return [sessions[row.session_id] for row in rows], next_cursor
+
+
+def get_my_sessions(db: DBSession, user_id: str, limit: int, cursor: str = None) -> SessionHistoryPage:
+    """The active session (first page only) and one page of history."""
+    history, next_cursor = get_session_history(db, user_id, limit, cursor)
+    active = None if cursor else get_active_session(db, user_id)
+    return SessionHistoryPage(
+        active=SessionOut.from_orm(active) if active else None,
+        history=[SessionOut.from_orm(session) for session in history],
+        next_cursor=next_cursor
+    )
+
+
+def cancel_abandoned_sessions(db: DBSession, idle_minutes: int = SESSION_IDLE_MINUTES,
+                              batch_size: int = SESSION_SWEEP_BATCH_SIZE) -> int:
+    """
+    Cancel created/started sessions with no transition for idle_minutes,
+    batch_size rows per UPDATE, and notify both participants. Each batch
+    commits with its notifications. Returns the number of sessions cancelled.
+    """
+    now = datetime.datetime.utcnow()
+    cutoff = now - datetime.timedelta(minutes=idle_minutes)
+    cancelled = 0
+
+    with metrics.timer("session_sweep_seconds"):
+        while True:
+            stale_ids = select(Session.session_id).where(
+                is_active_session(),
+                Session.updated_at < cutoff
+            ).order_by(Session.updated_at).limit(batch_size)
+            rows = db.execute(
+                update(Session)
+                .where(Session.session_id.in_(stale_ids), is_active_session())
+                .values(status="cancelled", updated_at=now, version=Session.version + 1)
+                .returning(Session.requester_id, Session.helper_id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            if not rows:
+                db.commit()
+                break
+            cancelled += len(rows)
+
+            create_notifications(db, [
+                NotificationCreate(
+                    user_id=uid,
+                    title="Session Cancelled",
+                    message="The session was cancelled after a long period of inactivity.",
+                    notification_type="session"
+                )
+                for row in rows
+                for uid in {row.requester_id, row.helper_id}
+            ])
+
+    metrics.increment("sessions_auto_cancelled_total", cancelled)
+    return cancelled
+
 
 '''
 
@@ -93,22 +283,15 @@ def get_session_by_match_id(db: DBSession, match_id: str):
     #return db.query(Session).filter(Session.match_id == match_id).first()
 '''
 def get_session_by_match_id(db: DBSession, match_id: str):
-    allowed_statuses = ["created", "started"]
-
-    # Get current time and threshold
-    now = datetime.datetime.utcnow()
-    cutoff = now - datetime.timedelta(days=1)
-
-    # Fetch active or recent sessions only
+    # Active sessions, or finished ones updated within the recent window
+    cutoff = datetime.datetime.utcnow() - RECENT_SESSION_WINDOW
     return db.query(Session).filter(
         Session.match_id == match_id,
-        (
-            or_( (Session.status.in_(allowed_statuses)) ,
-
-                and_(
-                    (Session.status.in_(["completed", "cancelled"])) ,
-                    (Session.updated_at >= cutoff)
-                )
+        or_(
+            is_active_session(),
+            and_(
+                Session.status.in_(["completed", "cancelled"]),
+                Session.updated_at >= cutoff
             )
         )
     ).first()
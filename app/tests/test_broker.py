@@ -0,0 +1,125 @@
+# app/tests/test_broker.py
+
+import asyncio
+import json
+
+import pytest
+
+from app.tests.test_websocket import FakeWebSocket
+from app.utils.broker import InProcessBroker, RedisBroker
+from app.utils.websocket import ConnectionManager
+
+
+class FakeRedisServer:
+    def __init__(self):
+        self.channels = {}
+        self.commands = []
+
+
+class FakePubSub:
+    """In-process stand-in for the redis.asyncio PubSub calls RedisBroker uses."""
+
+    def __init__(self, server):
+        self.server = server
+        self.channels = set()
+        self.messages = asyncio.Queue()
+
+    @property
+    def subscribed(self):
+        return bool(self.channels)
+
+    async def subscribe(self, *channels):
+        for channel in channels:
+            self.server.commands.append(("subscribe", channel))
+            self.channels.add(channel)
+            self.server.channels.setdefault(channel, set()).add(self)
+
+    async def unsubscribe(self, *channels):
+        for channel in channels:
+            self.server.commands.append(("unsubscribe", channel))
+            self.channels.discard(channel)
+            self.server.channels.get(channel, set()).discard(self)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        await self.unsubscribe(*list(self.channels))
+
+
+class FakeAsyncRedis:
+    def __init__(self, server):
+        self.server = server
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self.server)
+
+    async def publish(self, channel, data):
+        subscribers = self.server.channels.get(channel, set())
+        for pubsub in subscribers:
+            pubsub.messages.put_nowait({"type": "message", "channel": channel.encode(), "data": data.encode()})
+        return len(subscribers)
+
+
+async def _settle(*managers):
+    # Let pub/sub readers and scheduled unsubscribes run, then drain the writers
+    for _ in range(5):
+        await asyncio.sleep(0.01)
+    for manager in managers:
+        await manager.flush()
+
+
+@pytest.mark.asyncio
+async def test_in_process_broker_reference_counts():
+    broker = InProcessBroker()
+    delivered = []
+    await broker.subscribe("room", lambda channel, envelope: delivered.append(envelope))
+    await broker.subscribe("room", lambda channel, envelope: delivered.append(envelope))
+
+    await broker.unsubscribe("room")
+    await broker.publish("room", {"message": "still subscribed"})
+    await broker.unsubscribe("room")
+    await broker.publish("room", {"message": "nobody listening"})
+
+    assert delivered == [{"message": "still subscribed"}]
+    assert broker.subscriptions == {}
+
+
+@pytest.mark.asyncio
+async def test_chat_spans_workers_over_redis():
+    server = FakeRedisServer()
+    worker_a = ConnectionManager(RedisBroker(FakeAsyncRedis(server), poll_seconds=0.01))
+    worker_b = ConnectionManager(RedisBroker(FakeAsyncRedis(server), poll_seconds=0.01))
+
+    requester, requester_tab, helper = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await worker_a.connect("session", requester)
+    await worker_a.connect("session", requester_tab)
+    await worker_b.connect("session", helper)
+    # One Redis subscription per worker, however many local connections
+    assert server.commands == [("subscribe", "photoaid:ws:session")] * 2
+
+    await worker_a.broadcast(json.dumps({"type": "chat", "content": "hi"}), "session", exclude=requester)
+    await worker_b.broadcast("read", "session", exclude=helper, coalesce_key="status:m1")
+    await _settle(worker_a, worker_b)
+
+    assert helper.sent == [json.dumps({"type": "chat", "content": "hi"})]
+    assert requester.sent == ["read"]
+    assert requester_tab.sent == [json.dumps({"type": "chat", "content": "hi"}), "read"]
+
+    # The worker keeps listening until its last connection in the room leaves
+    worker_a.disconnect("session", requester)
+    await _settle()
+    assert ("unsubscribe", "photoaid:ws:session") not in server.commands
+    worker_a.disconnect("session", requester_tab)
+    await _settle()
+    assert server.commands[-1] == ("unsubscribe", "photoaid:ws:session")
+
+    await worker_b.broadcast("after leaving", "session")
+    await _settle(worker_a, worker_b)
+    assert requester_tab.sent[-1] == "read" and helper.sent[-1] == "after leaving"
+
+    await worker_a.broker.close()
+    await worker_b.broker.close()
@@ -141,3 +141,45 @@ async def test_chat_functionality():
     print("\n✅ Chat functionality test passed!")
 
 '''
+
+
+import asyncio
+import json
+import uuid
+
+import pytest
+import websockets
+
+WS_URL = "ws://127.0.0.1:8000"
+
+
+async def _receive(ws):
+    return json.loads(await asyncio.wait_for(ws.recv(), timeout=5))
+
+
+@pytest.mark.asyncio
+async def test_two_party_chat():
+    session_id = str(uuid.uuid4())
+    requester_id, helper_id = str(uuid.uuid4()), str(uuid.uuid4())
+
+    async with websockets.connect(f"{WS_URL}/chat/ws/{session_id}/{requester_id}") as ws_req, \
+            websockets.connect(f"{WS_URL}/chat/ws/{session_id}/{helper_id}") as ws_help:
+        message_id = str(uuid.uuid4())
+        await ws_req.send(json.dumps({"type": "chat", "message_id": message_id, "content": "Hello from requester"}))
+
+        ack = await _receive(ws_req)
+        assert ack == {**ack, "type": "ack", "message_id": message_id, "status": "sent"}
+
+        # The second participant's connection did not replace the first
+        chat = await _receive(ws_help)
+        assert chat["type"] == "chat" and chat["sender_id"] == requester_id
+        assert chat["content"] == "Hello from requester"
+
+        await ws_help.send(json.dumps({"type": "read", "message_id": message_id}))
+        status = await _receive(ws_req)
+        assert status == {"type": "status", "message_id": message_id, "status": "read"}
+
+        # Nobody receives their own frames back
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(ws_help.recv(), timeout=0.3)
+
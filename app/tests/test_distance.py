@@ -0,0 +1,169 @@
+# app/tests/test_distance.py
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from app.schemas.matchmaking import MatchDispatchCreate, MatchRequestCreate
+from app.utils.distance import (
+    calculate_distance,
+    haversine_many,
+    equirectangular_many,
+    distances_within,
+    distance_within,
+    bounding_box,
+    parse_distance_m,
+    format_distance,
+    FAST_PATH_MAX_KM,
+    FAST_PATH_MAX_ABS_LAT,
+    FAST_PATH_MAX_REL_ERROR,
+)
+
+
+def test_haversine_many_matches_scalar():
+    rng = np.random.default_rng(42)
+    lats = rng.uniform(-90, 90, 500)
+    lngs = rng.uniform(-180, 180, 500)
+
+    batched = haversine_many(12.9716, 77.5946, lats, lngs)
+    scalar = [calculate_distance(12.9716, 77.5946, lat, lng) for lat, lng in zip(lats, lngs)]
+
+    assert np.allclose(batched, scalar, rtol=1e-9, atol=1e-9)
+
+
+def test_equirectangular_error_bound():
+    rng = np.random.default_rng(7)
+    for lat in np.linspace(-FAST_PATH_MAX_ABS_LAT, FAST_PATH_MAX_ABS_LAT, 35):
+        # Includes points across the antimeridian
+        lng = 179.95
+        lats = lat + rng.uniform(-0.1, 0.1, 5000)
+        lngs = lng + rng.uniform(-1.5, 1.5, 5000)
+
+        exact = haversine_many(lat, lng, lats, lngs)
+        approx = equirectangular_many(lat, lng, lats, lngs)
+
+        in_range = (exact <= FAST_PATH_MAX_KM) & (exact > 0)
+        relative_error = np.abs(approx[in_range] - exact[in_range]) / exact[in_range]
+        assert relative_error.max() <= FAST_PATH_MAX_REL_ERROR
+
+
+def test_distances_within_mask():
+    lats = [48.8586, 48.8800, 49.2000]
+    lngs = [2.2948, 2.3200, 2.5000]
+
+    # Fast path (small radius) and haversine path agree on membership
+    distances, mask = distances_within(48.8584, 2.2945, lats, lngs, 5)
+    assert mask.tolist() == [True, True, False]
+    assert distances[0] < 0.05
+
+    distances, mask = distances_within(48.8584, 2.2945, lats, lngs, 50)
+    assert mask.tolist() == [True, True, True]
+
+
+def test_distance_within_matches_batched():
+    rng = np.random.default_rng(11)
+    lats = 51.5 + rng.uniform(-0.05, 0.05, 200)
+    lngs = -0.12 + rng.uniform(-0.05, 0.05, 200)
+
+    for radius_km in (0.2, 2, 50):
+        distances, mask = distances_within(51.5, -0.12, lats, lngs, radius_km)
+        single = [distance_within(51.5, -0.12, lat, lng, radius_km) for lat, lng in zip(lats, lngs)]
+        assert np.allclose(distances, [distance for distance, _ in single], rtol=1e-12)
+        assert mask.tolist() == [inside for _, inside in single]
+
+
+def test_distances_within_empty():
+    distances, mask = distances_within(0.0, 0.0, [], [], 1)
+    assert distances.shape == (0,)
+    assert mask.shape == (0,)
+
+
+def test_parse_distance_m():
+    assert parse_distance_m("100m") == 100
+    assert parse_distance_m("1.5 KM") == 1500
+    assert parse_distance_m("250") == 250
+    for bad in ["", "far", "0m", "-1km", "2 miles"]:
+        with pytest.raises(ValueError):
+            parse_distance_m(bad)
+
+
+def test_format_distance_round_trips():
+    for meters in (50, 500, 1000, 1500, 12000):
+        assert parse_distance_m(format_distance(meters)) == meters
+
+
+def test_match_request_distance_forms():
+    fields = {"requester_id": "r", "receiver_id": "h", "request_type": "photo", "latitude": 0.0, "longitude": 0.0}
+    assert MatchRequestCreate(**fields, distance="1.5km").distance_m == 1500
+    assert MatchRequestCreate(**fields, distance_m=500).distance == "500m"
+
+    # Free text is kept as sent, without a numeric distance
+    free_text = MatchRequestCreate(**fields, distance="around the corner")
+    assert free_text.distance == "around the corner" and free_text.distance_m is None
+
+    for bad in ({}, {"distance": "1km", "distance_m": 500}):
+        with pytest.raises(ValidationError):
+            MatchRequestCreate(**fields, **bad)
+
+    # A dispatch needs a radius it can search
+    dispatch_fields = {key: value for key, value in fields.items() if key != "receiver_id"}
+    assert MatchDispatchCreate(**dispatch_fields, distance="1km").distance_m == 1000
+    with pytest.raises(ValidationError):
+        MatchDispatchCreate(**dispatch_fields, distance="far")
+
+
+def _sample_within(lat, lng, radius_km, samples=20000):
+    """Random points within radius_km of (lat, lng), drawn from a generous lat/lng window around it."""
+    rng = np.random.default_rng(0)
+    span_lat = radius_km / 111.0 * 1.5
+    span_lng = min(span_lat / max(np.cos(np.radians(min(abs(lat) + span_lat, 90.0))), 1e-9), 180.0)
+    lats = rng.uniform(max(lat - span_lat, -90.0), min(lat + span_lat, 90.0), samples)
+    lngs = (lng + rng.uniform(-span_lng, span_lng, samples) + 180) % 360 - 180
+    inside = haversine_many(lat, lng, lats, lngs) <= radius_km
+    assert inside.sum() > 100
+    return lats[inside], lngs[inside]
+
+
+def _in_box(box, lats, lngs):
+    min_lat, max_lat, min_lng, max_lng = box
+    in_lat = (lats >= min_lat) & (lats <= max_lat)
+    if min_lng <= max_lng:
+        in_lng = (lngs >= min_lng) & (lngs <= max_lng)
+    else:
+        in_lng = (lngs >= min_lng) | (lngs <= max_lng)
+    return in_lat & in_lng
+
+
+def test_bounding_box_contains_the_circle():
+    box = bounding_box(48.8584, 2.2945, 10)
+    min_lat, max_lat, min_lng, max_lng = box
+    assert min_lat < 48.8584 < max_lat and min_lng < 2.2945 < max_lng
+    # Tight in latitude: the box edge is the radius due north
+    assert calculate_distance(48.8584, 2.2945, max_lat, 2.2945) == pytest.approx(10)
+    assert _in_box(box, *_sample_within(48.8584, 2.2945, 10)).all()
+
+
+@pytest.mark.parametrize("lng", [179.9, -179.9])
+def test_bounding_box_wraps_the_antimeridian(lng):
+    box = bounding_box(10.0, lng, 50)
+    min_lat, max_lat, min_lng, max_lng = box
+    assert min_lng > max_lng
+    assert -180 <= max_lng < -179 and 179 < min_lng <= 180
+    assert _in_box(box, *_sample_within(10.0, lng, 50)).all()
+
+
+@pytest.mark.parametrize("lat", [89.8, -89.8])
+def test_bounding_box_spans_all_longitudes_at_the_poles(lat):
+    box = bounding_box(lat, 30.0, 50)
+    min_lat, max_lat, min_lng, max_lng = box
+    assert (min_lng, max_lng) == (-180.0, 180.0)
+    assert (max_lat == 90.0) if lat > 0 else (min_lat == -90.0)
+    assert _in_box(box, *_sample_within(lat, 30.0, 50)).all()
+
+
+def test_bounding_box_widens_longitude_at_high_latitude():
+    # Not reaching the pole yet, but a degree of longitude is much shorter up here
+    equator = bounding_box(0.0, 0.0, 100)
+    north = bounding_box(75.0, 0.0, 100)
+    assert north[3] - north[2] > 3 * (equator[3] - equator[2])
+    assert _in_box(north, *_sample_within(75.0, 0.0, 100)).all()
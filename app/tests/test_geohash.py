@@ -0,0 +1,109 @@
+# app/tests/test_geohash.py
+
+import math
+import random
+
+import pytest
+
+from app.utils import geohash
+from app.utils.distance import EARTH_RADIUS_KM
+
+
+def _destination(lat, lng, km, bearing_degrees):
+    """The point km away from (lat, lng) along a bearing, on the same sphere as the haversine."""
+    angular = km / EARTH_RADIUS_KM
+    lat1, lng1, bearing = map(math.radians, (lat, lng, bearing_degrees))
+    lat2 = math.asin(math.sin(lat1) * math.cos(angular) + math.cos(lat1) * math.sin(angular) * math.cos(bearing))
+    lng2 = lng1 + math.atan2(
+        math.sin(bearing) * math.sin(angular) * math.cos(lat1),
+        math.cos(angular) - math.sin(lat1) * math.sin(lat2)
+    )
+    return math.degrees(lat2), (math.degrees(lng2) + 180) % 360 - 180
+
+
+def test_encode_known_vectors():
+    assert geohash.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geohash.encode(42.6, -5.6, 5) == "ezs42"
+    assert geohash.encode(-25.382708, -49.265506, 8) == "6gkzwgjz"
+    # Prefixes of a longer code are the coarser cells
+    assert geohash.encode(57.64911, 10.40744, 4) == "u4pr"
+
+
+def test_encode_edges_of_the_world():
+    assert geohash.encode(-90, -180, 1) == "0"
+    assert geohash.encode(90, 180, 1) == "z"
+    assert geohash.encode(0, 0, 1) == "s"
+    assert geohash.encode(-0.000001, -0.000001, 1) == "7"
+
+
+def test_decode_bbox_contains_the_point():
+    min_lat, max_lat, min_lng, max_lng = geohash.decode_bbox("ezs42")
+    assert (min_lat, max_lat) == pytest.approx((42.5830078125, 42.626953125))
+    assert (min_lng, max_lng) == pytest.approx((-5.625, -5.5810546875))
+    assert (max_lat - min_lat, max_lng - min_lng) == pytest.approx(geohash.cell_size(5))
+
+
+def test_neighbors_known_cells():
+    assert sorted(geohash.neighbors("ezs42")) == [
+        "ezefp", "ezefr", "ezefx", "ezs40", "ezs41", "ezs42", "ezs43", "ezs48", "ezs49"
+    ]
+
+
+def test_neighbors_wrap_the_antimeridian():
+    # "x" is the north-east cell of the equatorial row; its eastern neighbours are across 180°
+    cells = geohash.neighbors("x")
+    assert len(cells) == 9
+    assert {"8", "b", "2"} <= set(cells)
+    assert {"w", "r", "y"} <= set(cells)
+
+    fine = geohash.encode(10.0, 179.9999, 6)
+    across = geohash.encode(10.0, -179.9999, 6)
+    assert across in geohash.neighbors(fine)
+    assert fine in geohash.neighbors(across)
+
+
+def test_neighbors_stop_at_the_poles():
+    # Top and bottom rows have no cells beyond the pole
+    assert sorted(geohash.neighbors("b")) == ["8", "9", "b", "c", "x", "z"]
+    assert sorted(geohash.neighbors("0")) == ["0", "1", "2", "3", "p", "r"]
+    north = geohash.encode(89.9999, 0.0, 6)
+    assert len(geohash.neighbors(north)) == 6
+
+
+def test_precision_for_radius():
+    assert geohash.precision_for_radius(51.5, 1) == 5
+    assert geohash.precision_for_radius(0.0, 20000) is None
+    # Cells narrow towards the poles, so the same radius needs a coarser precision
+    assert geohash.precision_for_radius(80.0, 1) < geohash.precision_for_radius(0.0, 1)
+
+
+@pytest.mark.parametrize("lat, lng, radius_km", [
+    (51.5, -0.12, 1),           # London
+    (0.0, 179.99, 5),           # on the antimeridian
+    (-33.86, -179.995, 2),      # just west of it
+    (84.0, 45.0, 20),           # near the north pole
+    (-70.0, 0.0, 50),
+])
+def test_covering_cells_cover_the_circle(lat, lng, radius_km):
+    cells = geohash.covering_cells(lat, lng, radius_km)
+    assert cells is not None
+    rng = random.Random(f"{lat},{lng}")
+    for _ in range(500):
+        point = _destination(lat, lng, radius_km * math.sqrt(rng.random()), rng.uniform(0, 360))
+        assert geohash.encode(*point, len(cells[0])) in cells
+
+
+def test_covering_cells_give_up_for_huge_radii():
+    assert geohash.covering_cells(0.0, 0.0, 20000) is None
+
+
+@pytest.mark.parametrize("lat, lng", [(51.5, -0.12), (0.0, 179.999), (-60.0, -179.999), (80.0, 10.0)])
+@pytest.mark.parametrize("precision", [3, 5, 6])
+def test_covered_radius_stays_inside_the_neighbours(lat, lng, precision):
+    radius_km = geohash.covered_radius_km(lat, precision)
+    assert radius_km > 0
+    cells = geohash.neighbors(geohash.encode(lat, lng, precision))
+    rng = random.Random(f"{lat},{lng},{precision}")
+    for _ in range(300):
+        point = _destination(lat, lng, radius_km * rng.random(), rng.uniform(0, 360))
+        assert geohash.encode(*point, precision) in cells
@@ -2,7 +2,12 @@
 
 import pytest
 import httpx
+import asyncio
+import contextlib
+import json
 import uuid
+import websockets
+from websockets.exceptions import InvalidStatus
 
 BASE_URL = "http://127.0.0.1:8000"
 
@@ -114,3 +119,161 @@ async def test_location_flow():
         invalid_radius_response = await client.get(f"/location/nearby/{user_a_id}?radius_km=-5", headers=headers_a)
         assert invalid_radius_response.status_code in [400, 422]
 
+
+
+async def _register_available_user(client, name, latitude, longitude):
+    email = f"{name.lower()}_{uuid.uuid4().hex[:8]}@example.com"
+    password = "Password123"
+    register_response = await client.post("/auth/register", json={"name": name, "email": email, "password": password})
+    assert register_response.status_code == 200
+    user_id = register_response.json()["id"]
+
+    login_response = await client.post("/auth/login", params={"email": email, "password": password})
+    assert login_response.status_code == 200
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+    available_response = await client.put(f"/profiles/{user_id}", json={"is_available": True}, headers=headers)
+    assert available_response.status_code == 200
+
+    location_response = await client.post("/location/update", json={
+        "user_id": user_id,
+        "latitude": latitude,
+        "longitude": longitude
+    }, headers=headers)
+    assert location_response.status_code == 200
+    return user_id, headers
+
+
+@pytest.mark.asyncio
+async def test_nearby_radius_filtering():
+    async with httpx.AsyncClient(base_url=BASE_URL) as client:
+
+        # --- 1. Center user plus helpers ~30m, ~3km and ~40km away
+        center_id, headers = await _register_available_user(client, "Center", 48.8584, 2.2945)
+        close_id, _ = await _register_available_user(client, "Close", 48.8586, 2.2948)
+        mid_id, _ = await _register_available_user(client, "Mid", 48.8800, 2.3200)
+        far_id, _ = await _register_available_user(client, "Far", 49.2000, 2.5000)
+
+        # --- 2. Small radius only returns the close helper
+        nearby_small = await client.get(f"/location/nearby/{center_id}?radius_km=1", headers=headers)
+        assert nearby_small.status_code == 200
+        small_ids = [user["user_id"] for user in nearby_small.json()]
+        assert close_id in small_ids
+        assert mid_id not in small_ids
+        assert far_id not in small_ids
+        assert center_id not in small_ids
+
+        # --- 3. Larger radius picks up the mid helper, still not the far one
+        nearby_large = await client.get(f"/location/nearby/{center_id}?radius_km=10", headers=headers)
+        assert nearby_large.status_code == 200
+        large_ids = [user["user_id"] for user in nearby_large.json()]
+        assert close_id in large_ids
+        assert mid_id in large_ids
+        assert far_id not in large_ids
+
+        # --- 4. Returned entries carry the helper profile
+        close_entry = next(user for user in nearby_large.json() if user["user_id"] == close_id)
+        assert close_entry["profile"]["name"] == "Close"
+
+
+@pytest.mark.asyncio
+async def test_nearest_helpers_pagination():
+    async with httpx.AsyncClient(base_url=BASE_URL) as client:
+
+        # --- 1. Center user in an otherwise empty area, helpers at increasing distances
+        center_id, headers = await _register_available_user(client, "Origin", -33.8568, 151.2153)
+        helper_ids = []
+        for step in range(1, 6):
+            helper_id, _ = await _register_available_user(client, f"Helper{step}", -33.8568 + step * 0.001, 151.2153)
+            helper_ids.append(helper_id)
+
+        # --- 2. First page: the two closest, in order, with a cursor
+        first_page = await client.get(f"/location/nearest/{center_id}?k=2&max_km=5", headers=headers)
+        assert first_page.status_code == 200, first_page.text
+        first_data = first_page.json()
+        assert [helper["user_id"] for helper in first_data["results"]] == helper_ids[:2]
+        assert first_data["results"][0]["distance_km"] < first_data["results"][1]["distance_km"]
+        assert first_data["next_cursor"]
+
+        # --- 3. Following pages continue where the previous one stopped
+        second_page = await client.get(
+            f"/location/nearest/{center_id}?k=2&max_km=5&cursor={first_data['next_cursor']}", headers=headers
+        )
+        assert second_page.status_code == 200
+        second_data = second_page.json()
+        assert [helper["user_id"] for helper in second_data["results"]] == helper_ids[2:4]
+
+        last_page = await client.get(
+            f"/location/nearest/{center_id}?k=2&max_km=5&cursor={second_data['next_cursor']}", headers=headers
+        )
+        assert [helper["user_id"] for helper in last_page.json()["results"]] == helper_ids[4:]
+        assert last_page.json()["next_cursor"] is None
+
+        # --- 4. Garbage cursor is rejected
+        bad_cursor = await client.get(f"/location/nearest/{center_id}?k=2&cursor=not-a-cursor", headers=headers)
+        assert bad_cursor.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_nearby_stream_deltas():
+    async with httpx.AsyncClient(base_url=BASE_URL) as client:
+
+        # --- 1. Watcher in Nairobi with one helper already close by
+        watcher_id, headers = await _register_available_user(client, "Watcher", -1.2921, 36.8219)
+        token = headers["Authorization"].split(" ", 1)[1]
+        early_id, _ = await _register_available_user(client, "Early", -1.2925, 36.8222)
+
+        # --- 2. Token must belong to the subscribing user
+        with pytest.raises(InvalidStatus):
+            async with websockets.connect(f"ws://127.0.0.1:8000/location/ws/nearby/{early_id}?token={token}"):
+                pass
+
+        url = f"ws://127.0.0.1:8000/location/ws/nearby/{watcher_id}?token={token}&radius_km=2"
+        async with websockets.connect(url) as ws:
+            snapshot = json.loads(await ws.recv())
+            assert snapshot["type"] == "snapshot"
+            assert [helper["user_id"] for helper in snapshot["helpers"]] == [early_id]
+
+            # --- 3. A helper walking into range enters, then moves
+            late_id, late_headers = await _register_available_user(client, "Late", -1.3500, 36.9000)
+            await client.post("/location/update", json={
+                "user_id": late_id, "latitude": -1.2930, "longitude": 36.8230
+            }, headers=late_headers)
+            enter = json.loads(await ws.recv())
+            assert enter["type"] == "enter" and enter["user_id"] == late_id
+            assert enter["distance_km"] < 2
+
+            await client.post("/location/update", json={
+                "user_id": late_id, "latitude": -1.2931, "longitude": 36.8231
+            }, headers=late_headers)
+            move = json.loads(await ws.recv())
+            assert move["type"] == "move" and move["user_id"] == late_id
+
+            # --- 4. Going unavailable leaves the map
+            await client.put(f"/profiles/{late_id}", json={"is_available": False}, headers=late_headers)
+            leave = json.loads(await ws.recv())
+            assert leave == {"type": "leave", "user_id": late_id}
+
+            # --- 5. Malformed frames get an error and the stream stays open
+            for frame in ["not json", "[]", "1", '"x"', json.dumps({"type": "subscribe", "latitude": "north"})]:
+                await ws.send(frame)
+                assert json.loads(await ws.recv()) == {"type": "error", "detail": "Invalid subscribe message"}
+            await ws.send(json.dumps({"type": "subscribe", "latitude": -1.2921, "longitude": 36.8219, "radius_km": 1}))
+            assert json.loads(await ws.recv())["type"] == "snapshot"
+
+
+@pytest.mark.asyncio
+async def test_nearby_streams_do_not_hold_db_connections():
+    async with httpx.AsyncClient(base_url=BASE_URL) as client:
+        watcher_id, headers = await _register_available_user(client, "Mapper", 35.6762, 139.6503)
+        token = headers["Authorization"].split(" ", 1)[1]
+        url = f"ws://127.0.0.1:8000/location/ws/nearby/{watcher_id}?token={token}&radius_km=1"
+
+        # More open maps than the connection pool (5 + 10 overflow) has connections
+        async with contextlib.AsyncExitStack() as stack:
+            sockets = [await stack.enter_async_context(websockets.connect(url, open_timeout=5)) for _ in range(20)]
+            for ws in sockets:
+                assert json.loads(await asyncio.wait_for(ws.recv(), 5))["type"] == "snapshot"
+
+            profile = await client.get(f"/profiles/{watcher_id}", headers=headers, timeout=5)
+            assert profile.status_code == 200
@@ -0,0 +1,233 @@
+# app/tests/test_location_backends.py
+
+import datetime
+import os
+import time
+import uuid
+
+import pytest
+
+from app.models.location import UserLocation
+from app.services.location import LocationWriteBuffer, SqlLocationBackend
+from app.utils.distance import EARTH_RADIUS_KM, calculate_distance, haversine_many
+from app.utils.presence import LocationBackend, PresenceStore, RedisLocationBackend, Position
+
+
+class FakeRedis:
+    """In-process stand-in for the handful of Redis commands RedisLocationBackend uses."""
+
+    def __init__(self):
+        self.sorted_sets = {}
+        self.geo = {}
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def geoadd(self, name, values):
+        members = self.geo.setdefault(name, {})
+        for i in range(0, len(values), 3):
+            longitude, latitude, member = values[i:i + 3]
+            members[member] = (longitude, latitude)
+
+    def geopos(self, name, *members):
+        positions = self.geo.get(name, {})
+        return [positions.get(member) for member in members]
+
+    def geosearch(self, name, longitude=None, latitude=None, radius=None, unit="m",
+                  sort=None, withdist=False, withcoord=False):
+        results = []
+        for member, (lng, lat) in self.geo.get(name, {}).items():
+            distance = calculate_distance(latitude, longitude, lat, lng)
+            if distance <= radius:
+                results.append([member, distance, (lng, lat)])
+        results.sort(key=lambda result: result[1], reverse=(sort == "DESC"))
+        return results
+
+    def zadd(self, name, mapping):
+        self.sorted_sets.setdefault(name, {}).update(mapping)
+
+    def zscore(self, name, member):
+        return self.sorted_sets.get(name, {}).get(member)
+
+    def zmscore(self, name, members):
+        scores = self.sorted_sets.get(name, {})
+        return [scores.get(member) for member in members]
+
+    def zrangebyscore(self, name, minimum, maximum):
+        return [member for member, score in self.sorted_sets.get(name, {}).items() if score <= float(maximum)]
+
+    def zrem(self, name, *members):
+        for member in members:
+            self.sorted_sets.get(name, {}).pop(member, None)
+            self.geo.get(name, {}).pop(member, None)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, command):
+        def queue(*args, **kwargs):
+            self.calls.append((command, args, kwargs))
+        return queue
+
+    def execute(self):
+        results = [getattr(self.client, command)(*args, **kwargs) for command, args, kwargs in self.calls]
+        self.calls = []
+        return results
+
+
+def _redis_client():
+    url = os.getenv("REDIS_URL")
+    if url:
+        import redis
+        client = redis.Redis.from_url(url, decode_responses=True)
+        try:
+            client.ping()
+            return client
+        except redis.exceptions.ConnectionError:
+            pass
+    return FakeRedis()
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request):
+    if request.param == "memory":
+        return PresenceStore()
+    return RedisLocationBackend(_redis_client(), key_prefix=f"test:{uuid.uuid4().hex}")
+
+
+def test_upsert_get_and_remove(backend):
+    backend.upsert("helper", 48.8586, 2.2948)
+    position = backend.get("helper")
+    assert position.user_id == "helper"
+    assert position.latitude == pytest.approx(48.8586, abs=1e-5)
+    assert position.longitude == pytest.approx(2.2948, abs=1e-5)
+
+    backend.remove("helper")
+    assert backend.get("helper") is None
+
+
+def test_nearby_orders_by_distance(backend):
+    backend.upsert("me", 48.8584, 2.2945)
+    backend.upsert("far", 48.8800, 2.3200)
+    backend.upsert("near", 48.8586, 2.2948)
+    backend.upsert("out_of_range", 49.2000, 2.5000)
+
+    hits = backend.nearby(48.8584, 2.2945, 10, exclude="me")
+    assert [position.user_id for position, _ in hits] == ["near", "far"]
+    assert hits[0][1] < hits[1][1]
+
+
+def test_equal_distances_are_ordered_by_user_id(backend):
+    for user_id in ("b", "c", "a"):
+        backend.upsert(user_id, 0.01, 0.01)
+    backend.upsert("near", 0.005, 0.005)
+
+    assert [position.user_id for position, _ in backend.nearby(0.0, 0.0, 5)] == ["near", "a", "b", "c"]
+    assert [position.user_id for position, _ in backend.iter_nearest(0.0, 0.0, max_km=5)] == ["near", "a", "b", "c"]
+
+
+class SkewedBackend(LocationBackend):
+    """nearby() reports distances 1e-4 long for small radii, like a fast path that switches off at 10km."""
+
+    def __init__(self, positions):
+        self.positions = positions
+
+    def nearby(self, latitude, longitude, radius_km, exclude=None):
+        skew = 1 + 1e-4 if radius_km <= 10 else 1
+        distances = haversine_many(
+            latitude, longitude, [p.latitude for p in self.positions], [p.longitude for p in self.positions]
+        ) * skew
+        return sorted(
+            ((position, float(distance)) for position, distance in zip(self.positions, distances) if distance <= radius_km),
+            key=lambda hit: hit[1]
+        )
+
+
+def test_default_iter_nearest_keeps_points_on_ring_boundaries():
+    # Just inside the 8km ring by haversine, just outside it by the skewed distance
+    edge_lat = 7.9995 / EARTH_RADIUS_KM * 180 / 3.141592653589793
+    edge = Position("edge", edge_lat, 0.0, datetime.datetime.utcnow())
+    assert 7.999 < calculate_distance(0.0, 0.0, edge_lat, 0.0) < 8
+
+    hits = list(SkewedBackend([edge]).iter_nearest(0.0, 0.0, max_km=50))
+    assert [(position.user_id, round(distance, 4)) for position, distance in hits] == [("edge", 7.9995)]
+
+
+def test_stale_positions_are_ignored(backend):
+    stale = datetime.datetime.utcnow() - datetime.timedelta(minutes=10)
+    backend.upsert("stale", 48.8586, 2.2948, updated_at=stale)
+    backend.upsert("fresh", 48.8587, 2.2949)
+
+    assert backend.get("stale") is None
+    assert [position.user_id for position, _ in backend.nearby(48.8584, 2.2945, 1)] == ["fresh"]
+
+
+def test_write_buffer_coalesces_and_flushes_on_stop(session_factory):
+    buffer = LocationWriteBuffer(session_factory, flush_interval_ms=60_000, max_entries=1000)
+    now = datetime.datetime.utcnow()
+    for step in range(50):
+        buffer.submit(Position("helper", 10.0 + step * 0.001, 20.0, now + datetime.timedelta(milliseconds=step)))
+    buffer.submit(Position("other", 11.0, 21.0, now))
+
+    # Only the latest ping per user is kept, and it is readable before any flush
+    assert len(buffer.pending()) == 2
+    assert buffer.get("helper").latitude == pytest.approx(10.049)
+    db = session_factory()
+    assert db.query(UserLocation).count() == 0
+    db.close()
+
+    buffer.stop()
+    db = session_factory()
+    rows = {row.user_id: row for row in db.query(UserLocation).all()}
+    db.close()
+    assert set(rows) == {"helper", "other"}
+    assert rows["helper"].latitude == pytest.approx(10.049)
+    assert rows["helper"].geohash
+    assert buffer.pending() == []
+
+
+def test_write_buffer_flushes_when_full(session_factory):
+    buffer = LocationWriteBuffer(session_factory, flush_interval_ms=60_000, max_entries=10)
+    for i in range(10):
+        buffer.submit(Position(f"user{i}", 10.0, 20.0 + i * 0.001, datetime.datetime.utcnow()))
+
+    for _ in range(100):
+        db = session_factory()
+        count = db.query(UserLocation).count()
+        db.close()
+        if count == 10:
+            break
+        time.sleep(0.02)
+    assert count == 10
+    buffer.stop()
+
+
+def test_sql_backend_reads_see_buffered_positions(session_factory):
+    buffer = LocationWriteBuffer(session_factory, flush_interval_ms=60_000)
+    backend = SqlLocationBackend(buffer, session_factory)
+
+    backend.upsert("helper", 48.8586, 2.2948)
+    buffer.flush()
+    # Moves out of range, but the move is still buffered
+    backend.upsert("helper", 49.2000, 2.5000)
+    backend.upsert("newcomer", 48.8585, 2.2946)
+
+    assert backend.get("helper").latitude == pytest.approx(49.2)
+    assert [position.user_id for position, _ in backend.nearby(48.8584, 2.2945, 1)] == ["newcomer"]
+    buffer.stop()
+
+
+def test_sql_backend_orders_equal_distances_by_user_id(session_factory):
+    buffer = LocationWriteBuffer(session_factory, flush_interval_ms=60_000)
+    backend = SqlLocationBackend(buffer, session_factory)
+
+    backend.upsert("b", 0.01, 0.01)
+    backend.upsert("c", 0.01, 0.01)
+    buffer.flush()
+    backend.upsert("a", 0.01, 0.01)
+
+    assert [position.user_id for position, _ in backend.nearby(0.0, 0.0, 5)] == ["a", "b", "c"]
+    buffer.stop()
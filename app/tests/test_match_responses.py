@@ -0,0 +1,103 @@
+# app/tests/test_match_responses.py
+
+import datetime
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from app.models.matchmaking import MatchRequest
+from app.models.notification import Notification
+from app.models.session import Session
+from app.schemas.matchmaking import MatchRequestUpdate
+from app.services.matchmaking import respond_to_match
+
+
+def _pending_match(receiver_id="helper", dispatch_id=None):
+    return MatchRequest(
+        match_id=str(uuid.uuid4()),
+        requester_id="requester",
+        receiver_id=receiver_id,
+        request_type="photo",
+        distance="1km",
+        distance_m=1000,
+        latitude=51.5,
+        longitude=-0.12,
+        dispatch_id=dispatch_id,
+        status="pending",
+        created_at=datetime.datetime.utcnow()
+    )
+
+
+def _count_commits(db):
+    commits = []
+    event.listen(db, "after_commit", lambda session: commits.append(session))
+    return commits
+
+
+def test_accept_commits_once(db):
+    match = _pending_match()
+    db.add(match)
+    db.commit()
+    commits = _count_commits(db)
+
+    accepted = respond_to_match(db, match.match_id, MatchRequestUpdate(status="accepted"), SimpleNamespace(id="helper"))
+
+    assert accepted.status == "accepted" and accepted.accepted_at is not None
+    assert len(commits) == 1
+    assert db.query(Session).filter(Session.match_id == match.match_id).count() == 1
+    # Requester update plus one "New Session Created" per participant
+    assert db.query(Notification).count() == 3
+
+
+def test_accept_rolls_back_when_session_fails(db):
+    match = _pending_match()
+    db.add_all([match, Session(
+        session_id=str(uuid.uuid4()), requester_id="requester", helper_id="helper",
+        match_id=match.match_id, status="created", location={"lat": 51.5, "lng": -0.12}
+    )])
+    db.commit()
+
+    with pytest.raises(HTTPException) as error:
+        respond_to_match(db, match.match_id, MatchRequestUpdate(status="accepted"), SimpleNamespace(id="helper"))
+    assert error.value.status_code == 409
+
+    db.expire_all()
+    assert db.get(MatchRequest, match.match_id).status == "pending"
+    assert db.query(Notification).count() == 0
+
+
+def test_only_first_response_wins(db):
+    siblings = [_pending_match(receiver_id=f"helper{i}", dispatch_id="dispatch") for i in range(3)]
+    db.add_all(siblings)
+    db.commit()
+
+    respond_to_match(db, siblings[1].match_id, MatchRequestUpdate(status="accepted"), SimpleNamespace(id="helper1"))
+
+    with pytest.raises(HTTPException) as error:
+        respond_to_match(db, siblings[0].match_id, MatchRequestUpdate(status="accepted"), SimpleNamespace(id="helper0"))
+    assert error.value.status_code == 409
+
+    db.expire_all()
+    assert [db.get(MatchRequest, match.match_id).status for match in siblings] == ["expired", "accepted", "expired"]
+    assert [db.get(MatchRequest, match.match_id).accepted_at is None for match in siblings] == [True, False, True]
+
+
+def test_respond_errors(db):
+    match = _pending_match()
+    db.add(match)
+    db.commit()
+
+    assert respond_to_match(db, "missing", MatchRequestUpdate(status="declined"), SimpleNamespace(id="helper")) is None
+    with pytest.raises(HTTPException) as error:
+        respond_to_match(db, match.match_id, MatchRequestUpdate(status="declined"), SimpleNamespace(id="someone"))
+    assert error.value.status_code == 403
+    with pytest.raises(HTTPException) as error:
+        respond_to_match(db, match.match_id, MatchRequestUpdate(status="maybe"), SimpleNamespace(id="helper"))
+    assert error.value.status_code == 400
+
+    declined = respond_to_match(db, match.match_id, MatchRequestUpdate(status="declined"), SimpleNamespace(id="helper"))
+    assert declined.status == "declined" and declined.accepted_at is None
+    assert db.query(Session).count() == 0
@@ -4,6 +4,8 @@ import pytest
 import httpx
 import uuid
 
+from app.tests.test_location import _register_available_user
+
 BASE_URL = "http://127.0.0.1:8000"
 
 @pytest.mark.asyncio
@@ -175,3 +177,74 @@ async def test_matchmaking_full_flow():
         duplicate_match_id = duplicate_match.json()["match_id"]
         duplicate_respond = await client.post(f"/matchmaking/respond/{duplicate_match_id}", json={"status": "accepted"}, headers=headers_b)
         assert duplicate_respond.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_dispatch_to_nearest_helpers():
+    async with httpx.AsyncClient(base_url=BASE_URL) as client:
+
+        # -------- Setup: requester in Lima, two close helpers, one further out --------
+        requester_id, headers_req = await _register_available_user(client, "Requester", -12.0464, -77.0428)
+        near_id, headers_near = await _register_available_user(client, "Near", -12.0466, -77.0430)
+        next_id, headers_next = await _register_available_user(client, "Next", -12.0480, -77.0440)
+        await _register_available_user(client, "Further", -12.0600, -77.0600)
+
+        dispatch_payload = {
+            "requester_id": requester_id,
+            "request_type": "photo",
+            "distance": "1km",
+            "latitude": -12.0464,
+            "longitude": -77.0428,
+            "max_helpers": 5
+        }
+
+        # 1. Invalid distance / someone else's requester_id
+        bad_distance = await client.post("/matchmaking/dispatch", json={**dispatch_payload, "distance": "far"}, headers=headers_req)
+        assert bad_distance.status_code == 422
+        not_mine = await client.post("/matchmaking/dispatch", json=dispatch_payload, headers=headers_near)
+        assert not_mine.status_code == 403
+
+        # 2. Dispatch reaches the helpers within 1km, closest first
+        dispatch = await client.post("/matchmaking/dispatch", json=dispatch_payload, headers=headers_req)
+        assert dispatch.status_code == 200, dispatch.text
+        dispatch_data = dispatch.json()
+        assert [match["receiver_id"] for match in dispatch_data["matches"]] == [near_id, next_id]
+        assert {match["dispatch_id"] for match in dispatch_data["matches"]} == {dispatch_data["dispatch_id"]}
+        assert {match["distance_m"] for match in dispatch_data["matches"]} == {1000}
+        near_match, next_match = dispatch_data["matches"]
+
+        # Numeric distance_m works too; 200m only reaches the closest helper
+        numeric_payload = {key: value for key, value in dispatch_payload.items() if key != "distance"}
+        numeric = await client.post("/matchmaking/dispatch", json={**numeric_payload, "distance_m": 200}, headers=headers_req)
+        assert numeric.status_code == 200, numeric.text
+        assert [(match["receiver_id"], match["distance"]) for match in numeric.json()["matches"]] == [(near_id, "200m")]
+
+        # 3. First acceptance wins, the sibling is expired
+        accept = await client.post(f"/matchmaking/respond/{near_match['match_id']}", json={"status": "accepted"}, headers=headers_near)
+        assert accept.status_code == 200
+        assert accept.json()["status"] == "accepted"
+
+        late_accept = await client.post(f"/matchmaking/respond/{next_match['match_id']}", json={"status": "accepted"}, headers=headers_next)
+        assert late_accept.status_code == 409
+
+        next_matches = await client.get(f"/matchmaking/my-matches/{next_id}", headers=headers_next)
+        assert next_match["match_id"] not in [match["match_id"] for match in next_matches.json()]
+
+
+@pytest.mark.asyncio
+async def test_ranked_helpers():
+    async with httpx.AsyncClient(base_url=BASE_URL) as client:
+        requester_id, headers_req = await _register_available_user(client, "Requester", 59.3293, 18.0686)
+        near_id, _ = await _register_available_user(client, "Near", 59.3295, 18.0690)
+        far_id, _ = await _register_available_user(client, "Far", 59.3400, 18.0900)
+        await _register_available_user(client, "Outside", 59.5000, 18.5000)
+
+        ranked = await client.get(f"/matchmaking/ranked/{requester_id}", params={"radius_km": 3}, headers=headers_req)
+        assert ranked.status_code == 200, ranked.text
+        results = ranked.json()
+        # Same profile features, so closeness decides
+        assert [helper["user_id"] for helper in results] == [near_id, far_id]
+        assert results[0]["score"] > results[1]["score"]
+
+        forbidden = await client.get(f"/matchmaking/ranked/{near_id}", headers=headers_req)
+        assert forbidden.status_code == 403
@@ -0,0 +1,111 @@
+# app/tests/test_message_writer.py
+
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.models.chat import Message
+from app.schemas.chat import MessageCreate
+from app.services.chat import MessageWriter
+
+
+def _message(message_id, content="hello", session_id="session"):
+    return MessageCreate(message_id=message_id, session_id=session_id, sender_id="sender", content=content)
+
+
+@pytest.mark.asyncio
+async def test_messages_are_committed_off_the_event_loop(session_factory):
+    writer = MessageWriter(session_factory)
+    try:
+        saved = await asyncio.gather(*(writer.submit(_message(f"m{i}", f"hello {i}")) for i in range(20)))
+        assert [message.content for message in saved] == [f"hello {i}" for i in range(20)]
+        assert all(message.timestamp is not None for message in saved)
+
+        # A retried message_id returns the stored message instead of a duplicate
+        retry = await writer.submit(_message("m0", "resent"))
+        assert retry.content == "hello 0"
+    finally:
+        writer.stop()
+
+    db = session_factory()
+    assert db.query(Message).count() == 20
+    db.close()
+
+
+@pytest.mark.asyncio
+async def test_slow_commit_does_not_block_the_loop(session_factory):
+    def slow_session():
+        db = session_factory()
+        event.listen(db, "before_commit", lambda session: time.sleep(0.3))
+        return db
+
+    writer = MessageWriter(slow_session)
+    try:
+        pending = writer.submit(_message("slow"))
+        ticks = 0
+        while not pending.done():
+            await asyncio.sleep(0.01)
+            ticks += 1
+        assert ticks >= 10
+        assert (await pending).message_id == "slow"
+    finally:
+        writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_write_errors_reach_the_caller(tmp_path):
+    # No messages table: the INSERT fails
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    writer = MessageWriter(sessionmaker(bind=engine))
+    try:
+        with pytest.raises(Exception):
+            await writer.submit(_message("lost"))
+        # The writer keeps serving later messages
+        with pytest.raises(Exception):
+            await writer.submit(_message("also lost"))
+    finally:
+        writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_messages_are_group_committed(session_factory):
+    commits = []
+
+    def counting_session():
+        db = session_factory()
+        event.listen(db, "after_commit", lambda session: commits.append(session))
+        return db
+
+    # A long interval so every message lands in one batch, capped at 10 per batch
+    writer = MessageWriter(counting_session, flush_interval_ms=200, max_messages=10)
+    try:
+        saved = await asyncio.gather(*(
+            writer.submit(_message(f"m{i}", f"hello {i}", session_id=f"session{i % 3}")) for i in range(25)
+        ))
+    finally:
+        writer.stop()
+
+    assert [message.message_id for message in saved] == [f"m{i}" for i in range(25)]
+    assert len(commits) == 3
+
+
+@pytest.mark.asyncio
+async def test_duplicates_within_a_batch_keep_the_first(session_factory):
+    writer = MessageWriter(session_factory, flush_interval_ms=200)
+    try:
+        first, retry, other = await asyncio.gather(
+            writer.submit(_message("dup", "original")),
+            writer.submit(_message("dup", "resent")),
+            writer.submit(_message("other")),
+        )
+    finally:
+        writer.stop()
+
+    assert first.content == retry.content == "original"
+    assert other.message_id == "other"
+    db = session_factory()
+    assert db.query(Message).count() == 2
+    db.close()
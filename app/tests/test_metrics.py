@@ -0,0 +1,38 @@
+# app/tests/test_metrics.py
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.routers import metrics as metrics_router
+from app.utils.metrics import metrics
+
+
+def _client():
+    app = FastAPI()
+    app.include_router(metrics_router.router)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_metrics_are_off_without_a_token(monkeypatch):
+    monkeypatch.setattr(metrics_router, "METRICS_TOKEN", "")
+    async with _client() as client:
+        response = await client.get("/metrics", headers={"Authorization": "Bearer anything"})
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_metrics_require_the_token(monkeypatch):
+    monkeypatch.setattr(metrics_router, "METRICS_TOKEN", "scrape-secret")
+    metrics.reset()
+    metrics.increment("chat_messages_written_total", 3)
+
+    async with _client() as client:
+        missing = await client.get("/metrics")
+        wrong = await client.get("/metrics", headers={"Authorization": "Bearer nope"})
+        ok = await client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+
+    assert missing.status_code == 401 and wrong.status_code == 401
+    assert ok.status_code == 200
+    assert "chat_messages_written_total 3" in ok.text
@@ -0,0 +1,78 @@
+# app/tests/test_nearby_stream.py
+
+import asyncio
+
+import pytest
+
+from app.utils.distance import distances_within, haversine_many
+from app.utils.nearby_stream import NearbyStreamHub
+
+
+async def _drain(queue):
+    await asyncio.sleep(0)
+    messages = []
+    while not queue.empty():
+        messages.append(queue.get_nowait())
+    return messages
+
+
+@pytest.mark.asyncio
+async def test_availability_is_reread_after_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("app.utils.nearby_stream.time.monotonic", lambda: clock[0])
+    hub = NearbyStreamHub(availability_ttl_seconds=30)
+    queue = asyncio.Queue()
+    hub.subscribe("watcher", 0.0, 0.0, 5, queue)
+    lookups = []
+
+    def available():
+        lookups.append(1)
+        return len(lookups) == 1
+
+    hub.position_changed("helper", 0.001, 0.001, available)
+    hub.position_changed("helper", 0.002, 0.002, available)
+    assert [message["type"] for message in await _drain(queue)] == ["enter", "move"]
+    assert len(lookups) == 1
+
+    # Turned unavailable elsewhere: seen once the cached value has expired
+    clock[0] += 31
+    hub.position_changed("helper", 0.003, 0.003, available)
+    assert [message["type"] for message in await _drain(queue)] == ["leave"]
+    assert len(lookups) == 2
+
+
+def test_availability_cache_is_bounded():
+    hub = NearbyStreamHub(availability_cache_size=3)
+    for i in range(10):
+        hub.availability_changed(f"helper{i}", True)
+    assert list(hub._available) == ["helper7", "helper8", "helper9"]
+
+
+def _edge_point(lat, lng, radius_km, distance):
+    """Bisect along a fixed bearing for the furthest point distance() still puts within radius_km."""
+    inside, outside = 0.0, 1.0
+    for _ in range(100):
+        step = (inside + outside) / 2
+        if distance(lat, lng, [lat + 0.03 * step], [lng + 0.08 * step])[0] <= radius_km:
+            inside = step
+        else:
+            outside = step
+    return lat + 0.03 * inside, lng + 0.08 * inside
+
+
+@pytest.mark.asyncio
+async def test_stream_uses_the_snapshot_distance_rule():
+    center, radius_km = (60.0, 10.0), 5
+    hub = NearbyStreamHub()
+    queue = asyncio.Queue()
+    hub.subscribe("watcher", *center, radius_km, queue)
+
+    # Inside by haversine, just outside by the fast path the snapshot uses for small radii
+    edge = _edge_point(*center, radius_km, haversine_many)
+    assert not distances_within(*center, [edge[0]], [edge[1]], radius_km)[1][0]
+    hub.position_changed("helper", *edge, lambda: True)
+    assert await _drain(queue) == []
+
+    snapshot_edge = _edge_point(*center, radius_km, lambda *args: distances_within(*args, radius_km)[0])
+    hub.position_changed("helper", *snapshot_edge, lambda: True)
+    assert [message["type"] for message in await _drain(queue)] == ["enter"]
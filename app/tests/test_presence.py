@@ -0,0 +1,39 @@
+# app/tests/test_presence.py
+
+import time
+
+from app.utils.presence import PresenceStore
+
+
+def test_upsert_moves_entry_between_buckets():
+    store = PresenceStore()
+    store.upsert("helper", 48.8586, 2.2948)
+    assert [entry.user_id for entry, _ in store.nearby(48.8584, 2.2945, 1)] == ["helper"]
+
+    # Moving ~40km away drops the helper from the small radius
+    store.upsert("helper", 49.2000, 2.5000)
+    assert store.nearby(48.8584, 2.2945, 1) == []
+    assert [entry.user_id for entry, _ in store.nearby(48.8584, 2.2945, 50)] == ["helper"]
+    assert len(store) == 1
+
+
+def test_nearby_is_sorted_and_excludes_caller():
+    store = PresenceStore()
+    store.upsert("me", 48.8584, 2.2945)
+    store.upsert("far", 48.8800, 2.3200)
+    store.upsert("near", 48.8586, 2.2948)
+
+    hits = store.nearby(48.8584, 2.2945, 10, exclude="me")
+    assert [entry.user_id for entry, _ in hits] == ["near", "far"]
+    assert hits[0][1] < hits[1][1]
+
+
+def test_entries_expire_after_ttl():
+    store = PresenceStore(ttl_seconds=0.05)
+    store.upsert("helper", 12.9716, 77.5946)
+    assert store.get("helper") is not None
+
+    time.sleep(0.1)
+    assert store.get("helper") is None
+    assert store.nearby(12.9716, 77.5946, 1) == []
+    assert len(store) == 0
@@ -0,0 +1,87 @@
+# app/tests/test_ranking.py
+
+import datetime
+import time
+import uuid
+
+import numpy as np
+import pytest
+
+from app.models.matchmaking import MatchRequest
+from app.models.profile import UserProfile
+from app.services.ranking import FEATURES, compute_features, score_candidates
+
+
+def _offer(receiver_id, status, response_seconds=None):
+    created_at = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+    return MatchRequest(
+        match_id=str(uuid.uuid4()),
+        requester_id="requester",
+        receiver_id=receiver_id,
+        request_type="photo",
+        distance="1km",
+        latitude=0.0,
+        longitude=0.0,
+        status=status,
+        created_at=created_at,
+        accepted_at=created_at + datetime.timedelta(seconds=response_seconds) if response_seconds is not None else None
+    )
+
+
+def test_compute_features(db):
+    db.add_all([
+        UserProfile(user_id="veteran", average_rating=4.9, total_sessions=200, verification_status="verified"),
+        UserProfile(user_id="newcomer", average_rating=5.0, total_sessions=1, verification_status="pending"),
+        _offer("veteran", "accepted", 30),
+        _offer("veteran", "accepted", 90),
+        _offer("veteran", "declined", 60),
+        _offer("newcomer", "expired"),
+    ])
+    db.commit()
+
+    snapshot = compute_features(db)
+    veteran = dict(zip(FEATURES, snapshot.matrix[snapshot.index["veteran"]]))
+    newcomer = dict(zip(FEATURES, snapshot.matrix[snapshot.index["newcomer"]]))
+
+    assert veteran["verified"] == 1.0 and newcomer["verified"] == 0.0
+    assert veteran["experience"] == 1.0
+    # A single 5-star session barely moves the prior
+    assert newcomer["rating"] < veteran["rating"]
+    assert veteran["acceptance"] == pytest.approx((2 + 1) / (3 + 2))
+    assert newcomer["acceptance"] == pytest.approx(1 / 3)
+    assert veteran["responsiveness"] == pytest.approx(np.exp(-60 / 300), rel=1e-3)
+
+
+def test_score_prefers_better_helper_at_equal_distance(db):
+    db.add_all([
+        UserProfile(user_id="good", average_rating=4.9, total_sessions=80, verification_status="verified"),
+        UserProfile(user_id="poor", average_rating=2.0, total_sessions=80, verification_status="pending"),
+    ])
+    db.commit()
+    snapshot = compute_features(db)
+
+    scores = score_candidates(snapshot, ["poor", "good", "unknown"], [1.0, 1.0, 1.0], radius_km=5)
+    assert scores[1] > scores[0]
+    # Helpers missing from the snapshot get the no-history defaults
+    assert scores[2] == pytest.approx(score_candidates(snapshot, ["also_unknown"], [1.0], radius_km=5)[0])
+
+    # Closer wins between otherwise identical helpers
+    near, far = score_candidates(snapshot, ["good", "good"], [0.1, 4.0], radius_km=5)
+    assert near > far
+
+
+def test_scoring_5000_candidates_is_fast(db):
+    db.add_all([
+        UserProfile(user_id=f"helper{i}", average_rating=3 + (i % 20) / 10, total_sessions=i % 50)
+        for i in range(5000)
+    ])
+    db.commit()
+    snapshot = compute_features(db)
+    user_ids = [f"helper{i}" for i in range(5000)]
+    distances = np.random.default_rng(3).uniform(0, 5, 5000)
+
+    score_candidates(snapshot, user_ids, distances, radius_km=5)
+    started = time.perf_counter()
+    scores = score_candidates(snapshot, user_ids, distances, radius_km=5)
+    np.argsort(-scores, kind="stable")
+    assert time.perf_counter() - started < 0.05
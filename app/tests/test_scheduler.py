@@ -0,0 +1,86 @@
+# app/tests/test_scheduler.py
+
+import datetime
+import uuid
+
+from app.models.matchmaking import MatchRequest
+from app.models.notification import Notification
+from app.services.matchmaking import expire_stale_matches, get_user_matches
+from app.utils.scheduler import FileLeaderLock, Scheduler
+
+
+def _match(requester_id, age_minutes, status="pending", dispatch_id=None):
+    return MatchRequest(
+        match_id=str(uuid.uuid4()),
+        requester_id=requester_id,
+        receiver_id=str(uuid.uuid4()),
+        request_type="photo",
+        distance="1km",
+        latitude=0.0,
+        longitude=0.0,
+        dispatch_id=dispatch_id,
+        status=status,
+        created_at=datetime.datetime.utcnow() - datetime.timedelta(minutes=age_minutes)
+    )
+
+
+def test_expire_stale_matches(db):
+    old_single = _match("alice", 45)
+    old_dispatch = [_match("bob", 40, dispatch_id="d1") for _ in range(3)]
+    fresh = _match("carol", 5)
+    old_accepted = _match("dave", 60, status="accepted")
+    db.add_all([old_single, *old_dispatch, fresh, old_accepted])
+    db.commit()
+
+    assert expire_stale_matches(db, max_age_minutes=30, batch_size=2) == 4
+
+    statuses = {match.match_id: match.status for match in db.query(MatchRequest).all()}
+    assert statuses[old_single.match_id] == "expired"
+    assert all(statuses[match.match_id] == "expired" for match in old_dispatch)
+    assert statuses[fresh.match_id] == "pending"
+    assert statuses[old_accepted.match_id] == "accepted"
+
+    # One notification per request, even though the dispatch spanned batches
+    notified = sorted(notification.user_id for notification in db.query(Notification).all())
+    assert notified == ["alice", "bob"]
+
+    assert expire_stale_matches(db, max_age_minutes=30) == 0
+
+
+def test_user_matches_are_recent_and_active(db):
+    fresh_pending = _match("alice", 5)
+    fresh_accepted = _match("alice", 10, status="accepted")
+    old_accepted = _match("alice", 45, status="accepted")
+    declined = _match("alice", 5, status="declined")
+    as_receiver = _match("bob", 5)
+    as_receiver.receiver_id = "alice"
+    db.add_all([fresh_pending, fresh_accepted, old_accepted, declined, as_receiver])
+    db.commit()
+
+    matches = {match.match_id for match in get_user_matches(db, "alice")}
+    assert matches == {fresh_pending.match_id, fresh_accepted.match_id, as_receiver.match_id}
+
+
+def test_file_leader_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    first, second = FileLeaderLock(path), FileLeaderLock(path)
+
+    assert first.acquire()
+    assert first.refresh()
+    assert not second.acquire()
+
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_scheduler_runs_due_tasks():
+    runs = []
+    scheduler = Scheduler()
+    scheduler.add("often", lambda: runs.append("often"), interval_seconds=0)
+    scheduler.add("rarely", lambda: runs.append("rarely"), interval_seconds=3600)
+
+    scheduler.run_pending()
+    scheduler.run_pending()
+    assert runs.count("often") == 2
+    assert runs.count("rarely") == 1
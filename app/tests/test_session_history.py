@@ -0,0 +1,62 @@
+# app/tests/test_session_history.py
+
+import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app.models.session import Session
+from app.services.session import decode_history_cursor, get_my_sessions
+
+
+def _session(session_id, created_at, status="completed", requester_id="user", helper_id="other"):
+    return Session(
+        session_id=session_id, requester_id=requester_id, helper_id=helper_id, match_id=f"match-{session_id}",
+        status=status, location={"lat": 0.0, "lng": 0.0}, created_at=created_at
+    )
+
+
+def test_history_pages_in_created_order(db):
+    start = datetime.datetime(2026, 1, 1)
+    # Pairs share a created_at so the session_id tie-break is exercised
+    db.add_all([
+        _session(f"s{i}", start + datetime.timedelta(minutes=i // 2),
+                 requester_id="user" if i % 2 else "other", helper_id="other" if i % 2 else "user")
+        for i in range(7)
+    ] + [
+        _session("active", start, status="started"),
+        _session("self", start - datetime.timedelta(days=1), requester_id="user", helper_id="user"),
+        _session("unrelated", start, requester_id="a", helper_id="b"),
+    ])
+    db.commit()
+
+    page = get_my_sessions(db, "user", 3)
+    assert page.active.session_id == "active"
+    seen = [session.session_id for session in page.history]
+    while page.next_cursor:
+        page = get_my_sessions(db, "user", 3, page.next_cursor)
+        assert page.active is None
+        seen += [session.session_id for session in page.history]
+
+    assert seen == ["s6", "s5", "s4", "s3", "s2", "s1", "s0", "self"]
+
+
+def test_history_reads_participant_indexes(engine, db):
+    db.add(_session("s1", datetime.datetime(2026, 1, 1)))
+    db.commit()
+
+    plans = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if "UNION ALL" in statement:
+            plans.append(" ".join(row[-1] for row in cursor.connection.execute("EXPLAIN QUERY PLAN " + statement, parameters)))
+
+    page = get_my_sessions(db, "user", 10)
+    assert [session.session_id for session in page.history] == ["s1"]
+    assert "ix_sessions_requester_created" in plans[0] and "ix_sessions_helper_created" in plans[0]
+
+
+def test_malformed_cursor():
+    with pytest.raises(ValueError):
+        decode_history_cursor("garbage")
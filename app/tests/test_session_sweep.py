@@ -0,0 +1,63 @@
+# app/tests/test_session_sweep.py
+
+import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app.models.notification import Notification
+from app.models.session import Session
+from app.services.session import cancel_abandoned_sessions
+from app.utils.metrics import metrics
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+
+
+def _session(session_id, status, idle_minutes):
+    updated_at = datetime.datetime.utcnow() - datetime.timedelta(minutes=idle_minutes)
+    return Session(
+        session_id=session_id, requester_id=f"requester-{session_id}", helper_id=f"helper-{session_id}",
+        match_id=f"match-{session_id}", status=status, location={"lat": 0.0, "lng": 0.0},
+        created_at=updated_at, updated_at=updated_at
+    )
+
+
+def test_cancels_only_idle_active_sessions(db):
+    db.add_all(
+        [_session(f"idle{i}", "created" if i % 2 else "started", 120) for i in range(5)]
+        + [_session("fresh", "started", 5), _session("finished", "completed", 120)]
+    )
+    db.commit()
+
+    assert cancel_abandoned_sessions(db, idle_minutes=60, batch_size=2) == 5
+
+    statuses = dict(db.query(Session.session_id, Session.status))
+    assert [statuses[f"idle{i}"] for i in range(5)] == ["cancelled"] * 5
+    assert statuses["fresh"] == "started" and statuses["finished"] == "completed"
+    assert db.get(Session, "idle0").version == 2
+    # One notification per participant
+    assert db.query(Notification).filter(Notification.title == "Session Cancelled").count() == 10
+
+    assert cancel_abandoned_sessions(db, idle_minutes=60, batch_size=2) == 0
+    assert metrics.value("sessions_auto_cancelled_total") == 5
+    assert metrics.timing("session_sweep_seconds")[0] == 2
+    rendered = metrics.render()
+    assert "sessions_auto_cancelled_total 5" in rendered and "session_sweep_seconds_count 2" in rendered
+
+
+def test_sweep_reads_active_partial_index(engine, db):
+    db.add(_session("idle", "created", 120))
+    db.commit()
+
+    plans = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("UPDATE"):
+            plans.append(" ".join(row[-1] for row in cursor.connection.execute("EXPLAIN QUERY PLAN " + statement, parameters)))
+
+    cancel_abandoned_sessions(db, idle_minutes=60)
+    assert "ix_sessions_active_updated" in plans[0]
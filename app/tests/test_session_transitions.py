@@ -0,0 +1,153 @@
+# app/tests/test_session_transitions.py
+
+import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from app.models.notification import Notification
+from app.models.session import Session
+from app.schemas.session import SessionUpdateStatus
+from app.services.session import get_active_session, get_session_by_match_id, update_session_status
+from app.utils.presence import Position
+
+
+def _position(latitude=0.0, longitude=0.0, age_seconds=0):
+    updated_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=age_seconds)
+    return lambda db, user_id: Position(user_id, latitude, longitude, updated_at)
+
+
+@pytest.fixture(autouse=True)
+def at_session_location(monkeypatch):
+    monkeypatch.setattr("app.services.session.get_user_position", _position())
+
+
+def _session(session_id="s1", status="created", requester_id="requester", helper_id="helper", **fields):
+    return Session(
+        session_id=session_id, requester_id=requester_id, helper_id=helper_id,
+        match_id=f"match-{session_id}", status=status, location={"lat": 0.0, "lng": 0.0}, **fields
+    )
+
+
+def _move(db, status, session_id="s1", user_id="helper"):
+    return update_session_status(db, session_id, SessionUpdateStatus(status=status), SimpleNamespace(id=user_id))
+
+
+def test_transitions_stamp_times(db):
+    db.add(_session())
+    db.commit()
+    created_at = db.get(Session, "s1").updated_at
+
+    started = _move(db, "started")
+    assert started.status == "started" and started.check_in_time is not None
+    assert started.updated_at >= created_at
+
+    completed = _move(db, "completed")
+    assert completed.status == "completed" and completed.check_out_time is not None
+    assert completed.updated_at >= started.check_in_time
+    # Two notifications per transition
+    assert db.query(Notification).count() == 4
+
+
+def test_repeated_status_is_a_no_op(db):
+    db.add(_session(status="completed"))
+    db.commit()
+
+    session = _move(db, "completed")
+    assert session.status == "completed" and session.version == 1
+    assert db.query(Notification).count() == 0
+
+
+def test_rejected_transitions(db):
+    db.add_all([_session("done", status="cancelled"), _session("running", status="started")])
+    db.commit()
+
+    with pytest.raises(HTTPException) as error:
+        _move(db, "started", session_id="done")
+    assert error.value.status_code == 409 and error.value.detail == "Session already finalized."
+
+    with pytest.raises(HTTPException) as error:
+        _move(db, "created", session_id="running")
+    assert error.value.status_code == 400
+
+    with pytest.raises(HTTPException) as error:
+        _move(db, "end", session_id="running")
+    assert error.value.status_code == 409
+
+    with pytest.raises(HTTPException) as error:
+        _move(db, "completed", session_id="running", user_id="someone")
+    assert error.value.status_code == 403
+
+    assert _move(db, "started", session_id="missing") is None
+
+
+def test_completed_sessions_can_be_reopened_or_closed(db):
+    db.add_all([_session("reopened", status="completed"), _session("cancelled", status="completed"),
+                _session("closed", status="completed"), _session("direct")])
+    db.commit()
+
+    assert _move(db, "started", session_id="reopened").status == "started"
+    assert _move(db, "cancelled", session_id="cancelled").status == "cancelled"
+    assert _move(db, "end", session_id="closed").status == "end"
+    assert _move(db, "completed", session_id="direct").status == "completed"
+
+
+def test_check_in_requires_nearby_recent_position(db, monkeypatch):
+    db.add(_session())
+    db.commit()
+
+    # ~0.0018 degrees of latitude is ~200m
+    monkeypatch.setattr("app.services.session.get_user_position", _position(latitude=0.003))
+    with pytest.raises(HTTPException) as error:
+        _move(db, "started")
+    assert error.value.status_code == 403 and "334m away" in error.value.detail
+
+    monkeypatch.setattr("app.services.session.get_user_position", _position(age_seconds=3600))
+    with pytest.raises(HTTPException) as error:
+        _move(db, "started")
+    assert error.value.status_code == 400
+
+    monkeypatch.setattr("app.services.session.get_user_position", lambda db, user_id: None)
+    with pytest.raises(HTTPException) as error:
+        _move(db, "started")
+    assert error.value.status_code == 400
+
+    monkeypatch.setattr("app.services.session.get_user_position", _position(latitude=0.001))
+    assert _move(db, "started").status == "started"
+
+
+def test_check_in_needs_a_session_location(db):
+    db.add(_session())
+    db.commit()
+    db.get(Session, "s1").location = {"latitude": 0.0, "longitude": 0.0}
+    db.commit()
+
+    with pytest.raises(HTTPException) as error:
+        _move(db, "started")
+    assert error.value.status_code == 400 and "location" in error.value.detail
+
+
+def test_active_session_lookup_uses_partial_indexes(engine, db):
+    long_ago = datetime.datetime.utcnow() - datetime.timedelta(days=7)
+    db.add_all(
+        [_session(f"old{i}", status="completed", created_at=long_ago, updated_at=long_ago) for i in range(5)]
+        + [_session("current", status="started", requester_id="other", helper_id="requester")]
+    )
+    db.commit()
+
+    plans = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("SELECT"):
+            plans.append(" ".join(row[-1] for row in cursor.connection.execute("EXPLAIN QUERY PLAN " + statement, parameters)))
+
+    assert get_active_session(db, "requester").session_id == "current"
+    assert "ix_sessions_active_requester" in plans[0] and "ix_sessions_active_helper" in plans[0]
+    assert get_active_session(db, "nobody") is None
+
+    # Finished sessions drop out of the by-match lookup after the recent window
+    assert get_session_by_match_id(db, "match-old0") is None
+    assert get_session_by_match_id(db, "match-current").session_id == "current"
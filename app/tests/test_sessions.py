@@ -100,6 +100,14 @@ async def test_session_flow():
 
         start_payload = {"status": "started"}
 
+        # The requester checks in at the session location
+        check_in_location = await client.post("/location/update", json={
+            "user_id": requester_id,
+            "latitude": 12.9716,
+            "longitude": 77.5946
+        }, headers=headers_req)
+        assert check_in_location.status_code == 200
+
         # TC-13: Start session valid
         start_session = await client.post(f"/sessions/update-status/{session_id}", json=start_payload, headers=headers_req)
         assert start_session.status_code == 200
@@ -187,3 +195,54 @@ async def test_session_flow():
         # review_response = await client.post("/review/submit", json={...}) only if session completed
 
         print("\n✅ All session management tests completed with 30 scenarios!")
+
+
+async def _register(client, name):
+    email = f"{name.lower()}_{uuid.uuid4().hex[:8]}@example.com"
+    password = "Password123"
+    register_response = await client.post("/auth/register", json={"name": name, "email": email, "password": password})
+    assert register_response.status_code == 200
+    login_response = await client.post("/auth/login", params={"email": email, "password": password})
+    assert login_response.status_code == 200
+    return register_response.json()["id"], {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+
+@pytest.mark.asyncio
+async def test_my_sessions():
+    async with httpx.AsyncClient(base_url=BASE_URL) as client:
+        requester_id, headers_req = await _register(client, "Requester")
+        helper_id, headers_help = await _register(client, "Helper")
+
+        empty = await client.get("/sessions/mine", headers=headers_help)
+        assert empty.status_code == 200
+        assert empty.json() == {"active": None, "history": [], "next_cursor": None}
+
+        session_ids = []
+        for _ in range(3):
+            created = await client.post("/sessions/create", json={
+                "requester_id": requester_id,
+                "helper_id": helper_id,
+                "match_id": str(uuid.uuid4()),
+                "location": {"lat": 51.5, "lng": -0.12}
+            }, headers=headers_req)
+            assert created.status_code == 200
+            session_ids.append(created.json()["session_id"])
+        for session_id in session_ids[:2]:
+            done = await client.post(f"/sessions/update-status/{session_id}", json={"status": "completed"}, headers=headers_help)
+            assert done.status_code == 200
+
+        first = await client.get("/sessions/mine", params={"limit": 1}, headers=headers_help)
+        assert first.status_code == 200
+        assert first.json()["active"]["session_id"] == session_ids[2]
+        assert [s["session_id"] for s in first.json()["history"]] == [session_ids[1]]
+
+        second = await client.get("/sessions/mine", params={"limit": 1, "cursor": first.json()["next_cursor"]}, headers=headers_req)
+        assert second.json()["active"] is None
+        assert [s["session_id"] for s in second.json()["history"]] == [session_ids[0]]
+        assert second.json()["next_cursor"] is None
+
+        bad_cursor = await client.get("/sessions/mine", params={"cursor": "garbage"}, headers=headers_req)
+        assert bad_cursor.status_code == 400
+
+        unauthenticated = await client.get("/sessions/mine")
+        assert unauthenticated.status_code == 401
@@ -0,0 +1,73 @@
+# app/tests/test_versioning.py
+
+import datetime
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.models.matchmaking import MatchRequest
+from app.models.session import Session
+from app.schemas.matchmaking import MatchRequestUpdate
+from app.schemas.session import SessionUpdateStatus
+from app.services.matchmaking import respond_to_match
+from app.services.session import update_session_status
+from app.utils.presence import Position
+
+
+def test_concurrent_session_updates_conflict(session_factory, monkeypatch):
+    # The helper checks in at the session location
+    monkeypatch.setattr(
+        "app.services.session.get_user_position",
+        lambda db, user_id: Position(user_id, 0.0, 0.0, datetime.datetime.utcnow())
+    )
+    db = session_factory()
+    db.add(Session(
+        session_id="s1", requester_id="requester", helper_id="helper",
+        match_id="m1", status="created", location={"lat": 0.0, "lng": 0.0}
+    ))
+    db.commit()
+    db.close()
+
+    # Both requests read version 1 before either writes
+    first, second = session_factory(), session_factory()
+    first.get(Session, "s1")
+    stale = second.get(Session, "s1")
+
+    updated = update_session_status(first, "s1", SessionUpdateStatus(status="started"), SimpleNamespace(id="helper"))
+    assert updated.version == 2
+
+    stale.status = "cancelled"
+    with pytest.raises(StaleDataError):
+        second.commit()
+    second.rollback()
+
+    assert second.get(Session, "s1").status == "started"
+    first.close()
+    second.close()
+
+
+def test_claim_bumps_match_version(session_factory):
+    db = session_factory()
+    match = MatchRequest(
+        match_id=str(uuid.uuid4()), requester_id="requester", receiver_id="helper",
+        request_type="photo", distance="1km", latitude=1.0, longitude=1.0,
+        status="pending", created_at=datetime.datetime.utcnow()
+    )
+    db.add(match)
+    db.commit()
+    assert match.version == 1
+
+    # A writer that loaded the row before the response must not overwrite it
+    other = session_factory()
+    stale = other.get(MatchRequest, match.match_id)
+
+    declined = respond_to_match(db, match.match_id, MatchRequestUpdate(status="declined"), SimpleNamespace(id="helper"))
+    assert declined.version == 2
+
+    stale.status = "expired"
+    with pytest.raises(StaleDataError):
+        other.commit()
+    other.close()
+    db.close()
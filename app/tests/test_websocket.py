@@ -0,0 +1,152 @@
+# app/tests/test_websocket.py
+
+import asyncio
+
+import pytest
+
+from app.utils.metrics import metrics
+from app.utils.websocket import DROP, SLOW_CONSUMER_CLOSE_CODE, ConnectionManager, ConnectionWriter
+
+
+class FakeWebSocket:
+    def __init__(self, fail=False, delay=0.0):
+        self.fail = fail
+        self.delay = delay
+        self.sent = []
+        self.closed_with = None
+        self.release = None  # asyncio.Event: when set, sends wait for it
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        if self.release is not None:
+            await self.release.wait()
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("socket closed")
+        self.sent.append(message)
+
+    async def send_json(self, message):
+        await self.send_text(message)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+@pytest.mark.asyncio
+async def test_room_broadcast_excludes_sender():
+    manager = ConnectionManager()
+    requester, helper, helper_tab = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    for websocket in (requester, helper, helper_tab):
+        await manager.connect("session", websocket)
+    await manager.connect("other", FakeWebSocket())
+
+    await manager.broadcast("hello", "session", exclude=requester)
+    await manager.send_personal_message({"type": "notification"}, "session")
+    await manager.send(requester, "ack")
+    await manager.flush()
+
+    assert requester.sent == [{"type": "notification"}, "ack"]
+    assert helper.sent == helper_tab.sent == ["hello", {"type": "notification"}]
+
+
+@pytest.mark.asyncio
+async def test_dead_sockets_are_pruned():
+    manager = ConnectionManager()
+    alive, dead = FakeWebSocket(), FakeWebSocket(fail=True)
+    await manager.connect("session", alive)
+    await manager.connect("session", dead)
+
+    await manager.broadcast("ping", "session")
+    await manager.flush()
+    assert manager.connections("session") == {alive}
+    assert await manager.send(dead, "ping") is False
+
+    manager.disconnect("session", alive)
+    assert "session" not in manager.active_connections
+    # Leaving twice, or a room that never existed, is harmless
+    manager.disconnect("session", alive)
+    await manager.broadcast("ping", "missing")
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_does_not_delay_others():
+    manager = ConnectionManager()
+    slow, fast = FakeWebSocket(), FakeWebSocket()
+    slow.release = asyncio.Event()
+    await manager.connect("session", slow)
+    await manager.connect("session", fast)
+
+    started = asyncio.get_running_loop().time()
+    for i in range(10):
+        await manager.broadcast(f"message {i}", "session")
+    await manager._writers[fast].join()
+
+    assert asyncio.get_running_loop().time() - started < 0.5
+    assert len(fast.sent) == 10 and slow.sent == []
+
+    slow.release.set()
+    await manager.flush()
+    assert slow.sent == [f"message {i}" for i in range(10)]
+
+
+@pytest.mark.asyncio
+async def test_status_frames_coalesce():
+    metrics.reset()
+    manager = ConnectionManager()
+    websocket = FakeWebSocket()
+    websocket.release = asyncio.Event()
+    await manager.connect("session", websocket)
+
+    # The first frame is taken by the writer; the rest queue behind it
+    await manager.send(websocket, "chat")
+    await asyncio.sleep(0)
+    await manager.send(websocket, "delivered m1", coalesce_key="status:m1")
+    await manager.send(websocket, "delivered m2", coalesce_key="status:m2")
+    await manager.send(websocket, "read m1", coalesce_key="status:m1")
+    assert metrics.value("ws_send_queue_depth") == 2
+
+    websocket.release.set()
+    await manager.flush()
+    assert websocket.sent == ["chat", "read m1", "delivered m2"]
+    assert metrics.value("ws_frames_coalesced_total") == 1
+    assert metrics.value("ws_send_queue_depth") == 0
+
+
+@pytest.mark.asyncio
+async def test_overflow_policies():
+    metrics.reset()
+    manager = ConnectionManager()
+
+    # disconnect: the client is closed and removed from its rooms
+    stuck = FakeWebSocket()
+    stuck.release = asyncio.Event()
+    manager._writers[stuck] = ConnectionWriter(stuck, manager, max_queue=2)
+    await manager.join("session", stuck)
+    await manager.send(stuck, "in flight")
+    await asyncio.sleep(0)
+    assert await manager.send(stuck, "one") and await manager.send(stuck, "two")
+    # Status frames are dropped rather than disconnecting
+    assert await manager.send(stuck, "status", coalesce_key="s") is False
+    assert stuck in manager.connections("session")
+    assert await manager.send(stuck, "three") is False
+    await asyncio.sleep(0)
+    assert stuck.closed_with == SLOW_CONSUMER_CLOSE_CODE
+    assert manager.connections("session") == set()
+    assert metrics.value("ws_slow_consumers_disconnected_total") == 1
+    assert metrics.value("ws_send_queue_depth") == 0
+
+    # drop: the frame is lost, the connection stays
+    lagging = FakeWebSocket()
+    lagging.release = asyncio.Event()
+    manager._writers[lagging] = ConnectionWriter(lagging, manager, max_queue=1, policy=DROP)
+    await manager.join("session", lagging)
+    await manager.send(lagging, "in flight")
+    await asyncio.sleep(0)
+    await manager.send(lagging, "kept")
+    assert await manager.send(lagging, "dropped") is False
+    lagging.release.set()
+    await manager.flush()
+    assert lagging.sent == ["in flight", "kept"]
+    assert metrics.value("ws_frames_dropped_total") == 2
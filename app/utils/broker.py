@@ -0,0 +1,144 @@
+import asyncio
+import json
+from typing import Callable, Dict
+
+from app.config import WS_BROKER, REDIS_URL
+
+# handler(channel, envelope): called on the subscribing worker's event loop; must not block
+Handler = Callable[[str, dict], None]
+
+
+class Broker:
+    """
+    Fan-out of WebSocket broadcasts between worker processes.
+
+    Subscriptions are reference-counted per channel: each local connection
+    subscribes when it joins a room and unsubscribes when it leaves, and the
+    worker only listens to a channel while at least one of its connections
+    is in that room. Every publish reaches every subscribed worker,
+    including the publisher.
+
+    Implementations: InProcessBroker (single worker) and RedisBroker.
+    """
+
+    async def subscribe(self, channel: str, handler: Handler):
+        raise NotImplementedError
+
+    async def unsubscribe(self, channel: str):
+        raise NotImplementedError
+
+    async def publish(self, channel: str, envelope: dict):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class InProcessBroker(Broker):
+    """Delivers straight to this process's subscribers."""
+
+    def __init__(self):
+        self.subscriptions: Dict[str, int] = {}
+        self._handlers: Dict[str, Handler] = {}
+
+    async def subscribe(self, channel: str, handler: Handler):
+        self.subscriptions[channel] = self.subscriptions.get(channel, 0) + 1
+        self._handlers[channel] = handler
+
+    async def unsubscribe(self, channel: str):
+        count = self.subscriptions.get(channel, 0) - 1
+        if count > 0:
+            self.subscriptions[channel] = count
+            return
+        self.subscriptions.pop(channel, None)
+        self._handlers.pop(channel, None)
+
+    async def publish(self, channel: str, envelope: dict):
+        handler = self._handlers.get(channel)
+        if handler is not None:
+            handler(channel, envelope)
+
+
+class RedisBroker(Broker):
+    """
+    Redis pub/sub with one Redis channel per room. A single reader task per
+    worker dispatches incoming messages; Redis SUBSCRIBE/UNSUBSCRIBE is only
+    sent when a channel's local reference count goes 0 -> 1 or 1 -> 0.
+    """
+
+    def __init__(self, client, channel_prefix: str = "photoaid:ws:", poll_seconds: float = 1.0):
+        self.client = client
+        self.channel_prefix = channel_prefix
+        self.poll_seconds = poll_seconds
+        self.subscriptions: Dict[str, int] = {}
+        self._handlers: Dict[str, Handler] = {}
+        self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self._lock = asyncio.Lock()
+        self._reader = None
+
+    async def subscribe(self, channel: str, handler: Handler):
+        async with self._lock:
+            count = self.subscriptions.get(channel, 0) + 1
+            self.subscriptions[channel] = count
+            self._handlers[channel] = handler
+            if count == 1:
+                await self._pubsub.subscribe(self.channel_prefix + channel)
+            if self._reader is None:
+                self._reader = asyncio.create_task(self._listen())
+
+    async def unsubscribe(self, channel: str):
+        async with self._lock:
+            count = self.subscriptions.get(channel, 0) - 1
+            if count > 0:
+                self.subscriptions[channel] = count
+                return
+            if self.subscriptions.pop(channel, None) is not None:
+                self._handlers.pop(channel, None)
+                await self._pubsub.unsubscribe(self.channel_prefix + channel)
+
+    async def publish(self, channel: str, envelope: dict):
+        await self.client.publish(self.channel_prefix + channel, json.dumps(envelope))
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        await self._pubsub.close()
+
+    async def _listen(self):
+        while True:
+            if not self._pubsub.subscribed:
+                await asyncio.sleep(self.poll_seconds)
+                continue
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=self.poll_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print("Redis broker read failed:", e)
+                await asyncio.sleep(self.poll_seconds)
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+
+            channel = _text(message["channel"])[len(self.channel_prefix):]
+            handler = self._handlers.get(channel)
+            if handler is None:
+                continue
+            try:
+                handler(channel, json.loads(message["data"]))
+            except Exception as e:
+                print("Redis broker delivery failed:", e)
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def create_broker(name: str = WS_BROKER) -> Broker:
+    if name == "memory":
+        return InProcessBroker()
+    if name == "redis":
+        import redis.asyncio
+        return RedisBroker(redis.asyncio.Redis.from_url(REDIS_URL))
+    raise ValueError(f"Unknown WebSocket broker: {name}")
@@ -1,4 +1,16 @@
-from math import radians, cos, sin, asin, sqrt
+from math import radians, degrees, cos, sin, asin, sqrt, isfinite
+import re
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+# The equirectangular approximation stays within FAST_PATH_MAX_REL_ERROR of the
+# haversine distance for points up to FAST_PATH_MAX_KM apart, away from the poles
+FAST_PATH_MAX_KM = 10
+FAST_PATH_MAX_ABS_LAT = 85
+FAST_PATH_MAX_REL_ERROR = 1e-4
+
+_DISTANCE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(m|km)?\s*$", re.IGNORECASE)
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """
@@ -15,5 +27,124 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     c = 2 * asin(sqrt(a)) 
 
     # Radius of earth in kilometers (mean radius)
-    km = 6371 * c
+    km = EARTH_RADIUS_KM * c
     return km
+
+
+def parse_distance_m(distance):
+    """
+    Parse a request distance such as '100m', '500 m', '1km' or '1.5km' into
+    meters. Bare numbers are meters. Raises ValueError for anything else.
+    """
+    if isinstance(distance, (int, float)):
+        meters = float(distance)
+    else:
+        match = _DISTANCE_PATTERN.match(distance or "")
+        if not match:
+            raise ValueError(f"Invalid distance: {distance!r}")
+        value, unit = match.groups()
+        meters = float(value) * (1000 if unit and unit.lower() == "km" else 1)
+    if not isfinite(meters) or meters <= 0:
+        raise ValueError(f"Invalid distance: {distance!r}")
+    return meters
+
+
+def format_distance(meters):
+    """Inverse of parse_distance_m for display: 500 -> '500m', 1500 -> '1.5km'."""
+    if meters >= 1000:
+        return f"{meters / 1000:g}km"
+    return f"{meters:g}m"
+
+
+def bounding_box(lat, lng, radius_km):
+    """
+    Return (min_lat, max_lat, min_lng, max_lng) of the smallest lat/lng box
+    containing every point within radius_km of (lat, lng).
+
+    The longitude span is widened for latitude. When the box wraps the
+    antimeridian min_lng is greater than max_lng; when it reaches a pole the
+    box spans all longitudes.
+    """
+    angular = radius_km / EARTH_RADIUS_KM
+    delta_lat = degrees(angular)
+    min_lat = lat - delta_lat
+    max_lat = lat + delta_lat
+
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+
+    ratio = sin(angular) / cos(radians(lat))
+    if ratio >= 1:
+        return min_lat, max_lat, -180.0, 180.0
+
+    delta_lng = degrees(asin(ratio))
+    min_lng = lng - delta_lng
+    max_lng = lng + delta_lng
+    if min_lng < -180:
+        min_lng += 360
+    if max_lng > 180:
+        max_lng -= 360
+    return min_lat, max_lat, min_lng, max_lng
+
+
+def haversine_many(lat, lng, lats, lngs):
+    """
+    Great circle distances in kilometers from (lat, lng) to every point of the
+    lats/lngs arrays, computed in one NumPy pass.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    lat1 = np.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlng = np.radians(lngs - lng)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def equirectangular_many(lat, lng, lats, lngs):
+    """
+    Flat-earth approximation of haversine_many: cheaper (no trigonometry per
+    point besides one cosine) and accurate to FAST_PATH_MAX_REL_ERROR within
+    FAST_PATH_MAX_KM, as long as |lat| <= FAST_PATH_MAX_ABS_LAT.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    dlng = (lngs - lng + 180) % 360 - 180  # shortest way round the antimeridian
+    x = np.radians(dlng) * np.cos(np.radians((lats + lat) / 2))
+    y = np.radians(lats - lat)
+    return EARTH_RADIUS_KM * np.hypot(x, y)
+
+
+def _use_fast_path(lat, radius_km):
+    return radius_km <= FAST_PATH_MAX_KM and abs(lat) <= FAST_PATH_MAX_ABS_LAT
+
+
+def distances_within(lat, lng, lats, lngs, radius_km):
+    """
+    Return (distances, mask): the distance in kilometers from (lat, lng) to
+    each candidate and a boolean mask of those within radius_km.
+
+    Small radii away from the poles take the equirectangular fast path;
+    everything else uses haversine.
+    """
+    if _use_fast_path(lat, radius_km):
+        distances = equirectangular_many(lat, lng, lats, lngs)
+    else:
+        distances = haversine_many(lat, lng, lats, lngs)
+    return distances, distances <= radius_km
+
+
+def distance_within(lat, lng, other_lat, other_lng, radius_km):
+    """
+    Single-point distances_within: (distance_km, inside) with plain floats,
+    without the NumPy overhead.
+    """
+    if _use_fast_path(lat, radius_km):
+        dlng = (other_lng - lng + 180) % 360 - 180
+        x = radians(dlng) * cos(radians((other_lat + lat) / 2))
+        y = radians(other_lat - lat)
+        distance = EARTH_RADIUS_KM * sqrt(x * x + y * y)
+    else:
+        distance = calculate_distance(lat, lng, other_lat, other_lng)
+    return distance, distance <= radius_km
@@ -0,0 +1,151 @@
+from math import cos, radians, pi
+
+# Geohash base32 alphabet (no a, i, l, o)
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE_MAP = {c: i for i, c in enumerate(_BASE32)}
+
+# Same mean Earth radius as the haversine in app.utils.distance
+KM_PER_DEGREE = 2 * pi * 6371 / 360
+MAX_PRECISION = 12
+
+# Upper bound used for prefix range scans: every geohash character sorts below it
+PREFIX_UPPER_BOUND = "{"
+
+
+def encode(lat, lng, precision=9):
+    """
+    Encode a coordinate into a geohash string of the given precision.
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True  # even bits encode longitude
+
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if lng >= mid:
+                bits = (bits << 1) | 1
+                lng_range[0] = mid
+            else:
+                bits = bits << 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits = bits << 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
+
+
+def decode_bbox(geohash):
+    """
+    Return (min_lat, max_lat, min_lng, max_lng) of the cell a geohash names.
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        value = _DECODE_MAP[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            target = lng_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            if bit:
+                target[0] = mid
+            else:
+                target[1] = mid
+            even = not even
+
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
+
+
+def cell_size(precision):
+    """
+    Return (height, width) in degrees of a geohash cell at the given precision.
+    """
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def neighbors(geohash):
+    """
+    Return the cell itself plus its (up to) 8 surrounding cells.
+    Cells beyond the poles are dropped; longitude wraps around the antimeridian.
+    """
+    precision = len(geohash)
+    min_lat, max_lat, min_lng, max_lng = decode_bbox(geohash)
+    height, width = max_lat - min_lat, max_lng - min_lng
+    center_lat = (min_lat + max_lat) / 2
+    center_lng = (min_lng + max_lng) / 2
+
+    cells = []
+    for dlat in (-1, 0, 1):
+        lat = center_lat + dlat * height
+        if lat <= -90 or lat >= 90:
+            continue
+        for dlng in (-1, 0, 1):
+            lng = center_lng + dlng * width
+            lng = (lng + 180) % 360 - 180
+            cell = encode(lat, lng, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def precision_for_radius(lat, radius_km, max_precision=MAX_PRECISION):
+    """
+    Return the finest precision whose cells are at least radius_km on each side
+    at this latitude, or None if even a precision-1 cell is too small.
+    """
+    # Longitude degrees shrink towards the poles, so size cells for the
+    # latitude of the circle's edge furthest from the equator
+    edge_lat = min(abs(lat) + radius_km / KM_PER_DEGREE, 90.0)
+    lng_scale = max(cos(radians(edge_lat)), 1e-6)
+    best = None
+    for precision in range(1, max_precision + 1):
+        height, width = cell_size(precision)
+        if height * KM_PER_DEGREE >= radius_km and width * KM_PER_DEGREE * lng_scale >= radius_km:
+            best = precision
+        else:
+            break
+    return best
+
+
+def covering_cells(lat, lng, radius_km, max_precision=MAX_PRECISION):
+    """
+    Return the geohash prefixes whose union covers the circle of radius_km
+    around (lat, lng): the containing cell and its neighbours, at a precision
+    where one cell spans the radius. Returns None when the radius is too large
+    for geohash cells to narrow the search.
+    """
+    precision = precision_for_radius(lat, radius_km, max_precision)
+    if precision is None:
+        return None
+    return neighbors(encode(lat, lng, precision))
+
+
+def covered_radius_km(lat, precision):
+    """
+    Radius around any point of a cell that is guaranteed to lie inside the
+    cell plus its neighbours at this precision (the inverse of
+    precision_for_radius).
+    """
+    height, width = cell_size(precision)
+    edge_lat = min(abs(lat) + height, 90.0)
+    return min(height * KM_PER_DEGREE, width * KM_PER_DEGREE * cos(radians(edge_lat)))
@@ -0,0 +1,106 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: Dict[str, object]) -> MetricKey:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def _format(key: MetricKey, suffix: str = "") -> str:
+    name, labels = key
+    if not labels:
+        return name + suffix
+    rendered = ",".join(f'{label}="{value}"' for label, value in labels)
+    return f"{name}{suffix}{{{rendered}}}"
+
+
+class MetricsRegistry:
+    """
+    Process-local counters, gauges and timings, exported in the Prometheus
+    text format. Each worker process keeps its own registry.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[MetricKey, float] = {}
+        self._gauges: Dict[MetricKey, float] = {}
+        self._timings: Dict[MetricKey, list] = {}  # [count, sum, max]
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            timing = self._timings.setdefault(key, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def value(self, name: str, **labels) -> float:
+        """Current counter or gauge value (0 if never recorded)."""
+        key = _key(name, labels)
+        with self._lock:
+            return self._counters.get(key, self._gauges.get(key, 0))
+
+    def timing(self, name: str, **labels):
+        """(count, sum, max) of a timing, or None if never observed."""
+        with self._lock:
+            timing = self._timings.get(_key(name, labels))
+            return tuple(timing) if timing else None
+
+    def render(self) -> str:
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            timings = sorted(self._timings.items())
+
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for key, value in counters:
+            declare(key[0], "counter")
+            lines.append(f"{_format(key)} {value:g}")
+        for key, value in gauges:
+            declare(key[0], "gauge")
+            lines.append(f"{_format(key)} {value:g}")
+        for key, (count, total, _) in timings:
+            declare(key[0], "summary")
+            lines.append(f"{_format(key, '_count')} {count}")
+            lines.append(f"{_format(key, '_sum')} {total:.6f}")
+        for key, (_, _, longest) in timings:
+            declare(key[0] + "_max", "gauge")
+            lines.append(f"{_format(key, '_max')} {longest:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,229 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Callable, Optional
+
+from app.utils import geohash
+from app.utils.distance import distance_within
+from app.utils.presence import MAX_BUCKET_PRECISION, PRESENCE_TTL_SECONDS
+
+# Cached helper availability is re-read after this long, so toggles made on
+# another worker (or outside notify_availability_changed) are picked up
+AVAILABILITY_CACHE_SECONDS = 30
+AVAILABILITY_CACHE_SIZE = 10000
+
+
+class NearbySubscription:
+    def __init__(self, user_id: str, latitude: float, longitude: float, radius_km: float,
+                 queue: asyncio.Queue, loop: asyncio.AbstractEventLoop):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius_km = radius_km
+        self.queue = queue
+        self.loop = loop
+        # helper user_id -> time.monotonic() of the last position seen
+        self.visible = {}
+        self.cells = ()  # (precision, cell) keys this subscription is filed under
+
+
+class NearbyStreamHub:
+    """
+    Fans helper position and availability changes out to live "nearby"
+    subscriptions as enter / move / leave deltas.
+
+    Subscriptions are filed under the geohash cells covering their circle, at
+    the coarsest precision that still spans the radius. A position change
+    therefore only looks at subscriptions filed under the point's own cell
+    at each precision (plus those the helper is currently visible in), so
+    the work per update grows with the number of interested clients, not
+    with the number of users or subscribers overall.
+    """
+
+    def __init__(self, max_precision: int = MAX_BUCKET_PRECISION, ttl_seconds: float = PRESENCE_TTL_SECONDS,
+                 availability_ttl_seconds: float = AVAILABILITY_CACHE_SECONDS,
+                 availability_cache_size: int = AVAILABILITY_CACHE_SIZE):
+        self.max_precision = max_precision
+        self.ttl_seconds = ttl_seconds
+        self.availability_ttl_seconds = availability_ttl_seconds
+        self.availability_cache_size = availability_cache_size
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._by_cell = [defaultdict(set) for _ in range(max_precision + 1)]
+        self._unbounded = set()          # radius too large for any cell precision
+        self._watchers = defaultdict(set)  # helper user_id -> subscription ids showing them
+        self._available = OrderedDict()  # helper user_id -> (is_available, expires), oldest first
+
+    def subscribe(self, user_id: str, latitude: float, longitude: float, radius_km: float,
+                  queue: asyncio.Queue, loop: Optional[asyncio.AbstractEventLoop] = None) -> NearbySubscription:
+        subscription = NearbySubscription(
+            user_id, latitude, longitude, radius_km, queue, loop or asyncio.get_running_loop()
+        )
+        cells = geohash.covering_cells(latitude, longitude, radius_km, self.max_precision)
+
+        with self._lock:
+            self._subscriptions[subscription.id] = subscription
+            if cells is None:
+                self._unbounded.add(subscription.id)
+            else:
+                precision = len(cells[0])
+                subscription.cells = tuple((precision, cell) for cell in cells)
+                for _, cell in subscription.cells:
+                    self._by_cell[precision][cell].add(subscription.id)
+        return subscription
+
+    def seed(self, subscription: NearbySubscription, user_ids):
+        """Mark the helpers sent in the initial snapshot as visible."""
+        now = time.monotonic()
+        with self._lock:
+            if subscription.id not in self._subscriptions:
+                return
+            for user_id in user_ids:
+                subscription.visible.setdefault(user_id, now)
+                self._watchers[user_id].add(subscription.id)
+                self._remember_availability(user_id, True)
+
+    def unsubscribe(self, subscription: NearbySubscription):
+        with self._lock:
+            if self._subscriptions.pop(subscription.id, None) is None:
+                return
+            self._unbounded.discard(subscription.id)
+            for precision, cell in subscription.cells:
+                members = self._by_cell[precision].get(cell)
+                if members is not None:
+                    members.discard(subscription.id)
+                    if not members:
+                        del self._by_cell[precision][cell]
+            for user_id in subscription.visible:
+                self._forget_watcher(user_id, subscription.id)
+            subscription.visible.clear()
+
+    def position_changed(self, user_id: str, latitude: float, longitude: float,
+                         is_available: Callable[[], bool]):
+        """
+        Hook for location updates. is_available is only called (at most
+        once) when some subscription might be interested and the helper's
+        availability is not cached.
+        """
+        with self._lock:
+            if not self._subscriptions:
+                return
+            interested = self._interested(user_id, latitude, longitude)
+            if not interested:
+                return
+            available = self._cached_availability(user_id)
+
+        if available is None:
+            available = bool(is_available())
+            with self._lock:
+                self._remember_availability(user_id, available)
+
+        with self._lock:
+            for subscription_id in interested:
+                subscription = self._subscriptions.get(subscription_id)
+                if subscription is not None:
+                    self._apply(subscription, user_id, latitude, longitude, available)
+
+    def availability_changed(self, user_id: str, available: bool, position=None):
+        """
+        Hook for the profile is_available toggle. position (the helper's
+        latest location, if any) lets newly available helpers enter nearby
+        subscriptions straight away.
+        """
+        with self._lock:
+            self._remember_availability(user_id, available)
+            if not available:
+                for subscription_id in list(self._watchers.get(user_id, ())):
+                    subscription = self._subscriptions.get(subscription_id)
+                    if subscription is not None:
+                        self._leave(subscription, user_id)
+                return
+        if position is not None:
+            self.position_changed(user_id, position.latitude, position.longitude, lambda: True)
+
+    def sweep(self, subscription: NearbySubscription):
+        """Emit leave for helpers that have not reported a position within the TTL."""
+        deadline = time.monotonic() - self.ttl_seconds
+        with self._lock:
+            for user_id, seen in list(subscription.visible.items()):
+                if seen <= deadline:
+                    self._leave(subscription, user_id)
+
+    def _cached_availability(self, user_id):
+        # Caller holds the lock
+        entry = self._available.get(user_id)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    def _remember_availability(self, user_id, available):
+        # Caller holds the lock. Entries are kept in expiry order, so expired
+        # and over-capacity ones are always at the front.
+        now = time.monotonic()
+        self._available.pop(user_id, None)
+        self._available[user_id] = (available, now + self.availability_ttl_seconds)
+        while self._available:
+            _, (_, expires) = next(iter(self._available.items()))
+            if expires > now and len(self._available) <= self.availability_cache_size:
+                break
+            self._available.popitem(last=False)
+
+    def _interested(self, user_id, latitude, longitude):
+        # Caller holds the lock
+        interested = set(self._unbounded)
+        interested.update(self._watchers.get(user_id, ()))
+        cell = geohash.encode(latitude, longitude, self.max_precision)
+        for precision in range(1, self.max_precision + 1):
+            interested.update(self._by_cell[precision].get(cell[:precision], ()))
+        return interested
+
+    def _apply(self, subscription, user_id, latitude, longitude, available):
+        # Caller holds the lock
+        if user_id == subscription.user_id:
+            return
+        # Same rule (and fast path) as the snapshot's distances_within
+        distance, in_radius = distance_within(
+            subscription.latitude, subscription.longitude, latitude, longitude, subscription.radius_km
+        )
+        inside = available and in_radius
+        was_visible = user_id in subscription.visible
+
+        if inside:
+            subscription.visible[user_id] = time.monotonic()
+            self._watchers[user_id].add(subscription.id)
+            self._emit(subscription, {
+                "type": "move" if was_visible else "enter",
+                "user_id": user_id,
+                "latitude": latitude,
+                "longitude": longitude,
+                "distance_km": round(distance, 4),
+            })
+        elif was_visible:
+            self._leave(subscription, user_id)
+
+    def _leave(self, subscription, user_id):
+        # Caller holds the lock
+        subscription.visible.pop(user_id, None)
+        self._forget_watcher(user_id, subscription.id)
+        self._emit(subscription, {"type": "leave", "user_id": user_id})
+
+    def _forget_watcher(self, user_id, subscription_id):
+        watchers = self._watchers.get(user_id)
+        if watchers is not None:
+            watchers.discard(subscription_id)
+            if not watchers:
+                del self._watchers[user_id]
+
+    @staticmethod
+    def _emit(subscription, message):
+        try:
+            subscription.loop.call_soon_threadsafe(subscription.queue.put_nowait, message)
+        except RuntimeError:
+            # Event loop already closed; the connection is going away
+            pass
+
+
+nearby_stream = NearbyStreamHub()
@@ -0,0 +1,374 @@
+import datetime
+import heapq
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import NamedTuple, Optional, Tuple
+
+from app.utils import geohash
+from app.utils.distance import distances_within, haversine_many
+
+PRESENCE_TTL_SECONDS = 5 * 60
+
+# Bucket precisions 1..6 (cells from ~5000km down to ~1.2km x 0.6km)
+MAX_BUCKET_PRECISION = 6
+
+# Half the Earth's circumference: no two points are further apart
+MAX_SEARCH_KM = 20038
+
+# Relative (and absolute, in km) slack on each ring query of the default
+# iter_nearest; well above the fast path's and Redis GEO's error
+RING_PADDING = 1e-3
+
+
+class Position(NamedTuple):
+    user_id: str
+    latitude: float
+    longitude: float
+    updated_at: datetime.datetime
+
+
+class LocationBackend:
+    """
+    Where live user positions are kept and searched.
+
+    Implementations: PresenceStore (process-local), RedisLocationBackend
+    (shared across workers) and the SQL backend in app.services.location.
+    Positions returned expose user_id, latitude, longitude and updated_at.
+    """
+
+    # True when upsert already wrote the locations table
+    persists = False
+    # False until the backend holds every live user (see warm_presence)
+    is_warm = True
+
+    def upsert(self, user_id: str, latitude: float, longitude: float,
+               updated_at: Optional[datetime.datetime] = None):
+        raise NotImplementedError
+
+    def get(self, user_id: str):
+        raise NotImplementedError
+
+    def remove(self, user_id: str):
+        raise NotImplementedError
+
+    def nearby(self, latitude: float, longitude: float, radius_km: float, exclude: Optional[str] = None):
+        """Return [(position, distance_km)] within radius_km, closest first."""
+        raise NotImplementedError
+
+    def iter_nearest(self, latitude: float, longitude: float, exclude: Optional[str] = None,
+                     max_km: float = MAX_SEARCH_KM):
+        """
+        Yield (position, distance_km) closest first, searching lazily so
+        callers that only need the first few results stop early.
+
+        The default widens a nearby() search by doubling its radius. Ring
+        membership and the yielded distances both come from haversine, so a
+        point near a ring boundary lands in exactly one ring whichever
+        formula nearby() used for that radius.
+        """
+        seen = set()
+        inner_km, radius_km = -1.0, min(0.5, max_km)
+        while True:
+            # Padded so nearby()'s own rounding cannot drop a point haversine puts inside
+            hits = self.nearby(latitude, longitude, radius_km * (1 + RING_PADDING) + RING_PADDING, exclude)
+            if hits:
+                distances = haversine_many(
+                    latitude, longitude,
+                    [position.latitude for position, _ in hits],
+                    [position.longitude for position, _ in hits]
+                )
+                ring = [
+                    (position, float(distance))
+                    for (position, _), distance in zip(hits, distances)
+                    if inner_km < distance <= radius_km and position.user_id not in seen
+                ]
+                for position, distance in closest_first(ring):
+                    seen.add(position.user_id)
+                    yield position, distance
+            if radius_km >= max_km:
+                return
+            inner_km, radius_km = radius_km, min(radius_km * 2, max_km)
+
+
+def closest_first(hits):
+    """
+    Sort [(position, distance_km)] by (distance, user_id) in place. Every
+    backend orders results this way, so equal distances keep a stable order
+    for keyset cursors.
+    """
+    hits.sort(key=lambda hit: (hit[1], hit[0].user_id))
+    return hits
+
+
+class PresenceEntry(NamedTuple):
+    user_id: str
+    latitude: float
+    longitude: float
+    updated_at: datetime.datetime
+    cells: Tuple[str, ...]  # geohash cell per bucket precision
+    expires_at: float       # time.monotonic() deadline
+
+
+class PresenceStore(LocationBackend):
+    """
+    Process-local store of recently seen user locations.
+
+    Entries live for ttl_seconds after their last update. They are kept in
+    update order, so expiry only ever pops from the front. Each entry is also
+    filed under its geohash cell at every bucket precision, so upserts are
+    O(1) and nearby lookups only touch the cells covering the radius.
+    """
+
+    def __init__(self, ttl_seconds: float = PRESENCE_TTL_SECONDS, max_precision: int = MAX_BUCKET_PRECISION):
+        self.ttl_seconds = ttl_seconds
+        self.max_precision = max_precision
+        self.is_warm = False
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, PresenceEntry]" = OrderedDict()
+        self._buckets = [defaultdict(set) for _ in range(max_precision + 1)]
+
+    def __len__(self):
+        with self._lock:
+            self._evict_expired()
+            return len(self._entries)
+
+    def upsert(self, user_id: str, latitude: float, longitude: float,
+               updated_at: Optional[datetime.datetime] = None) -> PresenceEntry:
+        updated_at = updated_at or datetime.datetime.utcnow()
+        full_cell = geohash.encode(latitude, longitude, self.max_precision)
+        cells = tuple(full_cell[:precision] for precision in range(1, self.max_precision + 1))
+
+        # Entries loaded from older timestamps expire relative to when they were seen
+        age = (datetime.datetime.utcnow() - updated_at).total_seconds()
+        entry = PresenceEntry(
+            user_id, latitude, longitude, updated_at, cells,
+            time.monotonic() + self.ttl_seconds - max(age, 0)
+        )
+
+        with self._lock:
+            previous = self._entries.pop(user_id, None)
+            if previous is not None:
+                self._unindex(previous)
+            self._entries[user_id] = entry
+            self._index(entry)
+            self._evict_expired()
+        return entry
+
+    def get(self, user_id: str) -> Optional[PresenceEntry]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry.expires_at <= time.monotonic():
+                return None
+            return entry
+
+    def remove(self, user_id: str):
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+            if entry is not None:
+                self._unindex(entry)
+
+    def nearby(self, latitude: float, longitude: float, radius_km: float, exclude: Optional[str] = None):
+        """
+        Return [(entry, distance_km)] for live entries within radius_km,
+        closest first.
+        """
+        cells = geohash.covering_cells(latitude, longitude, radius_km, self.max_precision)
+
+        with self._lock:
+            self._evict_expired()
+            if cells is None:
+                candidates = list(self._entries.values())
+            else:
+                bucket = self._buckets[len(cells[0])]
+                candidates = [
+                    self._entries[user_id]
+                    for cell in cells
+                    for user_id in bucket.get(cell, ())
+                ]
+
+        # Entries upserted with an old updated_at can sit behind fresher ones
+        now = time.monotonic()
+        candidates = [
+            entry for entry in candidates
+            if entry.user_id != exclude and entry.expires_at > now
+        ]
+        if not candidates:
+            return []
+
+        distances, in_radius = distances_within(
+            latitude, longitude,
+            [entry.latitude for entry in candidates],
+            [entry.longitude for entry in candidates],
+            radius_km
+        )
+        hits = [
+            (entry, float(distance))
+            for entry, distance, inside in zip(candidates, distances, in_radius)
+            if inside
+        ]
+        return closest_first(hits)
+
+    def iter_nearest(self, latitude: float, longitude: float, exclude: Optional[str] = None,
+                     max_km: float = MAX_SEARCH_KM):
+        """
+        Ring search over the geohash buckets: scan the cell around the point
+        plus its neighbours at the finest precision and yield every candidate
+        closer than that block is guaranteed to reach, then widen to the next
+        coarser precision. Stops as soon as the caller stops iterating.
+        """
+        seen = set()
+        pending = []  # heap of (distance, user_id, entry)
+
+        for precision in range(self.max_precision, 0, -1):
+            cells = geohash.neighbors(geohash.encode(latitude, longitude, precision))
+            covered_km = min(geohash.covered_radius_km(latitude, precision), max_km)
+            with self._lock:
+                bucket = self._buckets[precision]
+                fresh = [
+                    self._entries[user_id]
+                    for cell in cells
+                    for user_id in bucket.get(cell, ())
+                    if user_id not in seen
+                ]
+            yield from self._drain(latitude, longitude, fresh, seen, pending, exclude, covered_km)
+            if covered_km >= max_km:
+                return
+
+        # Beyond the coarsest block: whatever is left anywhere
+        with self._lock:
+            rest = [entry for user_id, entry in self._entries.items() if user_id not in seen]
+        yield from self._drain(latitude, longitude, rest, seen, pending, exclude, max_km)
+
+    def _drain(self, latitude, longitude, fresh, seen, pending, exclude, covered_km):
+        now = time.monotonic()
+        fresh = [
+            entry for entry in fresh
+            if entry.user_id != exclude and entry.expires_at > now and entry.user_id not in seen
+        ]
+        if fresh:
+            distances = haversine_many(
+                latitude, longitude,
+                [entry.latitude for entry in fresh],
+                [entry.longitude for entry in fresh]
+            )
+            for entry, distance in zip(fresh, distances):
+                seen.add(entry.user_id)
+                heapq.heappush(pending, (float(distance), entry.user_id, entry))
+
+        while pending and pending[0][0] <= covered_km:
+            distance, _, entry = heapq.heappop(pending)
+            yield entry, distance
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for bucket in self._buckets:
+                bucket.clear()
+            self.is_warm = False
+
+    def _index(self, entry: PresenceEntry):
+        for precision, cell in enumerate(entry.cells, start=1):
+            self._buckets[precision][cell].add(entry.user_id)
+
+    def _unindex(self, entry: PresenceEntry):
+        for precision, cell in enumerate(entry.cells, start=1):
+            bucket = self._buckets[precision]
+            members = bucket.get(cell)
+            if members is not None:
+                members.discard(entry.user_id)
+                if not members:
+                    del bucket[cell]
+
+    def _evict_expired(self):
+        # Caller holds the lock; entries are ordered by last update
+        now = time.monotonic()
+        while self._entries:
+            user_id, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now:
+                break
+            self._entries.popitem(last=False)
+            self._unindex(entry)
+
+
+class RedisLocationBackend(LocationBackend):
+    """
+    Live positions in Redis, shared by every worker process.
+
+    A GEO set (GEOADD/GEOSEARCH) holds coordinates and a sorted set scored by
+    update time tracks recency; members older than ttl_seconds are filtered
+    out of reads and trimmed from both sets.
+    """
+
+    def __init__(self, client, key_prefix: str = "photoaid:locations", ttl_seconds: float = PRESENCE_TTL_SECONDS):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.geo_key = f"{key_prefix}:geo"
+        self.seen_key = f"{key_prefix}:seen"
+
+    def upsert(self, user_id: str, latitude: float, longitude: float,
+               updated_at: Optional[datetime.datetime] = None) -> Position:
+        updated_at = updated_at or datetime.datetime.utcnow()
+        pipe = self.client.pipeline()
+        pipe.geoadd(self.geo_key, [longitude, latitude, user_id])
+        pipe.zadd(self.seen_key, {user_id: _timestamp(updated_at)})
+        pipe.execute()
+        return Position(user_id, latitude, longitude, updated_at)
+
+    def get(self, user_id: str) -> Optional[Position]:
+        pipe = self.client.pipeline()
+        pipe.geopos(self.geo_key, user_id)
+        pipe.zscore(self.seen_key, user_id)
+        coordinates, seen = pipe.execute()
+        if not coordinates or coordinates[0] is None or seen is None or seen <= self._cutoff():
+            return None
+        longitude, latitude = coordinates[0]
+        return Position(user_id, latitude, longitude, _from_timestamp(seen))
+
+    def remove(self, user_id: str):
+        pipe = self.client.pipeline()
+        pipe.zrem(self.geo_key, user_id)
+        pipe.zrem(self.seen_key, user_id)
+        pipe.execute()
+
+    def nearby(self, latitude: float, longitude: float, radius_km: float, exclude: Optional[str] = None):
+        self.evict_expired()
+        results = self.client.geosearch(
+            self.geo_key, longitude=longitude, latitude=latitude,
+            radius=radius_km, unit="km", sort="ASC", withdist=True, withcoord=True
+        )
+        results = [result for result in results if result[0] != exclude]
+        if not results:
+            return []
+
+        cutoff = self._cutoff()
+        seen_scores = self.client.zmscore(self.seen_key, [result[0] for result in results])
+        hits = []
+        for (user_id, distance, (lng, lat)), seen in zip(results, seen_scores):
+            if seen is None or seen <= cutoff:
+                continue
+            hits.append((Position(user_id, lat, lng, _from_timestamp(seen)), float(distance)))
+        return closest_first(hits)
+
+    def evict_expired(self):
+        stale = self.client.zrangebyscore(self.seen_key, "-inf", self._cutoff())
+        if stale:
+            pipe = self.client.pipeline()
+            pipe.zrem(self.geo_key, *stale)
+            pipe.zrem(self.seen_key, *stale)
+            pipe.execute()
+
+    def _cutoff(self):
+        return time.time() - self.ttl_seconds
+
+
+def _timestamp(moment: datetime.datetime) -> float:
+    # Naive datetimes in this app are UTC
+    return moment.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def _from_timestamp(value: float) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(value, datetime.timezone.utc).replace(tzinfo=None)
+
+
+presence = PresenceStore()
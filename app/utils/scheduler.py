@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from app.config import SCHEDULER_LOCK, SCHEDULER_LOCK_PATH, REDIS_URL
+from app.utils.metrics import metrics
+
+
+class LeaderLock:
+    """
+    Decides which worker process runs the scheduled jobs. acquire() and
+    refresh() never block: they return True while this process is leader.
+    """
+
+    def acquire(self) -> bool:
+        raise NotImplementedError
+
+    def refresh(self) -> bool:
+        return True
+
+    def release(self):
+        pass
+
+
+class LocalLeaderLock(LeaderLock):
+    """Always leader: for a single worker process (and tests)."""
+
+    def acquire(self) -> bool:
+        return True
+
+
+class FileLeaderLock(LeaderLock):
+    """
+    Exclusive flock on a file. Only works for workers sharing one host; the
+    OS drops the lock when the holder exits, so another worker takes over on
+    its next tick.
+    """
+
+    def __init__(self, path: str = SCHEDULER_LOCK_PATH):
+        self.path = path
+        self._fd = None
+
+    def acquire(self) -> bool:
+        import fcntl
+
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class RedisLeaderLock(LeaderLock):
+    """
+    SET NX lease in Redis, for workers spread over several hosts. The leader
+    renews the lease on every tick; if it dies, the key expires after
+    ttl_seconds and another worker takes over.
+    """
+
+    # Only touch the key while it still holds our token
+    _REFRESH = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end return 0"
+    _RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, client, key: str = "photoaid:scheduler:leader", ttl_seconds: float = 30):
+        self.client = client
+        self.key = key
+        self.ttl_ms = int(ttl_seconds * 1000)
+        self.token = uuid.uuid4().hex
+
+    def acquire(self) -> bool:
+        return bool(self.client.set(self.key, self.token, nx=True, px=self.ttl_ms)) or self.refresh()
+
+    def refresh(self) -> bool:
+        return bool(self.client.eval(self._REFRESH, 1, self.key, self.token, self.ttl_ms))
+
+    def release(self):
+        self.client.eval(self._RELEASE, 1, self.key, self.token)
+
+
+class PeriodicTask:
+    def __init__(self, name: str, func: Callable[[], object], interval_seconds: float):
+        self.name = name
+        self.func = func
+        self.interval_seconds = interval_seconds
+        self.next_run = 0.0  # time.monotonic(); 0 runs on the first tick
+
+
+class Scheduler:
+    """
+    In-process scheduler for periodic maintenance jobs.
+
+    A daemon thread wakes every tick_seconds, (re)claims the leader lock and,
+    while leader, runs every task whose interval has elapsed. Jobs run one at
+    a time on that thread, so a slow job delays the others rather than
+    overlapping with itself.
+    """
+
+    def __init__(self, lock: Optional[LeaderLock] = None, tick_seconds: float = 1.0):
+        self.lock = lock or LocalLeaderLock()
+        self.tick_seconds = tick_seconds
+        self.is_leader = False
+        self._tasks = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, name: str, func: Callable[[], object], interval_seconds: float) -> PeriodicTask:
+        task = PeriodicTask(name, func, interval_seconds)
+        self._tasks.append(task)
+        return task
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.is_leader:
+            self.lock.release()
+            self.is_leader = False
+
+    def run_pending(self):
+        now = time.monotonic()
+        for task in self._tasks:
+            if task.next_run > now:
+                continue
+            try:
+                with metrics.timer("scheduler_job_seconds", job=task.name):
+                    task.func()
+            except Exception as e:
+                metrics.increment("scheduler_job_failures_total", job=task.name)
+                print(f"Scheduled job {task.name} failed:", e)
+            task.next_run = time.monotonic() + task.interval_seconds
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.is_leader = self.lock.refresh() if self.is_leader else self.lock.acquire()
+            except Exception as e:
+                print("Scheduler leader lock failed:", e)
+                self.is_leader = False
+            if self.is_leader:
+                self.run_pending()
+            self._stop.wait(self.tick_seconds)
+
+
+def create_leader_lock(name: str = SCHEDULER_LOCK) -> LeaderLock:
+    if name == "local":
+        return LocalLeaderLock()
+    if name == "file":
+        return FileLeaderLock()
+    if name == "redis":
+        import redis
+        return RedisLeaderLock(redis.Redis.from_url(REDIS_URL, decode_responses=True))
+    raise ValueError(f"Unknown scheduler lock: {name}")
+
+
+scheduler = Scheduler(create_leader_lock())
@@ -1,20 +1,226 @@
 from fastapi import WebSocket
-from typing import Dict
+from typing import Dict, Optional, Set, Union
+import asyncio
+import uuid
+from app.config import WS_SEND_QUEUE_SIZE, WS_OVERFLOW_POLICY
+from app.utils.broker import Broker, create_broker
+from app.utils.metrics import metrics
+
+DROP = "drop"
+DISCONNECT = "disconnect"
+
+# Close code sent to a client disconnected for falling too far behind
+SLOW_CONSUMER_CLOSE_CODE = 1013  # Try Again Later
+
+Message = Union[str, dict]
+
+
+class _Frame:
+    __slots__ = ("message", "key")
+
+    def __init__(self, message: Message, key: Optional[str]):
+        self.message = message
+        self.key = key
+
+
+class ConnectionWriter:
+    """
+    The only sender for one WebSocket: frames wait in a bounded queue and a
+    dedicated task writes them out, so a slow client delays nobody but
+    itself.
+
+    Frames enqueued with a coalesce key replace a still-queued frame with the
+    same key instead of queuing behind it (e.g. "read" superseding
+    "delivered" for one message). On overflow, keyed frames are dropped and
+    other frames follow the policy: drop, or disconnect the client so it
+    reconnects and refetches history.
+    """
+
+    def __init__(self, websocket: WebSocket, manager: "ConnectionManager",
+                 max_queue: int = WS_SEND_QUEUE_SIZE, policy: str = WS_OVERFLOW_POLICY):
+        self.id = uuid.uuid4().hex
+        self.websocket = websocket
+        self.manager = manager
+        self.policy = policy
+        self.rooms: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.closed = False
+        self._pending: Dict[str, _Frame] = {}
+        self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, message: Message, key: Optional[str] = None) -> bool:
+        """Queue a frame without waiting; False if it was dropped."""
+        if self.closed:
+            return False
+        if key is not None and key in self._pending:
+            self._pending[key].message = message
+            metrics.increment("ws_frames_coalesced_total")
+            return True
+
+        frame = _Frame(message, key)
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            if key is not None or self.policy == DROP:
+                metrics.increment("ws_frames_dropped_total")
+            else:
+                metrics.increment("ws_slow_consumers_disconnected_total")
+                self.close(SLOW_CONSUMER_CLOSE_CODE)
+            return False
+
+        if key is not None:
+            self._pending[key] = frame
+        self.manager._queue_depth_changed(1)
+        return True
+
+    def close(self, code: Optional[int] = None):
+        """Stop writing, drop anything still queued and leave every room."""
+        if self.closed:
+            return
+        self.closed = True
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+        self.manager._queue_depth_changed(-self.queue.qsize())
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.queue.task_done()
+        self._pending.clear()
+        self.manager._writer_closed(self)
+        if code is not None:
+            asyncio.create_task(self._close_socket(code))
+
+    async def join(self):
+        """Wait until everything queued so far has been written or dropped."""
+        await self.queue.join()
+
+    async def _run(self):
+        while True:
+            frame = await self.queue.get()
+            if frame.key is not None and self._pending.get(frame.key) is frame:
+                del self._pending[frame.key]
+            self.manager._queue_depth_changed(-1)
+            try:
+                await _send(self.websocket, frame.message)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Dead socket: nothing queued behind this frame can be delivered either
+                self.close()
+                return
+            finally:
+                self.queue.task_done()
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+
+async def _send(websocket: WebSocket, message: Message):
+    if isinstance(message, str):
+        await websocket.send_text(message)
+    else:
+        await websocket.send_json(message)
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
+    """
+    Rooms of WebSocket connections: a chat session_id, or a user_id for
+    notifications. Every connection in a room receives its broadcasts, so
+    both chat participants (and several tabs of one user) stay connected.
 
-    async def connect(self, session_id: str, websocket: WebSocket):
+    Broadcasts go through the broker, so rooms span worker processes; each
+    worker delivers to its own connections. Sends never wait on the client:
+    each connection has its own ConnectionWriter.
+    """
+
+    def __init__(self, broker: Optional[Broker] = None):
+        self.broker = broker or create_broker()
+        self.active_connections: Dict[str, Set[WebSocket]] = {}
+        self._writers: Dict[WebSocket, ConnectionWriter] = {}
+        self._queue_depth = 0
+        self._tasks = set()
+
+    async def connect(self, room: str, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections[session_id] = websocket
+        await self.join(room, websocket)
+
+    async def join(self, room: str, websocket: WebSocket):
+        if websocket in self.connections(room):
+            return
+        if websocket not in self._writers:
+            self._writers[websocket] = ConnectionWriter(websocket, self)
+            metrics.set_gauge("ws_connections", len(self._writers))
+        self._writers[websocket].rooms.add(room)
+        self.active_connections.setdefault(room, set()).add(websocket)
+        await self.broker.subscribe(room, self._deliver)
+
+    def disconnect(self, room: str, websocket: WebSocket):
+        if not self._leave(room, websocket):
+            return
+        writer = self._writers.get(websocket)
+        if writer is not None:
+            writer.rooms.discard(room)
+            if not writer.rooms:
+                writer.close()
+
+    def connections(self, room: str) -> Set[WebSocket]:
+        return self.active_connections.get(room, set())
+
+    async def broadcast(self, message: Message, room: str, exclude: Optional[WebSocket] = None,
+                        coalesce_key: Optional[str] = None):
+        """Queue a frame for every connection in the room, on every worker, except exclude."""
+        excluded = self._writers.get(exclude) if exclude is not None else None
+        envelope = {"message": message, "exclude": excluded.id if excluded else None, "key": coalesce_key}
+        try:
+            await self.broker.publish(room, envelope)
+        except Exception as e:
+            # Other workers miss this frame, but local participants still get it
+            print("WebSocket broker publish failed:", e)
+            self._deliver(room, envelope)
+
+    async def send(self, websocket: WebSocket, message: Message, coalesce_key: Optional[str] = None) -> bool:
+        """Queue a frame for a single local connection (e.g. an ACK to the sender)."""
+        writer = self._writers.get(websocket)
+        return writer.enqueue(message, coalesce_key) if writer is not None else False
+
+    async def send_personal_message(self, message: Message, room: str):
+        await self.broadcast(message, room)
+
+    async def flush(self):
+        """Wait for every local connection's queue to drain."""
+        await asyncio.gather(*(writer.join() for writer in list(self._writers.values())))
+
+    def _deliver(self, room: str, envelope: dict):
+        for websocket in list(self.connections(room)):
+            writer = self._writers.get(websocket)
+            if writer is not None and writer.id != envelope["exclude"]:
+                writer.enqueue(envelope["message"], envelope["key"])
+
+    def _leave(self, room: str, websocket: WebSocket) -> bool:
+        connections = self.active_connections.get(room)
+        if connections is None or websocket not in connections:
+            return False
+        connections.discard(websocket)
+        if not connections:
+            del self.active_connections[room]
+        # Called from sync code (handler finally blocks, writer shutdown)
+        task = asyncio.create_task(self.broker.unsubscribe(room))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
 
-    def disconnect(self, session_id: str):
-        self.active_connections.pop(session_id, None)
+    def _writer_closed(self, writer: ConnectionWriter):
+        for room in writer.rooms:
+            self._leave(room, writer.websocket)
+        writer.rooms.clear()
+        if self._writers.get(writer.websocket) is writer:
+            del self._writers[writer.websocket]
+        metrics.set_gauge("ws_connections", len(self._writers))
 
-    async def send_personal_message(self, message: str, session_id: str):
-        websocket = self.active_connections.get(session_id)
-        if websocket:
-            await websocket.send_text(message)
+    def _queue_depth_changed(self, delta: int):
+        self._queue_depth += delta
+        metrics.set_gauge("ws_send_queue_depth", self._queue_depth)
 
 manager = ConnectionManager()
@@ -0,0 +1,124 @@
+"""
+Benchmark get_user_matches as match_requests grows.
+
+For each table size a fresh SQLite database is filled with synthetic match
+history (about MATCHES_PER_USER rows per user, mostly finished requests) and
+the median latency is measured for:
+
+  legacy  - the previous OR + created_at window query, without the
+            (user, status, created_at) indexes
+  current - get_user_matches (UNION ALL of two index range scans) with the
+            indexes from migration 0002
+
+Usage:
+    python benchmarks/bench_user_matches.py [size ...]    # default: 10000 100000 1000000
+"""
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, create_engine, insert, or_
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.matchmaking import MatchRequest
+from app.services.matchmaking import get_user_matches
+
+MATCHES_PER_USER = 50
+LOOKUPS = 200
+INSERT_CHUNK = 50_000
+COMPOSITE_INDEXES = [
+    index for index in MatchRequest.__table__.indexes
+    if index.name in ("ix_match_requests_requester_status_created", "ix_match_requests_receiver_status_created")
+]
+
+
+def legacy_user_matches(db, user_id):
+    cutoff_time = datetime.datetime.utcnow() - datetime.timedelta(minutes=30)
+    return db.query(MatchRequest).filter(
+        and_(
+            or_(MatchRequest.requester_id == user_id, MatchRequest.receiver_id == user_id),
+            or_(MatchRequest.status == "pending", MatchRequest.status == "accepted"),
+            MatchRequest.created_at >= cutoff_time
+        )
+    ).all()
+
+
+def populate(engine, size, rng):
+    users = [str(uuid.uuid4()) for _ in range(max(size // MATCHES_PER_USER, 2))]
+    now = datetime.datetime.utcnow()
+    statuses = ["expired"] * 60 + ["declined"] * 25 + ["accepted"] * 13 + ["pending"] * 2
+
+    with engine.begin() as connection:
+        for start in range(0, size, INSERT_CHUNK):
+            rows = []
+            for _ in range(min(INSERT_CHUNK, size - start)):
+                requester, receiver = rng.sample(users, 2)
+                status = rng.choice(statuses)
+                age = rng.uniform(0, 20) if status == "pending" else rng.uniform(0, 60 * 24 * 90)
+                rows.append({
+                    "match_id": str(uuid.uuid4()),
+                    "requester_id": requester,
+                    "receiver_id": receiver,
+                    "request_type": "photo",
+                    "distance": "1km",
+                    "latitude": 0.0,
+                    "longitude": 0.0,
+                    "status": status,
+                    "created_at": now - datetime.timedelta(minutes=age),
+                })
+            connection.execute(insert(MatchRequest.__table__), rows)
+    return users
+
+
+def median_ms(db, query, user_ids):
+    timings = []
+    for user_id in user_ids:
+        started = time.perf_counter()
+        query(db, user_id)
+        timings.append((time.perf_counter() - started) * 1000)
+        db.expunge_all()
+    return statistics.median(timings)
+
+
+def run(size, rng):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine, tables=[MatchRequest.__table__])
+        for index in COMPOSITE_INDEXES:
+            index.drop(bind=engine)
+
+        users = populate(engine, size, rng)
+        lookups = rng.sample(users, min(LOOKUPS, len(users)))
+        db = sessionmaker(bind=engine)()
+        try:
+            legacy = median_ms(db, legacy_user_matches, lookups)
+            for index in COMPOSITE_INDEXES:
+                index.create(bind=engine)
+            with engine.connect() as connection:
+                connection.exec_driver_sql("ANALYZE")
+            current = median_ms(db, get_user_matches, lookups)
+        finally:
+            db.close()
+            engine.dispose()
+    return legacy, current
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    rng = random.Random(12)
+    print(f"{'rows':>10}  {'legacy ms':>10}  {'current ms':>10}")
+    for size in sizes:
+        legacy, current = run(size, rng)
+        print(f"{size:>10}  {legacy:>10.3f}  {current:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()